@@ -0,0 +1,184 @@
+import json
+import zlib
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BinaryField, Exists, OuterRef
+from django.db.models.functions import Substr
+from django.utils import timezone
+from .digest import refresh_digest
+from .models import Conversation, ConversationArchive, Job, Message
+
+
+# Each message is packed as one JSON array per line, in this order
+ARCHIVE_FIELDS = ('id', 'sender', 'content', 'timestamp', 'is_complete')
+
+
+def pack(rows, level=None, block_bytes=None):
+    """
+    Compress (id, sender, content, timestamp, is_complete) rows into NDJSON
+    blocks of about `block_bytes`, each its own zlib stream. Returns (data,
+    blocks, count, raw_bytes); `blocks` lists [highest id, end offset in
+    data] per block, so a read after an id can skip the blocks before it.
+    """
+    level = settings.ARCHIVE_COMPRESSION_LEVEL if level is None else level
+    block_bytes = block_bytes or settings.ARCHIVE_BLOCK_BYTES
+    parts, blocks, lines = [], [], []
+    count = raw_bytes = pending = top = 0
+
+    def seal():
+        block = zlib.compress(b''.join(lines), level)
+        parts.append(block)
+        blocks.append([top, (blocks[-1][1] if blocks else 0) + len(block)])
+        lines.clear()
+
+    for message_id, sender, content, timestamp, is_complete in rows:
+        line = json.dumps(
+            [message_id, sender, content, timestamp.isoformat(), is_complete],
+            ensure_ascii=False, separators=(',', ':')
+        ).encode() + b'\n'
+        lines.append(line)
+        top = max(top, message_id)
+        count += 1
+        raw_bytes += len(line)
+        pending += len(line)
+        if pending >= block_bytes:
+            seal()
+            pending = top = 0
+    if lines:
+        seal()
+    return b''.join(parts), blocks, count, raw_bytes
+
+
+def _row(line):
+    message_id, sender, content, timestamp, is_complete = json.loads(line)
+    return message_id, sender, content, datetime.fromisoformat(timestamp), is_complete
+
+
+def unpack(data, blocks=None, after_id=0, offset=0):
+    """
+    Yield the rows after `after_id` of a packed blob, of which `data` holds
+    the bytes from `offset` on. Blocks whose ids all come before `after_id`
+    are never decompressed. Without `blocks` (archives written as a single
+    stream) the whole blob is one block.
+    """
+    start = 0
+    for top, end in blocks or [[None, offset + len(data)]]:
+        if end > offset and (top is None or top > after_id):
+            for line in zlib.decompress(data[start - offset:end - offset]).split(b'\n'):
+                if line:
+                    row = _row(line)
+                    if row[0] > after_id:
+                        yield row
+        start = end
+
+
+def archived_rows(conversation_id, after_id=0):
+    """(id, sender, content, timestamp, is_complete) of archived messages after `after_id`, in order"""
+    archives = ConversationArchive.objects.filter(conversation_id=conversation_id)
+    blocks = archives.values_list('blocks', flat=True).first()
+    if blocks is None:
+        return
+    # Only read the blob from the first block that can hold a later message
+    offset = 0
+    for top, end in blocks:
+        if top > after_id:
+            break
+        offset = end
+    if offset:
+        archives = archives.annotate(data_tail=Substr('data', offset + 1, output_field=BinaryField()))
+        data = archives.values_list('data_tail', flat=True).first()
+    else:
+        data = archives.values_list('data', flat=True).first()
+    yield from unpack(bytes(data or b''), blocks, after_id, offset)
+
+
+def archived_messages(conversation, after_id=0):
+    """Archived messages after `after_id` rebuilt as (unsaved) Message instances, in order"""
+    for message_id, sender, content, timestamp, is_complete in archived_rows(conversation.id, after_id):
+        yield Message(
+            id=message_id, conversation=conversation, sender=sender,
+            content=content, timestamp=timestamp, is_complete=is_complete
+        )
+
+
+def transcript_rows(conversation_id, after_id=0, archived=None):
+    """(id, sender, content) of non-empty messages after `after_id` in id order, archived or not"""
+    if archived is None:
+        archived = Conversation.objects.filter(id=conversation_id, archived_at__isnull=False).exists()
+    if archived:
+        return [
+            (message_id, sender, content)
+            for message_id, sender, content, _, _ in archived_rows(conversation_id, after_id) if content
+        ]
+    return list(
+        Message.objects.filter(conversation_id=conversation_id, id__gt=after_id)
+        .exclude(content='')
+        .order_by('id')
+        .values_list('id', 'sender', 'content')
+        .iterator(chunk_size=500)
+    )
+
+
+def archivable_conversations(older_than_days=None, limit=None):
+    """Ids of ended conversations idle for `older_than_days`, with messages and no pending jobs, oldest first"""
+    if older_than_days is None:
+        older_than_days = settings.ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    pending_jobs = Job.objects.filter(conversation=OuterRef('pk'), status__in=['queued', 'running'])
+    conversation_ids = (
+        Conversation.objects.filter(
+            status='ended', archived_at__isnull=True, end_timestamp__lt=cutoff, message_count__gt=0
+        )
+        .exclude(Exists(pending_jobs))
+        .order_by('end_timestamp', 'id')
+        .values_list('id', flat=True)
+    )
+    return list(conversation_ids[:limit] if limit else conversation_ids)
+
+
+def archive_conversation(conversation_id):
+    """
+    Move an ended conversation's messages into a ConversationArchive.
+    Returns (messages, raw_bytes, stored_bytes), or None if it is not
+    ended, already archived or still has a reply streaming.
+    """
+    with transaction.atomic():
+        conversation = (
+            Conversation.objects.select_for_update()
+            .filter(id=conversation_id, status='ended', archived_at__isnull=True)
+            .first()
+        )
+        messages = Message.objects.filter(conversation_id=conversation_id)
+        if conversation is None or messages.filter(is_complete=False).exists():
+            return None
+
+        # Titles, summaries and query excerpts read the digest once the rows are gone
+        refresh_digest(conversation_id)
+        rows = messages.order_by('timestamp', 'id').values_list(*ARCHIVE_FIELDS).iterator(chunk_size=500)
+        data, blocks, count, raw_bytes = pack(rows)
+        ConversationArchive.objects.create(
+            conversation=conversation, message_count=count, raw_bytes=raw_bytes, data=data, blocks=blocks
+        )
+        # One DELETE without per-row signals: what they maintain (digest,
+        # cached context and responses) is unchanged by the move
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {Message._meta.db_table} WHERE conversation_id = %s", [conversation_id])
+        Conversation.objects.filter(id=conversation_id).update(archived_at=timezone.now())
+    return count, raw_bytes, len(data)
+
+
+def archive_conversations(conversation_ids):
+    """Archive each conversation in its own transaction; returns a report"""
+    report = {'archived': 0, 'skipped': 0, 'messages': 0, 'raw_bytes': 0, 'stored_bytes': 0}
+    for conversation_id in conversation_ids:
+        result = archive_conversation(conversation_id)
+        if result is None:
+            report['skipped'] += 1
+            continue
+        messages, raw_bytes, stored_bytes = result
+        report['archived'] += 1
+        report['messages'] += messages
+        report['raw_bytes'] += raw_bytes
+        report['stored_bytes'] += stored_bytes
+    return report
@@ -0,0 +1,131 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .ai_service import AIService
+from .embeddings import get_index, index_conversations
+from .models import Conversation
+from .providers import get_provider
+from .resilience import TokenBucket
+from .response_cache import invalidate_responses
+
+
+class RateLimitedProvider:
+    """Wraps a provider so every uncached generate() waits on a TokenBucket"""
+
+    def __init__(self, provider, limiter):
+        self.provider = provider
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+    def generate(self, prompt, **config):
+        self.limiter.acquire()
+        return self.provider.generate(prompt, **config)
+
+
+def idle_conversations(conversation_ids=None, idle_minutes=None, limit=None):
+    """Active conversations matching the ids and/or with no messages for idle_minutes"""
+    conversations = Conversation.objects.filter(status='active')
+    if conversation_ids is not None:
+        conversations = conversations.filter(id__in=conversation_ids)
+    if idle_minutes is not None:
+        cutoff = timezone.now() - timedelta(minutes=idle_minutes)
+        conversations = conversations.filter(
+            Q(last_message_at__lt=cutoff) |
+            Q(last_message_at__isnull=True, start_timestamp__lt=cutoff)
+        )
+    conversations = conversations.order_by('id')
+    return conversations[:limit] if limit else conversations
+
+
+def end_conversations(conversations):
+    """Mark the given active conversations ended in one UPDATE; returns their ids"""
+    with transaction.atomic():
+        conversation_ids = list(conversations.select_for_update().values_list('id', flat=True))
+        Conversation.objects.filter(id__in=conversation_ids, status='active').update(
+            status='ended', end_timestamp=timezone.now()
+        )
+        invalidate_responses(conversation_ids)
+    return conversation_ids
+
+
+def _summarize_one(conversation_id, provider):
+    try:
+        summary = AIService.generate_conversation_summary(
+            conversation_id, fail_silently=False, provider=provider
+        )
+        title = AIService.generate_conversation_title(
+            AIService.first_message(conversation_id) or "Conversation",
+            fail_silently=False, provider=provider
+        )
+        return conversation_id, summary, title, None
+    except Exception as e:
+        return conversation_id, None, None, e
+
+
+def _summarize_in_thread(conversation_id, provider):
+    try:
+        return _summarize_one(conversation_id, provider)
+    finally:
+        close_old_connections()
+
+
+def summarize_conversations(conversation_ids, workers=None, rate=None, batch_size=None, progress=None):
+    """
+    Generate summaries and titles for many conversations.
+
+    LLM calls run on `workers` threads and share a token bucket of `rate`
+    calls per second, on top of the provider's own limits. Results are
+    written with bulk_update every `batch_size` conversations, then
+    embedded; `progress(report)` is called after each batch. Returns the final report; conversations that
+    failed are listed in report['failed'] and left untouched.
+    """
+    workers = workers or settings.BULK_WORKERS
+    rate = settings.BULK_RATE_LIMIT if rate is None else rate
+    batch_size = batch_size or settings.BULK_BATCH_SIZE
+    # burst=1 spaces calls evenly instead of front-loading a burst
+    provider = RateLimitedProvider(get_provider(), TokenBucket(rate, burst=1))
+
+    started = time.monotonic()
+    report = {'total': len(conversation_ids), 'summarized': 0, 'failed': [], 'seconds': 0.0, 'per_second': 0.0}
+    pending = []
+
+    def flush():
+        if pending:
+            Conversation.objects.bulk_update(pending, ['summary', 'title'], batch_size=batch_size)
+            invalidate_responses([conversation.id for conversation in pending])
+            index_conversations([conversation.id for conversation in pending])
+            report['summarized'] += len(pending)
+            pending.clear()
+        report['seconds'] = round(time.monotonic() - started, 3)
+        done = report['summarized'] + len(report['failed'])
+        report['per_second'] = round(done / report['seconds'], 2) if report['seconds'] else 0.0
+        if progress:
+            progress(dict(report))
+
+    def collect(result):
+        conversation_id, summary, title, error = result
+        if error is not None:
+            report['failed'].append(conversation_id)
+        else:
+            pending.append(Conversation(id=conversation_id, summary=summary, title=title))
+        if len(pending) >= batch_size:
+            flush()
+
+    if workers <= 1:
+        for conversation_id in conversation_ids:
+            collect(_summarize_one(conversation_id, provider))
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chat-bulk') as pool:
+            futures = [pool.submit(_summarize_in_thread, conversation_id, provider) for conversation_id in conversation_ids]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    flush()
+    get_index().merge()
+    return report
@@ -0,0 +1,218 @@
+from django.conf import settings
+from .models import Conversation, Message
+
+
+CHAT_SYSTEM_PROMPT = "You are a helpful AI assistant. Respond thoughtfully and contextually, although in as short as possible."
+
+CHAT_LABELS = {'user': 'User', 'ai': 'Assistant'}
+TRANSCRIPT_LABELS = {'user': 'USER', 'ai': 'AI'}
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for budgeting"""
+    return len(text) // 4 + 1
+
+
+def _compress_turn(sender, content, max_chars):
+    """Reduce an old turn to its first line, clipped to max_chars"""
+    line = content.strip().split('\n', 1)[0]
+    if len(line) > max_chars:
+        line = line[:max_chars - 3].rstrip() + '...'
+    return f"{TRANSCRIPT_LABELS.get(sender, sender)}: {line}"
+
+
+class ContextBuilder:
+    """
+    Builds prompt context from the tail of a conversation.
+
+    Only the most recent `window` messages are read (values_list + LIMIT),
+    then trimmed newest-first to fit `token_budget`. Messages that have slid
+    out of the window are folded into Conversation.context_summary, so each
+    turn only touches the handful of messages that just dropped off.
+    """
+
+    def __init__(self, token_budget=None, window=None, labels=CHAT_LABELS,
+                 summary_chars=None, turn_chars=200, cache=None):
+        self.token_budget = token_budget or getattr(settings, 'CHAT_CONTEXT_TOKEN_BUDGET', 4000)
+        self.window = window or getattr(settings, 'CHAT_CONTEXT_WINDOW', 20)
+        self.labels = labels
+        self.summary_chars = summary_chars or getattr(settings, 'CHAT_CONTEXT_SUMMARY_CHARS', 2000)
+        self.turn_chars = turn_chars
+        self.cache = cache
+
+    def fetch_tail(self, conversation_id):
+        """Return the last `window` (id, sender, content) rows, oldest first"""
+        rows = list(
+            Message.objects.filter(conversation_id=conversation_id)
+            .exclude(content='')
+            .order_by('-timestamp', '-id')
+            .values_list('id', 'sender', 'content')[:self.window]
+        )
+        rows.reverse()
+        return rows
+
+    def rolling_summary(self, conversation_id, tail):
+        """
+        Fold messages older than `tail` into the stored rolling summary.
+
+        Returns (summary, through) where `through` is the id of the last
+        message the summary covers. A tail shorter than the window is the
+        whole conversation, so no summary is needed.
+        """
+        if len(tail) < self.window:
+            return '', 0
+
+        conversation = (
+            Conversation.objects.filter(id=conversation_id)
+            .values('context_summary', 'context_summary_through')
+            .first()
+        )
+        if conversation is None:
+            return '', 0
+
+        summary = conversation['context_summary'] or ''
+        through = conversation['context_summary_through'] or 0
+        if through >= tail[0][0]:
+            return summary, through
+
+        # Anything beyond this many rows would be cut from the summary anyway
+        max_rows = max(self.summary_chars // 20, 1)
+        dropped = list(
+            Message.objects.filter(
+                conversation_id=conversation_id,
+                id__gt=through,
+                id__lt=tail[0][0],
+            )
+            .exclude(content='')
+            .order_by('-timestamp', '-id')
+            .values_list('id', 'sender', 'content')[:max_rows]
+        )
+        if not dropped:
+            return summary, through
+
+        dropped.reverse()
+        summary = self.fold(summary, dropped)
+        self.save_summary(conversation_id, conversation['context_summary_through'], summary, dropped[-1][0])
+        return summary, dropped[-1][0]
+
+    def fold(self, summary, dropped):
+        """Append compressed (id, sender, content) rows to the summary, keeping the newest summary_chars"""
+        lines = [summary] if summary else []
+        lines.extend(_compress_turn(sender, content, self.turn_chars) for _, sender, content in dropped)
+        summary = '\n'.join(lines)
+        if len(summary) > self.summary_chars:
+            # Keep the most recent part; cut at a line boundary
+            summary = summary[-self.summary_chars:]
+            summary = summary.split('\n', 1)[-1]
+        return summary
+
+    def save_summary(self, conversation_id, old_through, summary, through):
+        """Store the folded summary; returns False if another turn folded first"""
+        # Conditional on the old marker so concurrent turns don't fold twice
+        return Conversation.objects.filter(
+            id=conversation_id,
+            context_summary_through=old_through or None,
+        ).update(context_summary=summary, context_summary_through=through) > 0
+
+    def history(self, conversation_id):
+        """Return (summary, tail) with tail limited to turns the summary doesn't cover"""
+        if self.cache is not None:
+            return self.cached_history(conversation_id)
+        tail = self.fetch_tail(conversation_id)
+        summary, through = self.rolling_summary(conversation_id, tail)
+        return summary, [row for row in tail if row[0] > through]
+
+    def cached_history(self, conversation_id):
+        """
+        history() through the ContextCache. A hit reads only the messages
+        after the cached ones and folds whatever slides out of the window
+        into the summary without re-reading it.
+        """
+        generation = self.cache.generation
+        entry = self.cache.get(conversation_id)
+        if entry is None:
+            # Empty placeholders are read too: they bound what can be cached
+            rows = list(
+                Message.objects.filter(conversation_id=conversation_id)
+                .order_by('-id')
+                .values_list('id', 'sender', 'content', 'is_complete')[:self.window]
+            )
+            rows.reverse()
+            summary, through = self.rolling_summary(conversation_id, rows)
+            cached, last_id = (), through
+        else:
+            summary, through = entry.summary, entry.through
+            cached, last_id = entry.rows, entry.last_id
+            rows = list(
+                Message.objects.filter(conversation_id=conversation_id, id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'sender', 'content', 'is_complete')
+            )
+
+        # Messages up to the first incomplete one can't change any more
+        stable = []
+        for row in rows:
+            if not row[3]:
+                break
+            stable.append(row)
+        if stable:
+            last_id = max(last_id, stable[-1][0])
+
+        tail = list(cached) + [row[:3] for row in rows if row[0] > through and row[2]]
+        if len(tail) > self.window:
+            dropped, tail = tail[:-self.window], tail[-self.window:]
+            folded = self.fold(summary, dropped)
+            if not self.save_summary(conversation_id, through, folded, dropped[-1][0]):
+                # Another process folded first: start over from the database
+                self.cache.invalidate(conversation_id)
+                return self.history(conversation_id)
+            summary, through = folded, dropped[-1][0]
+
+        self.cache.put(
+            conversation_id, summary, through,
+            [row for row in tail if row[0] <= last_id], last_id, generation
+        )
+        return summary, tail
+
+    def render_history(self, tail, budget):
+        """Render as many of the newest turns as fit in `budget` tokens"""
+        lines = []
+        used = 0
+        for _, sender, content in reversed(tail):
+            line = f"{self.labels.get(sender, sender)}: {content}"
+            cost = estimate_tokens(line)
+            if used + cost > budget and lines:
+                break
+            lines.append(line)
+            used += cost
+        lines.reverse()
+        return lines, used
+
+    def build(self, conversation_id, system_prompt, pending_message=None):
+        """
+        Build a chat prompt for `conversation_id`.
+
+        `pending_message` is the user turn being answered; if it was already
+        saved as the newest message it is not repeated in the history.
+        """
+        summary, tail = self.history(conversation_id)
+        if pending_message is not None and tail and tail[-1][1] == 'user' and tail[-1][2] == pending_message:
+            tail = tail[:-1]
+
+        parts = [system_prompt, '']
+        budget = self.token_budget - estimate_tokens(system_prompt)
+        if pending_message is not None:
+            budget -= estimate_tokens(pending_message)
+
+        if summary:
+            summary_block = f"Summary of earlier conversation:\n{summary}\n"
+            parts.append(summary_block)
+            budget -= estimate_tokens(summary_block)
+
+        lines, _ = self.render_history(tail, max(budget, 0))
+        parts.extend(lines)
+
+        if pending_message is not None:
+            parts.append(f"{self.labels['user']}: {pending_message}")
+            parts.append(f"{self.labels['ai']}:")
+        return '\n'.join(parts)
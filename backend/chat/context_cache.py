@@ -0,0 +1,169 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.test.signals import setting_changed
+from .context import estimate_tokens
+from .metrics import REGISTRY
+
+
+# Rough per-row overhead of the tuple, ints and str headers
+ROW_OVERHEAD = 200
+
+
+class ContextEntry:
+    """
+    Cached context of one conversation: the rolling summary, the tail of
+    complete messages after it, and the id up to which messages have been
+    read. Entries are never mutated; builders replace them.
+    """
+
+    __slots__ = ('summary', 'through', 'rows', 'last_id', 'tokens', 'size', 'expires')
+
+    def __init__(self, summary, through, rows, last_id, expires=None):
+        self.summary = summary
+        self.through = through
+        self.rows = tuple(rows)
+        self.last_id = last_id
+        self.tokens = sum(estimate_tokens(content) for _, _, content in self.rows) + estimate_tokens(summary)
+        self.size = (
+            sys.getsizeof(summary) +
+            sum(sys.getsizeof(content) + ROW_OVERHEAD for _, _, content in self.rows) +
+            ROW_OVERHEAD
+        )
+        self.expires = expires
+
+
+class ContextCache:
+    """
+    Per-process LRU of conversation contexts, capped at `max_bytes`.
+
+    A hit lets ContextBuilder read only the messages after entry.last_id
+    instead of the whole tail and the rolling summary. Only complete
+    messages are cached, so streamed replies still being written are
+    re-read until they finish; edits and deletes of cached messages
+    invalidate the entry (see signals.py). Other processes' edits are
+    picked up when the entry expires after `ttl` seconds.
+    """
+
+    def __init__(self, max_bytes=None, ttl=None):
+        self.max_bytes = max_bytes or settings.CHAT_CONTEXT_CACHE_MAX_BYTES
+        self.ttl = ttl if ttl is not None else settings.CHAT_CONTEXT_CACHE_TTL_SECONDS
+        self.size = 0
+        # Bumped by every invalidation; a put() started before one is dropped
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, conversation_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is not None and entry.expires is not None and entry.expires <= now:
+                self._remove(conversation_id)
+                entry = None
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(conversation_id)
+            self.counters['hits'] += 1
+            return entry
+
+    def put(self, conversation_id, summary, through, rows, last_id, generation):
+        """Store a new entry unless something was invalidated since `generation` was read"""
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        entry = ContextEntry(summary, through, rows, last_id, expires)
+        with self._lock:
+            if generation != self.generation or entry.size > self.max_bytes:
+                return
+            self._remove(conversation_id)
+            self._entries[conversation_id] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.counters['evictions'] += 1
+
+    def _remove(self, conversation_id):
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def invalidate(self, conversation_id):
+        with self._lock:
+            self.generation += 1
+            if conversation_id in self._entries:
+                self._remove(conversation_id)
+                self.counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            entries = len(self._entries)
+            size = self.size
+        lookups = counters['hits'] + counters['misses']
+        return {
+            **counters,
+            'hit_rate': round(counters['hits'] / lookups, 4) if lookups else 0.0,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_context_cache():
+    """The shared ContextCache, or None when CHAT_CONTEXT_CACHE_ENABLED is off"""
+    global _cache
+    if not settings.CHAT_CONTEXT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ContextCache()
+    return _cache
+
+
+def invalidate_context(conversation_id):
+    cache = _cache
+    if cache is not None:
+        cache.invalidate(conversation_id)
+
+
+@REGISTRY.collector
+def collect_context_cache():
+    cache = _cache
+    if cache is None:
+        return []
+    stats = cache.stats()
+    return [
+        ('chat_context_cache_hits_total', 'counter', "Context cache hits", [({}, stats['hits'])]),
+        ('chat_context_cache_misses_total', 'counter', "Context cache misses", [({}, stats['misses'])]),
+        ('chat_context_cache_evictions_total', 'counter', "Context cache LRU evictions",
+         [({}, stats['evictions'])]),
+        ('chat_context_cache_invalidations_total', 'counter', "Context cache entries dropped by edits",
+         [({}, stats['invalidations'])]),
+        ('chat_context_cache_entries', 'gauge', "Conversations in the context cache", [({}, stats['entries'])]),
+        ('chat_context_cache_bytes', 'gauge', "Approximate size of the context cache", [({}, stats['bytes'])]),
+    ]
+
+
+def _on_setting_changed(setting, **kwargs):
+    global _cache
+    if setting.startswith('CHAT_CONTEXT_CACHE_'):
+        with _cache_lock:
+            _cache = None
+
+
+setting_changed.connect(_on_setting_changed)
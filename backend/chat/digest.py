@@ -0,0 +1,112 @@
+import zlib
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from .context import TRANSCRIPT_LABELS
+from .models import ConversationDigest, Message
+from .search import words
+
+
+def transcript_line(sender, content):
+    return f"{TRANSCRIPT_LABELS.get(sender, sender)}: {content}"
+
+
+def fold(digest, rows, block_chars=None, max_terms=None):
+    """
+    Append complete (id, sender, content) rows, in id order, to an unsaved
+    digest. The tail is compressed into a new zlib block once it reaches
+    `block_chars`, so each message only compresses the text after the last
+    block rather than the whole transcript.
+    """
+    block_chars = block_chars or settings.CONVERSATION_DIGEST_BLOCK_CHARS
+    max_terms = max_terms or settings.CONVERSATION_DIGEST_MAX_TERMS
+    terms = Counter(digest.terms)
+    tail = digest.tail
+    blocks = [bytes(digest.transcript)]
+    for message_id, sender, content in rows:
+        digest.through = max(digest.through, message_id)
+        if not content:
+            continue
+        if sender == 'user' and not digest.first_user_message:
+            digest.first_user_message = content
+        line = transcript_line(sender, content)
+        # Lines are stored newline-terminated; the count is of the joined text
+        digest.char_count += len(line) + (1 if digest.message_count else 0)
+        digest.message_count += 1
+        terms.update(words(content))
+        tail += line + '\n'
+        if len(tail) >= block_chars:
+            blocks.append(zlib.compress(tail.encode()))
+            tail = ''
+    digest.transcript = b''.join(blocks)
+    digest.tail = tail
+    # Keep the sketch bounded: rare terms fall out first
+    digest.terms = dict(terms.most_common(max_terms))
+    return digest
+
+
+def transcript_text(digest, max_chars=None):
+    """The digest's transcript, or only its first `max_chars` characters (decompressing only what they need)"""
+    parts, length = [], 0
+    data = bytes(digest.transcript)
+    while data and (max_chars is None or length < max_chars):
+        decompressor = zlib.decompressobj()
+        block = decompressor.decompress(data).decode()
+        data = decompressor.unused_data
+        parts.append(block)
+        length += len(block)
+    if not data:
+        parts.append(digest.tail)
+    text = ''.join(parts)
+    if not data:
+        text = text[:-1]
+    return text if max_chars is None else text[:max_chars]
+
+
+def token_count(digest):
+    """estimate_tokens() of the transcript, without decompressing it"""
+    return digest.char_count // 4 + 1 if digest.message_count else 0
+
+
+def refresh_digest(conversation_id):
+    """
+    The conversation's digest, caught up with its messages: new ones up to
+    the first incomplete (still streaming) reply are folded in. A missing
+    digest is built from every message. Returns None while the
+    conversation has no complete messages.
+    """
+    with transaction.atomic():
+        digest = ConversationDigest.objects.select_for_update().filter(conversation_id=conversation_id).first()
+        rows = (
+            Message.objects.filter(conversation_id=conversation_id, id__gt=digest.through if digest else 0)
+            .order_by('id')
+            .values_list('id', 'sender', 'content', 'is_complete')
+        )
+        stable = []
+        for message_id, sender, content, is_complete in rows.iterator(chunk_size=500):
+            if not is_complete:
+                break
+            stable.append((message_id, sender, content))
+        if not stable:
+            return digest
+
+        if digest is None:
+            # Another request may have created it since the SELECT
+            digest, _ = ConversationDigest.objects.get_or_create(conversation_id=conversation_id)
+        fold(digest, [row for row in stable if row[0] > digest.through])
+        digest.save()
+    return digest
+
+
+def drop_digest(conversation_id, message_id=None):
+    """Forget a digest that covers `message_id` (edited or deleted); the next refresh rebuilds it"""
+    digests = ConversationDigest.objects.filter(conversation_id=conversation_id)
+    if message_id is not None:
+        digests = digests.filter(through__gte=message_id)
+    digests.delete()
+
+
+def transcript_excerpt(conversation_id, max_chars):
+    """First `max_chars` of the conversation's 'SENDER: content' transcript"""
+    digest = refresh_digest(conversation_id)
+    return transcript_text(digest, max_chars) if digest is not None else ''
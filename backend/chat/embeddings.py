@@ -0,0 +1,466 @@
+import hashlib
+import os
+import re
+import threading
+from contextlib import contextmanager
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.test.signals import setting_changed
+from django.utils.module_loading import import_string
+from .archive import archived_rows
+from .models import Conversation, Message
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within a process
+    fcntl = None
+
+
+# base-<n>.ids.npy (+ base-<n>.vectors.npy) snapshots and segment-<n>.npz changes
+INDEX_FILE_RE = re.compile(r'^(base|segment)-(\d+)\.(?:ids\.npy|npz)$')
+
+class Embedder:
+    """Turns texts into L2-normalized float32 vectors of size `dim`"""
+
+    dim = None
+
+    def embed(self, texts):
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """
+    Dependency-free local embedder: signed feature hashing of unigrams and
+    bigrams. Deterministic across processes, so vectors can be persisted.
+    """
+
+    def __init__(self, dim=None):
+        self.dim = dim or settings.EMBEDDING_DIM
+
+    def _features(self, text):
+        words = re.findall(r'[a-z0-9]+', text.lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                value = int.from_bytes(digest, 'little')
+                matrix[row, value % self.dim] += 1.0 if value >> 63 else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class EmbeddingIndex:
+    """
+    Append-only vector matrix with tombstoned deletes and brute-force
+    cosine top-k.
+
+    Rows live in a preallocated float32 matrix that doubles on growth;
+    deletes only flip a mask, and the matrix is compacted once a quarter of
+    it is dead. With `path` set, update() appends each change to the
+    directory as a numbered segment, under a file lock shared by every
+    process, and reload() applies only the segments it has not seen. Once
+    `max_segments` pile up, merge() folds them into a base snapshot
+    (optionally memory-mapped by readers).
+    """
+
+    def __init__(self, dim, path=None, mmap=False, max_segments=None):
+        self.dim = dim
+        self.path = path
+        self.mmap = mmap
+        self.max_segments = max_segments or settings.EMBEDDING_INDEX_MAX_SEGMENTS
+        self._lock = threading.RLock()
+        self._applied = 0
+        self._loaded_stamp = None
+        self._reset(capacity=1024)
+        if path:
+            self.reload()
+
+    def _reset(self, capacity):
+        self.vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        self.conversation_ids = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.size = 0
+
+    def clear(self):
+        with self._lock:
+            self._reset(capacity=1024)
+
+    def __len__(self):
+        return int(self.alive[:self.size].sum())
+
+    def _file(self, kind, seq, suffix):
+        return os.path.join(self.path, f"{kind}-{seq:012d}.{suffix}")
+
+    def _scan(self):
+        """(newest base snapshot, segment numbers in order) on disk; 0 when there is no base"""
+        base, segments = 0, []
+        for name in os.listdir(self.path):
+            match = INDEX_FILE_RE.match(name)
+            if match is None:
+                continue
+            if match.group(1) == 'base':
+                base = max(base, int(match.group(2)))
+            else:
+                segments.append(int(match.group(2)))
+        return base, sorted(segments)
+
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, 'lock'), 'a') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            yield
+
+    def reload(self):
+        """Catch up with snapshots and segments written since we last looked"""
+        try:
+            # Adding, replacing or removing a file changes the directory
+            stamp = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return
+        if stamp == self._loaded_stamp:
+            return
+        with self._lock:
+            base, segments = self._scan()
+            try:
+                if base > self._applied:
+                    self._load_base(base)
+                for seq in segments:
+                    if seq > self._applied:
+                        self._load_segment(seq)
+            except FileNotFoundError:
+                # Merged away while we read: the next reload starts from the new base
+                return
+            self._loaded_stamp = stamp
+
+    def _load_base(self, seq):
+        conversation_ids = np.load(self._file('base', seq, 'ids.npy'))
+        vectors = np.load(self._file('base', seq, 'vectors.npy'), mmap_mode='r' if self.mmap else None)
+        self.vectors = vectors
+        self.conversation_ids = conversation_ids
+        self.alive = np.ones(len(conversation_ids), dtype=bool)
+        self.size = len(conversation_ids)
+        self._applied = seq
+
+    def _load_segment(self, seq):
+        with np.load(self._file('segment', seq, 'npz')) as segment:
+            deleted, conversation_ids, vectors = segment['deleted'], segment['conversation_ids'], segment['vectors']
+        self._apply(deleted, conversation_ids, vectors)
+        self._applied = seq
+
+    def _apply(self, deleted, conversation_ids, vectors):
+        self.delete_many(deleted)
+        if len(conversation_ids):
+            self.add_many(conversation_ids, vectors)
+
+    def _write(self, final, dump):
+        tmp = f"{final}.tmp"
+        with open(tmp, 'wb') as handle:
+            dump(handle)
+        os.replace(tmp, final)
+
+    def _write_base(self, seq):
+        """Snapshot the live rows as base `seq` and drop the files it supersedes"""
+        keep = self.alive[:self.size]
+        # The ids file marks the snapshot complete, so it goes last
+        self._write(self._file('base', seq, 'vectors.npy'), lambda f: np.save(f, self.vectors[:self.size][keep]))
+        self._write(self._file('base', seq, 'ids.npy'), lambda f: np.save(f, self.conversation_ids[:self.size][keep]))
+        _, segments = self._scan()
+        stale = [self._file('segment', old, 'npz') for old in segments if old <= seq]
+        for name in os.listdir(self.path):
+            match = INDEX_FILE_RE.match(name)
+            if match and match.group(1) == 'base' and int(match.group(2)) < seq:
+                old = int(match.group(2))
+                stale += [self._file('base', old, 'ids.npy'), self._file('base', old, 'vectors.npy')]
+        for path in stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._applied = seq
+
+    def update(self, vectors_by_conversation, persist=True):
+        """
+        Replace the rows of each conversation in {conversation_id: vectors};
+        None (or no vectors) removes it. With `path` set and `persist`, the
+        change is written as one segment. Removing conversations that have no
+        rows writes nothing.
+        """
+        kept = [(cid, vectors) for cid, vectors in vectors_by_conversation.items() if vectors is not None and len(vectors)]
+        if kept:
+            conversation_ids = np.concatenate([np.full(len(vectors), cid, dtype=np.int64) for cid, vectors in kept])
+            vectors = np.concatenate([vectors for _, vectors in kept]).astype(np.float32)
+        else:
+            conversation_ids = np.zeros(0, dtype=np.int64)
+            vectors = np.zeros((0, self.dim), dtype=np.float32)
+
+        if self.path and persist:
+            self.reload()
+        if not kept and not len(self._indexed(vectors_by_conversation)):
+            return
+        with self._lock:
+            if not (self.path and persist):
+                self._apply(self._indexed(vectors_by_conversation), conversation_ids, vectors)
+                return
+            with self._file_lock():
+                # Numbered after everything on disk, applied on top of it
+                self.reload()
+                deleted = self._indexed(vectors_by_conversation)
+                if not kept and not len(deleted):
+                    return
+                base, segments = self._scan()
+                seq = max([base, self._applied, *segments]) + 1
+                self._write(self._file('segment', seq, 'npz'), lambda f: np.savez(
+                    f, deleted=deleted, conversation_ids=conversation_ids, vectors=vectors
+                ))
+                self._apply(deleted, conversation_ids, vectors)
+                self._applied = seq
+
+    def _indexed(self, conversation_ids):
+        """The given conversations that have live rows"""
+        conversation_ids = np.array(list(conversation_ids), dtype=np.int64)
+        with self._lock:
+            live = self.conversation_ids[:self.size][self.alive[:self.size]]
+        return conversation_ids[np.isin(conversation_ids, live)]
+
+    def merge(self):
+        """
+        Fold the segments into a new base snapshot once `max_segments` have
+        piled up; returns whether it did. Rewrites the whole matrix, so it
+        runs from jobs rather than from update().
+        """
+        if not self.path:
+            return False
+        with self._lock, self._file_lock():
+            self.reload()
+            base, segments = self._scan()
+            if len(segments) < self.max_segments:
+                return False
+            self._write_base(max([base, self._applied, *segments]))
+            return True
+
+    def save(self):
+        """Replace everything on disk with this index (rebuild_embeddings)"""
+        if not self.path:
+            return
+        with self._lock, self._file_lock():
+            base, segments = self._scan()
+            self._write_base(max([base, self._applied, *segments]) + 1)
+
+    def _ensure_capacity(self, extra):
+        needed = self.size + extra
+        capacity = len(self.conversation_ids)
+        if needed <= capacity and isinstance(self.vectors, np.ndarray) and self.vectors.flags.writeable:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self.size] = self.vectors[:self.size]
+        conversation_ids = np.zeros(capacity, dtype=np.int64)
+        conversation_ids[:self.size] = self.conversation_ids[:self.size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.size] = self.alive[:self.size]
+        self.vectors, self.conversation_ids, self.alive = vectors, conversation_ids, alive
+
+    def add(self, conversation_id, vectors):
+        """Append rows for `conversation_id`"""
+        self.add_many(np.full(len(vectors), conversation_id, dtype=np.int64), vectors)
+
+    def delete(self, conversation_id):
+        """Tombstone every row of `conversation_id`"""
+        self.delete_many([conversation_id])
+
+    def delete_many(self, conversation_ids):
+        with self._lock:
+            if not len(conversation_ids):
+                return
+            dead = np.isin(self.conversation_ids[:self.size], conversation_ids)
+            if not dead.any():
+                return
+            self.alive[:self.size][dead] = False
+            if (~self.alive[:self.size]).sum() > self.size // 4:
+                self.compact()
+
+    def compact(self):
+        with self._lock:
+            keep = self.alive[:self.size]
+            vectors = np.array(self.vectors[:self.size][keep])
+            conversation_ids = self.conversation_ids[:self.size][keep]
+            self._reset(capacity=max(len(conversation_ids) * 2, 1024))
+            self.add_many(conversation_ids, vectors)
+
+    def add_many(self, conversation_ids, vectors):
+        with self._lock:
+            count = len(conversation_ids)
+            self._ensure_capacity(count)
+            self.vectors[self.size:self.size + count] = vectors
+            self.conversation_ids[self.size:self.size + count] = conversation_ids
+            self.alive[self.size:self.size + count] = True
+            self.size += count
+
+    def search(self, vector, k=10, candidates=None):
+        """
+        Top-k conversations by best-matching row, as [(conversation_id, score)].
+        `candidates` widens the row shortlist before grouping by conversation.
+        """
+        if self.path:
+            self.reload()
+        # Rows below `size` are never rewritten in place (growth, compaction and
+        # reloads swap in new arrays), but deletes flip `alive` in place
+        with self._lock:
+            size = self.size
+            if size == 0:
+                return []
+            matrix = self.vectors[:size]
+            conversation_ids = self.conversation_ids[:size]
+            alive = self.alive[:size].copy()
+
+        scores = matrix @ vector.astype(np.float32)
+        if not alive.all():
+            scores[~alive] = -np.inf
+
+        shortlist = min(candidates or k * 8, size)
+        top = np.argpartition(-scores, shortlist - 1)[:shortlist]
+        top = top[np.argsort(-scores[top])]
+
+        results = {}
+        for row in top:
+            score = scores[row]
+            if score == -np.inf:
+                break
+            conversation_id = int(conversation_ids[row])
+            if conversation_id not in results:
+                results[conversation_id] = float(score)
+                if len(results) == k:
+                    break
+        return list(results.items())
+
+
+def chunk_texts(conversation_id, chunk_chars=None):
+    """Summary/title text plus the transcript split into ~chunk_chars pieces"""
+    chunk_chars = chunk_chars or settings.EMBEDDING_CHUNK_CHARS
+    conversation = Conversation.objects.filter(id=conversation_id).values('title', 'summary', 'archived_at').first()
+    if conversation is None:
+        return []
+
+    chunks = []
+    header = ' '.join(filter(None, [conversation['title'], conversation['summary']]))
+    if header:
+        chunks.append(header)
+
+    current, length = [], 0
+    if conversation['archived_at'] is not None:
+        contents = (row[2] for row in archived_rows(conversation_id))
+    else:
+        rows = Message.objects.filter(conversation_id=conversation_id).order_by('timestamp', 'id')
+        contents = rows.values_list('content', flat=True).iterator(chunk_size=200)
+    for content in contents:
+        current.append(content)
+        length += len(content)
+        if length >= chunk_chars:
+            chunks.append('\n'.join(current))
+            current, length = [], 0
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+
+_embedder = None
+_index = None
+_singleton_lock = threading.Lock()
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        with _singleton_lock:
+            if _embedder is None:
+                _embedder = import_string(settings.EMBEDDING_EMBEDDER)()
+    return _embedder
+
+
+def get_index():
+    """Process-wide index, loaded from EMBEDDING_INDEX_DIR when configured"""
+    global _index
+    if _index is None:
+        dim = get_embedder().dim
+        with _singleton_lock:
+            if _index is None:
+                _index = EmbeddingIndex(
+                    dim,
+                    path=settings.EMBEDDING_INDEX_DIR or None,
+                    mmap=settings.EMBEDDING_INDEX_MMAP
+                )
+    return _index
+
+
+def reset_index():
+    global _embedder, _index
+    with _singleton_lock:
+        _embedder = None
+        _index = None
+
+
+def index_conversations(conversation_ids, save=True):
+    """(Re)embed conversations' summaries and message chunks; returns the chunk count.
+
+    With `save` the change is appended to EMBEDDING_INDEX_DIR as one
+    segment; without it only this process's index changes until save().
+    """
+    embedder = get_embedder()
+    updates = {}
+    for conversation_id in conversation_ids:
+        texts = chunk_texts(conversation_id)
+        updates[conversation_id] = embedder.embed(texts) if texts else None
+    get_index().update(updates, persist=save)
+    return sum(len(vectors) for vectors in updates.values() if vectors is not None)
+
+
+def index_conversation(conversation_id, save=True):
+    return index_conversations([conversation_id], save=save)
+
+
+_removals = threading.local()
+
+
+def remove_conversation(conversation_id):
+    """
+    Drop a deleted conversation's rows once the transaction commits. Deletes
+    committed together (e.g. a queryset delete) are written as one segment.
+    """
+    pending = getattr(_removals, 'ids', None)
+    if pending is None:
+        pending = _removals.ids = set()
+    pending.add(conversation_id)
+    transaction.on_commit(_flush_removals)
+
+
+def _flush_removals():
+    pending = getattr(_removals, 'ids', None)
+    if not pending:
+        return
+    _removals.ids = set()
+    # Ids queued by a transaction that rolled back are still in the table
+    survivors = set(Conversation.objects.filter(id__in=pending).values_list('id', flat=True))
+    gone = pending - survivors
+    if gone:
+        get_index().update(dict.fromkeys(gone))
+
+
+def semantic_search(query, k=10):
+    """Top-k (conversation_id, cosine score) for a free-text query"""
+    vector = get_embedder().embed([query])[0]
+    return get_index().search(vector, k=k)
+
+
+def _on_setting_changed(setting, **kwargs):
+    if setting.startswith('EMBEDDING_'):
+        reset_index()
+
+
+setting_changed.connect(_on_setting_changed)
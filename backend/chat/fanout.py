@@ -0,0 +1,210 @@
+import hashlib
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from .context import estimate_tokens
+from .digest import transcript_excerpt
+from .llm_cache import cached_generate
+from .metrics import observe_prompt
+from .providers import get_provider
+
+
+EXTRACT_PROMPT = """You are reviewing one past conversation to help answer a question.
+
+Question: {query}
+{keywords}
+Conversation {id} ({date}), titled "{title}"
+Summary: {summary}
+
+Transcript:
+{transcript}
+
+On the first line write "Relevance: N" where N is 0 (unrelated) to 10 (answers the question directly).
+Then list the facts, decisions and quotes from this conversation that help answer the question. Write "None" if there are none."""
+
+ANSWER_PROMPT = """Findings from past conversations, most relevant first:
+
+{findings}
+
+User Query: {query}
+
+Provide a detailed, insightful answer based on these findings. Cite conversations by their number when you use them."""
+
+RELEVANCE_RE = re.compile(r'relevance\s*[:=]\s*(\d+)', re.IGNORECASE)
+
+
+class QueryCancelled(Exception):
+    pass
+
+
+class QueryFanOut:
+    """
+    Comprehensive-mode query answering over many conversations.
+
+    Each candidate conversation gets its own extract call (map), run on a
+    bounded thread pool so latency follows the slowest call rather than
+    the sum. The relevant extracts, best first, are then answered in one
+    call (reduce). Extracts are cached per conversation and query in the
+    QUERY_FANOUT_CACHE_ALIAS cache; the key includes the message count, so
+    a conversation that gained messages is analysed again.
+
+    `progress(event)` is called with a 'finding' and a 'progress' event as
+    each conversation completes; setting `cancelled` stops calls not yet
+    started.
+    """
+
+    def __init__(self, provider=None, workers=None, transcript_chars=None, answer_tokens=None, progress=None):
+        self.provider = provider or get_provider()
+        self.workers = workers or settings.QUERY_FANOUT_WORKERS
+        self.transcript_chars = transcript_chars or settings.QUERY_FANOUT_TRANSCRIPT_CHARS
+        self.answer_tokens = answer_tokens or settings.SUMMARY_CONTEXT_TOKEN_BUDGET
+        self.progress = progress
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def query_hash(query, keywords):
+        raw = json.dumps({'query': query, 'keywords': sorted(keywords or [])})
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def _cache(self):
+        alias = settings.QUERY_FANOUT_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def _emit(self, event):
+        if self.progress is not None:
+            self.progress(event)
+
+    def extract(self, conversation, query, keywords, query_hash):
+        """Return {'conversation_id', 'title', 'date', 'score', 'extract'} for one conversation"""
+        cache = self._cache()
+        key = f"chat:fanout:{conversation.id}:{conversation.message_count}:{query_hash}"
+        finding = cache.get(key) if cache is not None else None
+        if finding is not None:
+            return finding
+
+        if self.cancelled.is_set():
+            raise QueryCancelled()
+        prompt = EXTRACT_PROMPT.format(
+            query=query,
+            keywords=f"Keywords: {', '.join(keywords)}\n" if keywords else '',
+            id=conversation.id,
+            date=conversation.start_timestamp.strftime('%Y-%m-%d %H:%M'),
+            title=conversation.title or f"Conversation {conversation.id}",
+            summary=conversation.summary or "No summary available",
+            transcript=transcript_excerpt(conversation.id, self.transcript_chars),
+        )
+        observe_prompt('query.extract', prompt)
+        text = cached_generate(self.provider, prompt).strip()
+
+        match = RELEVANCE_RE.search(text)
+        score = min(int(match.group(1)), 10) if match else 0
+        extract = text[match.end():].strip() if match else text
+        if extract.lower().rstrip('.') == 'none':
+            score, extract = 0, ''
+        finding = {
+            'conversation_id': conversation.id,
+            'title': conversation.title or f"Conversation {conversation.id}",
+            'date': conversation.start_timestamp.strftime('%Y-%m-%d %H:%M'),
+            'score': score,
+            'extract': extract,
+        }
+        if cache is not None:
+            cache.set(key, finding, timeout=settings.QUERY_FANOUT_CACHE_TTL_SECONDS or None)
+        return finding
+
+    def _extract_in_thread(self, conversation, query, keywords, query_hash):
+        try:
+            return self.extract(conversation, query, keywords, query_hash)
+        finally:
+            close_old_connections()
+
+    def map(self, conversations, query, keywords):
+        """Findings for every conversation that could be analysed, in completion order"""
+        query_hash = self.query_hash(query, keywords)
+        findings, failed = [], 0
+        total = len(conversations)
+
+        def collect(finding, error):
+            nonlocal failed
+            with self._lock:
+                if error is None:
+                    findings.append(finding)
+                else:
+                    failed += 1
+                done = len(findings) + failed
+            if error is None:
+                self._emit({'type': 'finding', **finding})
+            self._emit({'type': 'progress', 'done': done, 'total': total, 'failed': failed})
+
+        if self.workers <= 1 or total <= 1:
+            for conversation in conversations:
+                try:
+                    collect(self.extract(conversation, query, keywords, query_hash), None)
+                except QueryCancelled:
+                    raise
+                except Exception as e:
+                    collect(None, e)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, total), thread_name_prefix='chat-query') as pool:
+                futures = [
+                    pool.submit(self._extract_in_thread, conversation, query, keywords, query_hash)
+                    for conversation in conversations
+                ]
+                for future in as_completed(futures):
+                    try:
+                        collect(future.result(), None)
+                    except QueryCancelled:
+                        continue
+                    except Exception as e:
+                        collect(None, e)
+            if self.cancelled.is_set():
+                raise QueryCancelled()
+        return findings, failed
+
+    def reduce(self, findings, query):
+        """One answer call over the relevant findings that fit answer_tokens"""
+        blocks, used = [], 0
+        for finding in findings:
+            block = (
+                f"Conversation {finding['conversation_id']} ({finding['date']}), \"{finding['title']}\" "
+                f"[relevance {finding['score']}/10]:\n{finding['extract']}"
+            )
+            cost = estimate_tokens(block)
+            if blocks and used + cost > self.answer_tokens:
+                break
+            blocks.append(block)
+            used += cost
+        prompt = ANSWER_PROMPT.format(findings='\n\n---\n\n'.join(blocks), query=query)
+        observe_prompt('query', prompt)
+        return cached_generate(self.provider, prompt).strip()
+
+    def answer(self, conversations, query, keywords=None):
+        findings, failed = self.map(conversations, query, keywords)
+        relevant = sorted(
+            (finding for finding in findings if finding['score'] > 0),
+            key=lambda finding: (-finding['score'], finding['conversation_id'])
+        )
+        if relevant:
+            answer = self.reduce(relevant, query)
+        else:
+            answer = "None of the past conversations appear to be relevant to this question."
+        return {
+            'query': query,
+            'answer': answer,
+            'conversations_analyzed': len(findings),
+            'conversations_failed': failed,
+            'relevant_conversations': [
+                {
+                    'id': finding['conversation_id'],
+                    'title': finding['title'],
+                    'date': finding['date'],
+                    'relevance': finding['score'],
+                }
+                for finding in relevant
+            ],
+        }
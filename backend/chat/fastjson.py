@@ -0,0 +1,88 @@
+import json
+from django.utils import timezone
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same bytes
+    orjson = None
+
+
+# Rows are read with values_list() and built into dicts directly, skipping
+# the per-row field objects of the DRF serializers they mirror
+MESSAGE_FIELDS = ('id', 'content', 'sender', 'timestamp')
+LIST_FIELDS = ('id', 'title', 'status', 'start_timestamp', 'end_timestamp', 'message_count')
+
+
+def format_datetime(value):
+    """As DRF's DateTimeField.to_representation()"""
+    if not value:
+        return None
+    if timezone.is_aware(value):
+        value = value.astimezone(timezone.get_current_timezone())
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def dumps(data):
+    """
+    Encode plain data (dicts, lists, str, int, float, bool, None) to the
+    bytes JSONRenderer would produce: compact separators, non-ASCII left
+    unescaped, U+2028/U+2029 escaped. orjson is used when installed.
+    """
+    if orjson is not None:
+        content = orjson.dumps(data)
+    else:
+        content = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode()
+    # Keep the output a strict JavaScript subset, as JSONRenderer does
+    return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def message_rows(messages):
+    """MessageSerializer(many=True) data for a Message queryset (or Message instances, e.g. archived ones)"""
+    if hasattr(messages, 'values_list'):
+        rows = messages.values_list(*MESSAGE_FIELDS)
+    else:
+        rows = ((message.id, message.content, message.sender, message.timestamp) for message in messages)
+    return [
+        {'id': pk, 'content': content, 'sender': sender, 'timestamp': format_datetime(timestamp)}
+        for pk, content, sender, timestamp in rows
+    ]
+
+
+def conversation_rows(rows):
+    """ConversationListSerializer data for dicts from .values(*LIST_FIELDS)"""
+    return [
+        {
+            'id': row['id'],
+            'title': row['title'],
+            'status': row['status'],
+            'start_timestamp': format_datetime(row['start_timestamp']),
+            'end_timestamp': format_datetime(row['end_timestamp']),
+            'message_count': row['message_count'],
+        }
+        for row in rows
+    ]
+
+
+def conversation_header(conversation, messages=None):
+    """
+    ConversationHeaderSerializer data, or ConversationDetailSerializer data
+    when the message rows are given.
+    """
+    data = {
+        'id': conversation.id,
+        'title': conversation.title,
+        'status': conversation.status,
+        'start_timestamp': format_datetime(conversation.start_timestamp),
+        'end_timestamp': format_datetime(conversation.end_timestamp),
+        'summary': conversation.summary,
+    }
+    if messages is not None:
+        data['messages'] = messages
+    duration = None
+    if conversation.end_timestamp:
+        duration = round((conversation.end_timestamp - conversation.start_timestamp).total_seconds() / 60, 2)
+    data['duration_minutes'] = duration
+    return data
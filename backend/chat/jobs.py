@@ -0,0 +1,221 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .ai_service import AIService
+from .archive import archivable_conversations, archive_conversations
+from .bulk import summarize_conversations
+from .embeddings import get_index, index_conversation
+from .models import Conversation, Job
+from .response_cache import invalidate_responses
+
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def register(kind):
+    """Register a job handler. Handlers take (job) and return a JSON-able result."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide worker pool used by the 'thread' backend and run_jobs"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.JOB_WORKERS,
+                    thread_name_prefix='chat-jobs'
+                )
+    return _executor
+
+
+def enqueue(kind, conversation=None, payload=None, max_attempts=None):
+    """
+    Create a Job row and dispatch it according to JOB_BACKEND:
+
+    - 'thread': run on the in-process worker pool once the transaction commits
+    - 'db':     leave it queued for `manage.py run_jobs`
+    - 'sync':   run inline once the transaction commits
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    job = Job.objects.create(
+        kind=kind,
+        conversation=conversation,
+        payload=payload or {},
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS
+    )
+
+    backend = settings.JOB_BACKEND
+    if backend == 'thread':
+        transaction.on_commit(lambda: get_executor().submit(run_in_thread, run_until_done, job.id))
+    elif backend == 'sync':
+        transaction.on_commit(lambda: run_until_done(job.id))
+    elif backend != 'db':
+        raise ValueError(f"Unknown JOB_BACKEND: {backend}")
+    return job
+
+
+def retry_delay(attempt):
+    """Exponential backoff with full jitter"""
+    base = settings.JOB_RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1))
+    return random.uniform(0, base)
+
+
+def claim(job_id):
+    """Atomically move a due job from queued to running; False if someone else has it"""
+    return Job.objects.filter(
+        id=job_id,
+        status='queued',
+        run_after__lte=timezone.now()
+    ).update(status='running', attempts=F('attempts') + 1, updated_at=timezone.now()) == 1
+
+
+def run_once(job_id):
+    """
+    Run a single attempt of a job. Returns the delay in seconds before it
+    should be retried, or None if it finished (or could not be claimed).
+    """
+    if not claim(job_id):
+        return None
+
+    job = Job.objects.get(id=job_id)
+    try:
+        result = HANDLERS[job.kind](job)
+    except Exception as e:
+        logger.exception("Job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts)
+        if job.attempts < job.max_attempts:
+            delay = retry_delay(job.attempts)
+            Job.objects.filter(id=job.id).update(
+                status='queued',
+                error=str(e),
+                run_after=timezone.now() + timedelta(seconds=delay),
+                updated_at=timezone.now()
+            )
+            return delay
+        Job.objects.filter(id=job.id).update(status='failed', error=str(e), updated_at=timezone.now())
+        return None
+
+    Job.objects.filter(id=job.id).update(
+        status='succeeded', result=result, error='', updated_at=timezone.now()
+    )
+    return None
+
+
+def run_until_done(job_id):
+    """Run a job in the current thread, sleeping between retries"""
+    while True:
+        delay = run_once(job_id)
+        if delay is None:
+            return
+        time.sleep(delay)
+
+
+def run_in_thread(run, job_id):
+    """Executor entry point: run(job_id), then close the worker thread's connections"""
+    try:
+        return run(job_id)
+    finally:
+        close_old_connections()
+
+
+def due_jobs(limit):
+    return list(
+        Job.objects.filter(status='queued', run_after__lte=timezone.now())
+        .order_by('run_after')
+        .values_list('id', flat=True)[:limit]
+    )
+
+
+def requeue_stale(max_age_seconds):
+    """Requeue jobs left 'running' by a worker that died"""
+    cutoff = timezone.now() - timedelta(seconds=max_age_seconds)
+    return Job.objects.filter(status='running', updated_at__lt=cutoff).update(
+        status='queued', run_after=timezone.now(), updated_at=timezone.now()
+    )
+
+
+@register('summarize_conversation')
+def summarize_conversation(job):
+    summary = AIService.generate_conversation_summary(job.conversation_id, fail_silently=False)
+    Conversation.objects.filter(id=job.conversation_id).update(summary=summary)
+    invalidate_responses([job.conversation_id])
+    # Embed once the summary exists so it is part of the indexed text
+    enqueue('embed_conversation', conversation=job.conversation)
+    return {'summary': summary}
+
+
+@register('title_conversation')
+def title_conversation(job):
+    if 'draft' in job.payload:
+        return {'title': refine_title(job.conversation_id, job.payload['draft'])}
+    first_message = AIService.first_message(job.conversation_id)
+    title = AIService.generate_conversation_title(first_message or "Conversation", fail_silently=False)
+    Conversation.objects.filter(id=job.conversation_id).update(title=title)
+    invalidate_responses([job.conversation_id])
+    return {'title': title}
+
+
+def refine_title(conversation_id, draft, first_message=None):
+    """
+    Replace a draft title with a generated one, unless the title changed
+    in the meantime. Returns the new title, or None if it was kept.
+    """
+    if first_message is None:
+        first_message = AIService.first_message(conversation_id)
+    title = AIService.generate_conversation_title(first_message or "Conversation", fail_silently=False)
+    if not Conversation.objects.filter(id=conversation_id, title=draft).update(title=title):
+        return None
+    invalidate_responses([conversation_id])
+    return title
+
+
+@register('embed_conversation')
+def embed_conversation(job):
+    chunks = index_conversation(job.conversation_id)
+    return {'chunks': chunks, 'merged': get_index().merge()}
+
+
+@register('archive_conversations')
+def archive_idle_conversations(job):
+    return archive_conversations(archivable_conversations(limit=settings.ARCHIVE_BATCH_SIZE))
+
+
+def enqueue_archival():
+    """Queue an archival pass unless one is already queued or running"""
+    pending = Job.objects.filter(kind='archive_conversations', status__in=['queued', 'running'])
+    if pending.exists():
+        return None
+    return enqueue('archive_conversations')
+
+
+def requeue_failed(conversation_ids):
+    """Hand conversations a bulk run could not summarize to the per-conversation jobs"""
+    for conversation in Conversation.objects.filter(id__in=conversation_ids):
+        enqueue('summarize_conversation', conversation=conversation)
+        enqueue('title_conversation', conversation=conversation)
+
+
+@register('bulk_summarize')
+def bulk_summarize(job):
+    report = summarize_conversations(job.payload['conversation_ids'])
+    requeue_failed(report['failed'])
+    return report
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.test.signals import setting_changed
+from .metrics import REGISTRY
+
+
+class LLMCache:
+    """
+    Content-addressed cache for LLM completions.
+
+    Keys hash the provider, model, generation config and the full prompt,
+    so a result is only reused for an identical request. Prompts embed the
+    source messages, so any change to them produces a new key and stale
+    entries simply age out.
+
+    Lookups go to a per-process LRU (with TTL) first, then to a shared
+    Django cache (LLM_CACHE_ALIAS) that other workers can fill.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, alias=None):
+        self.max_entries = max_entries or settings.LLM_CACHE_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else settings.LLM_CACHE_TTL_SECONDS
+        self.alias = alias if alias is not None else settings.LLM_CACHE_ALIAS
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'shared_hits': 0, 'misses': 0, 'evictions': 0}
+
+    @staticmethod
+    def make_key(prompt, provider, model, config):
+        raw = json.dumps(
+            {'prompt': prompt, 'provider': provider, 'model': model, 'config': config},
+            sort_keys=True
+        )
+        return 'llm:' + hashlib.sha256(raw.encode()).hexdigest()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > now:
+                    self._entries.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    return value
+                del self._entries[key]
+
+        shared = self._shared()
+        if shared is not None:
+            value = shared.get(key)
+            if value is not None:
+                self._remember(key, value)
+                self._count('shared_hits')
+                return value
+
+        self._count('misses')
+        return None
+
+    def _remember(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def set(self, key, value):
+        self._remember(key, value)
+        shared = self._shared()
+        if shared is not None:
+            shared.set(key, value, timeout=self.ttl or None)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        shared = self._shared()
+        if shared is not None:
+            shared.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            size = len(self._entries)
+        lookups = counters['memory_hits'] + counters['shared_hits'] + counters['misses']
+        hits = counters['memory_hits'] + counters['shared_hits']
+        return {
+            **counters,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'entries': size,
+            'max_entries': self.max_entries,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LLMCache()
+    return _cache
+
+
+def cached_generate(provider, prompt, **config):
+    """provider.generate() through the LLM cache (when LLM_CACHE_ENABLED)"""
+    if not settings.LLM_CACHE_ENABLED:
+        return provider.generate(prompt, **config)
+
+    cache = get_llm_cache()
+    key = cache.make_key(prompt, provider.name, provider.model_name, provider.generation_config(**config))
+    result = cache.get(key)
+    if result is None:
+        result = provider.generate(prompt, **config)
+        cache.set(key, result)
+    return result
+
+
+@REGISTRY.collector
+def collect_cache():
+    cache = _cache
+    if cache is None:
+        return []
+    stats = cache.stats()
+    return [
+        ('chat_llm_cache_hits_total', 'counter', "LLM cache hits by tier",
+         [({'tier': 'memory'}, stats['memory_hits']), ({'tier': 'shared'}, stats['shared_hits'])]),
+        ('chat_llm_cache_misses_total', 'counter', "LLM cache misses", [({}, stats['misses'])]),
+        ('chat_llm_cache_evictions_total', 'counter', "LLM cache LRU evictions", [({}, stats['evictions'])]),
+        ('chat_llm_cache_hit_ratio', 'gauge', "LLM cache hits / lookups", [({}, stats['hit_rate'])]),
+        ('chat_llm_cache_entries', 'gauge', "Entries in the in-process LLM cache", [({}, stats['entries'])]),
+    ]
+
+
+def _on_setting_changed(setting, **kwargs):
+    global _cache
+    if setting.startswith('LLM_CACHE_'):
+        with _cache_lock:
+            _cache = None
+
+
+setting_changed.connect(_on_setting_changed)
@@ -0,0 +1,219 @@
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils import timezone
+from .metrics import start_query_count, stop_query_count
+from .models import Conversation, Message
+
+
+TOPICS = (
+    'trip to Lisbon', 'pasta recipe', 'python packaging', 'garden planning',
+    'budget spreadsheet', 'job interview', 'marathon training', 'home network',
+)
+
+
+def seed_conversations(conversations, messages, status=None, title_prefix='Bench'):
+    """
+    Bulk-insert synthetic conversations with `messages` messages each and
+    return their ids. `status` defaults to a 2:1 ended/active mix.
+    """
+    now = timezone.now()
+    rows = [
+        Conversation(
+            title=f"{title_prefix} {i}: {TOPICS[i % len(TOPICS)]}",
+            status=status or ('ended' if i % 3 else 'active'),
+            summary=f"Talked about the {TOPICS[i % len(TOPICS)]}",
+            message_count=messages,
+            last_message_at=now - timedelta(minutes=i) if messages else None,
+        )
+        for i in range(conversations)
+    ]
+    created = Conversation.objects.bulk_create(rows, batch_size=500)
+    if created and created[0].pk is None:
+        # Backends that don't return ids from bulk INSERT
+        newest = (
+            Conversation.objects.filter(title__startswith=f"{title_prefix} ")
+            .order_by('-id').values_list('id', flat=True)[:conversations]
+        )
+        for conversation, conversation_id in zip(created, reversed(list(newest))):
+            conversation.pk = conversation_id
+    # start_timestamp is auto_now_add, so the insert stamped every row with now
+    for i, conversation in enumerate(created):
+        conversation.start_timestamp = now - timedelta(minutes=i)
+    Conversation.objects.bulk_update(created, ['start_timestamp'], batch_size=500)
+    conversation_ids = [c.id for c in created]
+
+    batch = []
+    for position, conversation_id in enumerate(conversation_ids):
+        topic = TOPICS[position % len(TOPICS)]
+        for j in range(messages):
+            batch.append(Message(
+                conversation_id=conversation_id,
+                content=f"message {j} about the {topic}",
+                sender='user' if j % 2 == 0 else 'ai',
+            ))
+        if len(batch) >= 5000:
+            Message.objects.bulk_create(batch, batch_size=1000)
+            batch = []
+    Message.objects.bulk_create(batch, batch_size=1000)
+    return conversation_ids
+
+
+def percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def rank(p):
+        return round(ordered[min(len(ordered) - 1, max(math.ceil(p / 100 * len(ordered)) - 1, 0))], 3)
+
+    return {
+        'p50': rank(50),
+        'p95': rank(95),
+        'p99': rank(99),
+        'mean': round(sum(ordered) / len(ordered), 3),
+        'max': round(ordered[-1], 3),
+    }
+
+
+class LoadTest:
+    """
+    Drives the chat API in-process with Django's test clients, one endpoint
+    at a time, `concurrency` requests in flight. Each request records its
+    latency, time to first streamed byte and DB query count.
+    """
+
+    def __init__(self, active_ids, ended_ids, closable_ids, concurrency=8, requests=100):
+        self.active_ids = active_ids
+        self.ended_ids = ended_ids
+        self.closable_ids = list(closable_ids)
+        self.concurrency = concurrency
+        self.requests = requests
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = Client()
+        return self._local.client
+
+    def endpoints(self):
+        return {
+            'list_conversations': self.list_conversations,
+            'get_conversation': self.get_conversation,
+            'send_message': self.send_message,
+            'send_message_stream': self.send_message_stream,
+            'end_conversation': self.end_conversation,
+            'query_conversations': self.query_conversations,
+        }
+
+    def list_conversations(self, i):
+        return self.client().get(reverse('list_conversations'), {'limit': 50}), None
+
+    def get_conversation(self, i):
+        conversation_id = random.choice(self.active_ids + self.ended_ids)
+        return self.client().get(reverse('get_conversation', args=[conversation_id])), None
+
+    def send_message(self, i):
+        response = self.client().post(
+            reverse('send_message'),
+            {'conversation_id': random.choice(self.active_ids), 'message': f"load test question {i}"},
+            content_type='application/json'
+        )
+        return response, None
+
+    def send_message_stream(self, i):
+        return async_to_sync(self._stream)(i)
+
+    async def _stream(self, i):
+        started = time.perf_counter()
+        response = await AsyncClient().post(
+            reverse('send_message_stream'),
+            {'conversation_id': random.choice(self.active_ids), 'message': f"load test question {i}"},
+            content_type='application/json'
+        )
+        first_byte = None
+        if response.streaming:
+            async for _ in response.streaming_content:
+                if first_byte is None:
+                    first_byte = (time.perf_counter() - started) * 1000
+        return response, first_byte
+
+    def end_conversation(self, i):
+        with self._lock:
+            if not self.closable_ids:
+                return None, None
+            conversation_id = self.closable_ids.pop()
+        response = self.client().post(
+            reverse('end_conversation'), {'conversation_id': conversation_id}, content_type='application/json'
+        )
+        return response, None
+
+    def query_conversations(self, i):
+        response = self.client().post(
+            reverse('query_conversations'),
+            {'query': f"What did we decide about the {TOPICS[i % len(TOPICS)]}?"},
+            content_type='application/json'
+        )
+        return response, None
+
+    def _one(self, request, i):
+        counter, token = start_query_count()
+        started = time.perf_counter()
+        try:
+            response, first_byte = request(i)
+        except Exception:
+            response, first_byte = None, None
+        finally:
+            stop_query_count(token)
+        latency = (time.perf_counter() - started) * 1000
+        return latency, first_byte, counter[0], response.status_code if response is not None else 'exception'
+
+    def run_endpoint(self, name):
+        request = self.endpoints()[name]
+        requests = self.requests
+        if name == 'end_conversation':
+            requests = min(requests, len(self.closable_ids))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='loadtest') as pool:
+            results = list(pool.map(lambda i: self._one(request, i), range(requests)))
+        elapsed = time.perf_counter() - started
+
+        statuses = {}
+        for *_, status in results:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        latencies = [latency for latency, _, _, _ in results]
+        first_bytes = [first_byte for _, first_byte, _, _ in results if first_byte is not None]
+        queries = [count for _, _, count, _ in results]
+        return {
+            'requests': requests,
+            'errors': sum(1 for *_, status in results if status == 'exception' or status >= 400),
+            'status_codes': statuses,
+            'seconds': round(elapsed, 3),
+            'throughput_rps': round(requests / elapsed, 2) if elapsed else 0.0,
+            'latency_ms': percentiles(latencies),
+            'time_to_first_byte_ms': percentiles(first_bytes),
+            'db_queries': {
+                'mean': round(sum(queries) / len(queries), 2) if queries else None,
+                'max': max(queries) if queries else None,
+            },
+        }
+
+    def run(self, names=None):
+        return {name: self.run_endpoint(name) for name in (names or self.endpoints())}
+
+
+def dump(report, path=None):
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text + '\n')
+    return text
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from chat.archive import archivable_conversations, archive_conversations
+
+
+class Command(BaseCommand):
+    help = "Pack the messages of long-ended conversations into compressed archives"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', type=int, nargs='+', help="Conversation ids to archive (must be ended)")
+        parser.add_argument('--older-than-days', type=int, default=settings.ARCHIVE_AFTER_DAYS,
+                            help="Archive conversations ended at least this many days ago")
+        parser.add_argument('--limit', type=int, help="Archive at most this many conversations")
+
+    def handle(self, *args, **options):
+        conversation_ids = options['ids'] or archivable_conversations(
+            older_than_days=options['older_than_days'], limit=options['limit']
+        )
+        report = archive_conversations(conversation_ids)
+        ratio = report['raw_bytes'] / report['stored_bytes'] if report['stored_bytes'] else 0
+        self.stdout.write(
+            f"Archived {report['archived']} conversation(s) ({report['messages']} messages, "
+            f"{report['raw_bytes']} -> {report['stored_bytes']} bytes, {ratio:.1f}x); "
+            f"skipped {report['skipped']}"
+        )
@@ -0,0 +1,87 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from chat.loadtest import percentiles, seed_conversations
+from chat.models import Conversation
+
+
+class Command(BaseCommand):
+    help = (
+        "Time list requests with a new database connection per request "
+        "(CONN_MAX_AGE=0) against persistent connections, and the cost of "
+        "opening one connection. Seeded rows are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=200, help="Requests per mode")
+        parser.add_argument('--max-age', type=int, default=60, help="CONN_MAX_AGE of the persistent mode")
+
+    def handle(self, *args, **options):
+        pooled = [alias for alias in connections if connections[alias].settings_dict.get('OPTIONS', {}).get('pool')]
+        if pooled:
+            modes = {'configured (pool)': None}
+        else:
+            modes = {'per request': 0, f'persistent ({options["max_age"]}s)': options['max_age']}
+
+        seeded = seed_conversations(options['conversations'], 0, title_prefix='Bench connections')
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(count)
+        try:
+            # Every request must reach the database
+            with override_settings(RESPONSE_CACHE_ENABLED=False):
+                self.stdout.write(f"{'mode':<20}{'p50 ms':>10}{'mean ms':>10}{'connections':>13}")
+                for name, max_age in modes.items():
+                    timings = self.time_requests(max_age, options['requests'], opened)
+                    self.stdout.write(
+                        f"{name:<20}{timings['p50']:>10.2f}{timings['mean']:>10.2f}{len(opened):>13}"
+                    )
+                connect = self.time_connect(options['requests'])
+                self.stdout.write(f"connect + close: p50 {connect['p50']:.2f} ms, mean {connect['mean']:.2f} ms")
+        finally:
+            connection_created.disconnect(count)
+            connections.close_all()
+            Conversation.objects.filter(id__in=seeded).delete()
+
+    def time_requests(self, max_age, requests, opened):
+        saved = {alias: connections[alias].settings_dict['CONN_MAX_AGE'] for alias in connections}
+        if max_age is not None:
+            for alias in connections:
+                connections[alias].settings_dict['CONN_MAX_AGE'] = max_age
+        connections.close_all()
+        opened.clear()
+        client = Client()
+        url = reverse('list_conversations')
+        timings = []
+        try:
+            for _ in range(requests):
+                started = time.perf_counter()
+                # The test client skips the handler's request_started/finished cleanup
+                close_old_connections()
+                client.get(url)
+                close_old_connections()
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connections.close_all()
+            for alias, value in saved.items():
+                connections[alias].settings_dict['CONN_MAX_AGE'] = value
+        return percentiles(timings)
+
+    def time_connect(self, repeat):
+        connection = connections['default']
+        connection.close()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            connection.connect()
+            connection.close()
+            timings.append((time.perf_counter() - started) * 1000)
+        return percentiles(timings)
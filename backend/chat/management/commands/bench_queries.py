@@ -0,0 +1,102 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from chat.loadtest import seed_conversations
+from chat.models import Conversation, Message
+from chat.pagination import keyset_queryset
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic conversations and time the hot read queries with and "
+        "without the composite indexes. Runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=2000)
+        parser.add_argument('--messages', type=int, default=40, help="Messages per conversation")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per query")
+        parser.add_argument('--explain', action='store_true', help="Print the query plans")
+        parser.add_argument('--keep', action='store_true', help="Commit the seeded rows")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                conversation_ids = self.seed(options['conversations'], options['messages'])
+                queries = self.queries(conversation_ids)
+
+                indexed = self.run(queries, options)
+                self.toggle_indexes(drop=True)
+                unindexed = self.run(queries, options)
+                self.toggle_indexes(drop=False)
+
+                self.report(indexed, unindexed)
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write("Rolled back seeded rows")
+
+    def seed(self, conversations, messages):
+        self.stdout.write(f"Seeding {conversations} conversation(s) x {messages} message(s)...")
+        return seed_conversations(conversations, messages)
+
+    def queries(self, conversation_ids):
+        sample = random.Random(0).choice(conversation_ids)
+        week_ago = timezone.now() - timedelta(days=7)
+        history = Message.objects.filter(conversation_id=sample)
+        return {
+            'list page': lambda: keyset_queryset(Conversation.objects.all(), None, 50),
+            'list page (status)': lambda: keyset_queryset(Conversation.objects.filter(status='ended'), None, 50),
+            'list page (Count annotation)': lambda: keyset_queryset(
+                Conversation.objects.annotate(counted=Count('messages')), None, 50
+            ),
+            'history': lambda: history.order_by('timestamp', 'id'),
+            'context tail': lambda: history.order_by('-timestamp', '-id')[:30],
+            'after_id page': lambda: history.filter(id__gt=0).order_by('id')[:50],
+            'ended in range': lambda: Conversation.objects.filter(
+                status='ended', start_timestamp__gte=week_ago
+            ).order_by('-start_timestamp')[:20],
+        }
+
+    def run(self, queries, options):
+        results = {}
+        for name, make in queries.items():
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(make())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+            if options['explain']:
+                self.stdout.write(f"-- {name}\n{make().explain()}")
+        return results
+
+    def toggle_indexes(self, drop):
+        # Only generate the DDL: SQLite refuses to enter a schema editor
+        # inside a transaction, and we want to roll the drop back anyway
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model in (Conversation, Message):
+                for index in model._meta.indexes:
+                    if index.condition is not None:
+                        continue
+                    if drop:
+                        cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+                    else:
+                        cursor.execute(str(index.create_sql(model, editor)))
+
+    def report(self, indexed, unindexed):
+        self.stdout.write(f"{'query':<32}{'indexed ms':>12}{'no index ms':>14}{'speedup':>10}")
+        for name, fast in indexed.items():
+            slow = unindexed[name]
+            speedup = slow / fast if fast else 0
+            self.stdout.write(f"{name:<32}{fast:>12.2f}{slow:>14.2f}{speedup:>9.1f}x")
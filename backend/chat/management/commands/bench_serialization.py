@@ -0,0 +1,84 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from chat import fastjson
+from chat.loadtest import seed_conversations
+from chat.models import Conversation
+from chat.pagination import keyset_page
+from chat.serializers import ConversationDetailSerializer, ConversationListSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the DRF serializer + JSONRenderer path against the fastjson path "
+        "for conversation detail and list responses. Seeded rows are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000, help="Messages in the detail conversation")
+        parser.add_argument('--conversations', type=int, default=200, help="Conversations for the list page")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed runs per path")
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"Encoder: {'orjson' if fastjson.orjson is not None else 'json (stdlib)'}"
+        )
+        try:
+            with transaction.atomic():
+                conversation_id = seed_conversations(1, options['messages'], title_prefix='Serialize')[0]
+                seed_conversations(options['conversations'], 0, title_prefix='Serialize list')
+                self.report(self.cases(conversation_id), options['repeat'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Rolled back seeded rows")
+
+    def cases(self, conversation_id):
+        renderer = JSONRenderer()
+        limit = 200
+
+        def drf_detail():
+            conversation = Conversation.objects.get(id=conversation_id)
+            data = {'success': True, 'conversation': ConversationDetailSerializer(conversation).data}
+            return renderer.render(data)
+
+        def fast_detail():
+            conversation = Conversation.objects.get(id=conversation_id)
+            messages = fastjson.message_rows(conversation.messages.all())
+            return fastjson.dumps({'success': True, 'conversation': fastjson.conversation_header(conversation, messages)})
+
+        def drf_list():
+            page, cursor = keyset_page(Conversation.objects.all(), limit=limit)
+            data = ConversationListSerializer(page, many=True).data
+            return renderer.render({'success': True, 'count': len(page), 'next_cursor': cursor, 'conversations': data})
+
+        def fast_list():
+            page, cursor = keyset_page(Conversation.objects.values(*fastjson.LIST_FIELDS), limit=limit)
+            data = fastjson.conversation_rows(page)
+            return fastjson.dumps({'success': True, 'count': len(page), 'next_cursor': cursor, 'conversations': data})
+
+        return {
+            'detail': (drf_detail, fast_detail),
+            f'list ({limit})': (drf_list, fast_list),
+        }
+
+    def time(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def report(self, cases, repeat):
+        self.stdout.write(f"{'response':<16}{'drf ms':>10}{'fast ms':>10}{'speedup':>10}{'same bytes':>12}")
+        for name, (drf, fast) in cases.items():
+            same = drf() == fast()
+            slow_ms, fast_ms = self.time(drf, repeat), self.time(fast, repeat)
+            speedup = slow_ms / fast_ms if fast_ms else 0
+            self.stdout.write(f"{name:<16}{slow_ms:>10.2f}{fast_ms:>10.2f}{speedup:>9.1f}x{str(same):>12}")
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from chat.bulk import end_conversations, idle_conversations, summarize_conversations
+from chat.jobs import requeue_failed
+
+
+class Command(BaseCommand):
+    help = "End active conversations by id or idle time and summarize them in bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', type=int, nargs='+', help="Conversation ids to end")
+        parser.add_argument('--idle-minutes', type=int, help="End conversations idle for this long")
+        parser.add_argument('--limit', type=int, default=settings.BULK_MAX_CONVERSATIONS)
+        parser.add_argument('--workers', type=int, default=settings.BULK_WORKERS)
+        parser.add_argument('--rate', type=float, default=settings.BULK_RATE_LIMIT,
+                            help="Provider calls per second (0 = unlimited)")
+        parser.add_argument('--batch-size', type=int, default=settings.BULK_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if not options['ids'] and not options['idle_minutes']:
+            raise CommandError("Pass --ids or --idle-minutes")
+
+        conversation_ids = end_conversations(idle_conversations(
+            conversation_ids=options['ids'],
+            idle_minutes=options['idle_minutes'],
+            limit=options['limit']
+        ))
+        self.stdout.write(f"Ended {len(conversation_ids)} conversation(s)")
+        if not conversation_ids:
+            return
+
+        def progress(report):
+            done = report['summarized'] + len(report['failed'])
+            self.stdout.write(
+                f"  {done}/{report['total']} done, {len(report['failed'])} failed, "
+                f"{report['per_second']}/s"
+            )
+
+        report = summarize_conversations(
+            conversation_ids,
+            workers=options['workers'],
+            rate=options['rate'],
+            batch_size=options['batch_size'],
+            progress=progress
+        )
+        requeue_failed(report['failed'])
+        self.stdout.write(
+            f"Summarized {report['summarized']} conversation(s) in {report['seconds']}s "
+            f"({report['per_second']}/s); {len(report['failed'])} requeued as jobs"
+        )
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from chat.loadtest import LoadTest, dump, seed_conversations
+from chat.models import Conversation
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic conversations and load-test the chat API in-process "
+        "against the stub LLM. Prints a JSON report per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=300)
+        parser.add_argument('--messages', type=int, default=20, help="Messages per seeded conversation")
+        parser.add_argument('--requests', type=int, default=100, help="Requests per endpoint")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--stub-latency-ms', type=int, default=200)
+        parser.add_argument('--stub-tokens-per-second', type=float, default=200)
+        parser.add_argument('--endpoints', nargs='+', help="Subset of endpoints to run")
+        parser.add_argument('--output', help="Also write the JSON report to this file")
+        parser.add_argument('--keep', action='store_true', help="Keep the seeded conversations")
+
+    def handle(self, *args, **options):
+        overrides = override_settings(
+            LLM_PROVIDER='stub',
+            LLM_STUB_LATENCY_MS=options['stub_latency_ms'],
+            LLM_STUB_TOKENS_PER_SECOND=options['stub_tokens_per_second'],
+            LLM_RATE_LIMIT=0,
+            # Leave jobs queued and the on-disk index alone while measuring
+            JOB_BACKEND='db',
+            EMBEDDING_INDEX_DIR='',
+        )
+        with overrides:
+            self.stderr.write(f"Seeding {options['conversations']} conversation(s)...")
+            seeded = seed_conversations(options['conversations'], options['messages'], title_prefix='Loadtest')
+            closable = seed_conversations(
+                options['requests'], options['messages'], status='active', title_prefix='Loadtest closable'
+            )
+            statuses = dict(Conversation.objects.filter(id__in=seeded).values_list('id', 'status'))
+            try:
+                test = LoadTest(
+                    active_ids=[cid for cid in seeded if statuses[cid] == 'active'],
+                    ended_ids=[cid for cid in seeded if statuses[cid] == 'ended'],
+                    closable_ids=closable,
+                    concurrency=options['concurrency'],
+                    requests=options['requests'],
+                )
+                unknown = set(options['endpoints'] or []) - set(test.endpoints())
+                if unknown:
+                    raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+
+                results = {}
+                for name in options['endpoints'] or test.endpoints():
+                    self.stderr.write(f"Running {name}...")
+                    results[name] = test.run_endpoint(name)
+            finally:
+                if not options['keep']:
+                    Conversation.objects.filter(id__in=seeded + closable).delete()
+
+        report = {
+            'config': {
+                key: options[key] for key in (
+                    'conversations', 'messages', 'requests', 'concurrency',
+                    'stub_latency_ms', 'stub_tokens_per_second',
+                )
+            },
+            'endpoints': results,
+        }
+        self.stdout.write(dump(report, options['output']))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from chat.embeddings import get_index, index_conversation
+from chat.models import Conversation
+
+
+class Command(BaseCommand):
+    help = "Re-embed ended conversations into the semantic index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Include active conversations")
+
+    def handle(self, *args, **options):
+        conversations = Conversation.objects.all() if options['all'] else Conversation.objects.filter(status='ended')
+        index = get_index()
+        index.clear()
+        total = 0
+        for conversation_id in conversations.values_list('id', flat=True).iterator():
+            total += index_conversation(conversation_id, save=False)
+        index.save()
+        self.stdout.write(f"Indexed {total} chunk(s); index holds {len(index)} row(s)")
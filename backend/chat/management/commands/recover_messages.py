@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from chat.writes import recover_orphaned_messages
+
+
+class Command(BaseCommand):
+    help = "Finalize or prune AI placeholders left by interrupted streams"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=settings.ORPHAN_MESSAGE_SECONDS,
+            help="Only touch placeholders older than this many seconds"
+        )
+
+    def handle(self, *args, **options):
+        finalized, pruned = recover_orphaned_messages(options['older_than'])
+        self.stdout.write(f"Finalized {finalized} partial message(s), pruned {pruned} empty placeholder(s)")
@@ -0,0 +1,37 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from chat.jobs import due_jobs, enqueue_archival, get_executor, requeue_stale, run_in_thread, run_once
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (for JOB_BACKEND='db')"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain due jobs once and exit")
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        executor = get_executor()
+        next_archival = time.monotonic()
+        while True:
+            requeued = requeue_stale(settings.JOB_STALE_SECONDS)
+            if requeued:
+                self.stdout.write(f"Requeued {requeued} stale job(s)")
+
+            # Periodic archival pass (see chat.archive)
+            if settings.ARCHIVE_INTERVAL_SECONDS and time.monotonic() >= next_archival:
+                enqueue_archival()
+                next_archival = time.monotonic() + settings.ARCHIVE_INTERVAL_SECONDS
+
+            job_ids = due_jobs(settings.JOB_WORKERS * 4)
+            # Retries are re-queued with run_after, so a single attempt per pass is enough
+            for future in [executor.submit(run_in_thread, run_once, job_id) for job_id in job_ids]:
+                future.result()
+            if job_ids:
+                self.stdout.write(f"Processed {len(job_ids)} job(s)")
+
+            if options['once']:
+                return
+            if not job_ids:
+                time.sleep(options['poll_interval'])
@@ -0,0 +1,251 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from .context import estimate_tokens
+
+
+# Latency buckets in seconds, from a cache hit to a long LLM call
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 400, 800)
+
+
+def format_labels(pairs):
+    if not pairs:
+        return ''
+    rendered = ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + rendered + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _labels(self, key, extra=()):
+        return format_labels(list(zip(self.labelnames, key)) + list(extra))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = [(key, self._snapshot(value)) for key, value in self._values.items()]
+        for key, value in sorted(items):
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _snapshot(self, value):
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{self._labels(key)} {value}"]
+
+
+class Histogram(Metric):
+    """Cumulative buckets are only computed at render time; observe() bumps one slot"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=TIME_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        series = self._values.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _snapshot(self, value):
+        return [list(value[0]), value[1], value[2]]
+
+    def _render_value(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else repr(float(bound))
+            lines.append(f"{self.name}_bucket{self._labels(key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {total}")
+        lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, func):
+        """
+        Register func() -> [(name, kind, help, [(labels, value)])]. Collectors
+        read existing stats objects at scrape time, so they cost nothing per request.
+        """
+        self.collectors.append(func)
+        return func
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            for name, kind, documentation, samples in collect():
+                lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"])
+                lines.extend(f"{name}{format_labels(sorted(labels.items()))} {value}" for labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+    def clear(self):
+        for metric in self.metrics:
+            metric.clear()
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    'chat_http_requests_total', "HTTP requests by view, method and status", ['view', 'method', 'status']
+))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    'chat_http_request_seconds', "Time to response headers by view", ['view']
+))
+DB_QUERIES = REGISTRY.register(Histogram(
+    'chat_db_queries_per_request', "Database queries per request by view", ['view'], buckets=COUNT_BUCKETS
+))
+DB_CONNECTIONS = REGISTRY.register(Counter(
+    'chat_db_connections_total', "Database connections opened (or taken from the pool) by alias", ['alias']
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'chat_stage_seconds', "Time spent in each stage of the chat pipeline", ['stage']
+))
+LLM_SECONDS = REGISTRY.register(Histogram(
+    'chat_llm_seconds', "Provider call duration (whole stream for streams)", ['provider', 'operation']
+))
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.register(Histogram(
+    'chat_llm_first_token_seconds', "Time to the first streamed chunk", ['provider']
+))
+LLM_TOKENS_PER_SECOND = REGISTRY.register(Histogram(
+    'chat_llm_tokens_per_second', "Estimated output tokens per second of streamed replies", ['provider'],
+    buckets=RATE_BUCKETS
+))
+LLM_ERRORS = REGISTRY.register(Counter(
+    'chat_llm_errors_total', "Failed provider calls", ['provider', 'operation', 'error']
+))
+PROMPT_CHARS = REGISTRY.register(Histogram(
+    'chat_prompt_chars', "Prompt size in characters", ['kind'], buckets=SIZE_BUCKETS
+))
+PROMPT_TOKENS = REGISTRY.register(Histogram(
+    'chat_prompt_tokens', "Estimated prompt size in tokens", ['kind'], buckets=SIZE_BUCKETS
+))
+
+
+def stage(name):
+    """Context manager timing one pipeline stage into chat_stage_seconds"""
+    return STAGE_SECONDS.time(stage=name)
+
+
+def observe_prompt(kind, prompt):
+    PROMPT_CHARS.observe(len(prompt), kind=kind)
+    PROMPT_TOKENS.observe(estimate_tokens(prompt), kind=kind)
+
+
+# Per-request query counters. Counters nest (a load test can count around
+# the middleware's own), and the lists are shared by reference, so queries
+# run in sync_to_async threads (which copy the context) still count.
+_query_counters = contextvars.ContextVar('chat_query_counters', default=())
+
+
+def count_queries(execute, sql, params, many, context):
+    for counter in _query_counters.get():
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver: count the connection and every query on it"""
+    DB_CONNECTIONS.inc(alias=connection.alias)
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def start_query_count():
+    counter = [0]
+    return counter, _query_counters.set(_query_counters.get() + (counter,))
+
+
+def stop_query_count(token):
+    _query_counters.reset(token)
+
+
+class StreamTimer:
+    """Records time to first chunk, total duration and output rate of one provider stream"""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.started = time.perf_counter()
+        self.first_chunk_at = None
+        self.chars = 0
+
+    def chunk(self, text):
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.perf_counter()
+            LLM_FIRST_TOKEN_SECONDS.observe(self.first_chunk_at - self.started, provider=self.provider)
+        self.chars += len(text)
+
+    def finish(self, error=None):
+        now = time.perf_counter()
+        LLM_SECONDS.observe(now - self.started, provider=self.provider, operation='stream')
+        if error is not None:
+            LLM_ERRORS.inc(provider=self.provider, operation='stream', error=type(error).__name__)
+        elif self.first_chunk_at is not None and now > self.first_chunk_at:
+            # ~4 characters per token, as in estimate_tokens()
+            LLM_TOKENS_PER_SECOND.observe(self.chars / 4 / (now - self.first_chunk_at), provider=self.provider)
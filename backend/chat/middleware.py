@@ -0,0 +1,55 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from . import metrics
+
+
+class MetricsMiddleware:
+    """
+    Counts requests and records time to response headers and DB queries per
+    request, labelled by URL name. A streaming body is produced after this
+    returns, so its timing comes from the stage/LLM metrics instead.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        counter, token = metrics.start_query_count()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.stop_query_count(token)
+        self.record(request, response, started, counter[0])
+        return response
+
+    async def __acall__(self, request):
+        counter, token = metrics.start_query_count()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.stop_query_count(token)
+        self.record(request, response, started, counter[0])
+        return response
+
+    def record(self, request, response, started, queries):
+        match = request.resolver_match
+        view = match.url_name if match and match.url_name else 'unmatched'
+        if view == 'metrics':
+            return
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - started, view=view)
+        metrics.HTTP_REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        metrics.DB_QUERIES.observe(queries, view=view)
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:49
+
+from django.db import migrations, models
+
+
+# The FTS5 sync triggers from 0004_fulltext_search, frozen
+SQLITE_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS conversations_fts_ai AFTER INSERT ON conversations BEGIN
+        INSERT INTO conversations_fts(rowid, title, summary) VALUES (new.id, new.title, new.summary);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS conversations_fts_ad AFTER DELETE ON conversations BEGIN
+        INSERT INTO conversations_fts(conversations_fts, rowid, title, summary)
+        VALUES ('delete', old.id, old.title, old.summary);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS conversations_fts_au AFTER UPDATE OF title, summary ON conversations BEGIN
+        INSERT INTO conversations_fts(conversations_fts, rowid, title, summary)
+        VALUES ('delete', old.id, old.title, old.summary);
+        INSERT INTO conversations_fts(rowid, title, summary) VALUES (new.id, new.title, new.summary);
+    END""",
+]
+
+
+def restore_fulltext_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in SQLITE_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='is_complete',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_complete', False)), fields=['timestamp'], name='messages_incomplete_idx'),
+        ),
+        # Adding the column rebuilds the table on SQLite, which drops the FTS triggers
+        migrations.RunPython(restore_fulltext_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_query_indexes_and_message_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_message_id', models.BigIntegerField()),
+                ('last_message_id', models.BigIntegerField()),
+                ('message_count', models.PositiveIntegerField()),
+                ('summary', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunk_summaries', to='chat.conversation')),
+            ],
+            options={
+                'db_table': 'chunk_summaries',
+                'ordering': ['conversation', 'first_message_id'],
+                'constraints': [models.UniqueConstraint(fields=('conversation', 'first_message_id'), name='chunk_summaries_conv_first_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_chunk_summaries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationDigest',
+            fields=[
+                ('conversation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='digest', serialize=False, to='chat.conversation')),
+                ('through', models.BigIntegerField(default=0)),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('char_count', models.PositiveBigIntegerField(default=0)),
+                ('first_user_message', models.TextField(blank=True, default='')),
+                ('terms', models.JSONField(blank=True, default=dict)),
+                ('transcript', models.BinaryField(default=b'')),
+                ('tail', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'conversation_digests',
+            },
+        ),
+    ]
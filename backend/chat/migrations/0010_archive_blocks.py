@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_conversation_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversationarchive',
+            name='blocks',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -12,10 +12,24 @@ class Conversation(models.Model):
     start_timestamp = models.DateTimeField(auto_now_add=True)
     end_timestamp = models.DateTimeField(null=True, blank=True)
     summary = models.TextField(blank=True, null=True)
+    # Rolling summary of turns that have slid out of the prompt window
+    context_summary = models.TextField(blank=True, default='')
+    context_summary_through = models.BigIntegerField(null=True, blank=True)
+    # Denormalized from messages; kept current by add_messages()
+    message_count = models.PositiveIntegerField(default=0)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    # Set once the messages have moved to a ConversationArchive
+    archived_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         db_table = 'conversations'
         ordering = ['-start_timestamp']
+        indexes = [
+            # Keyset pagination in list_conversations
+            models.Index(fields=['start_timestamp', 'id'], name='conversations_start_id_idx'),
+            # status='ended' + date range in query_past_conversations
+            models.Index(fields=['status', 'start_timestamp'], name='conversations_status_start_idx'),
+        ]
     
     def __str__(self):
         return f"Conversation {self.id} - {self.status}"
@@ -24,7 +38,15 @@ class Conversation(models.Model):
         """End the conversation and set end timestamp"""
         self.status = 'ended'
         self.end_timestamp = timezone.now()
-        self.save()
+        self.save(update_fields=['status', 'end_timestamp'])
+
+    @classmethod
+    def add_messages(cls, conversation_id, count, last_message_at=None):
+        """Atomically adjust the denormalized message counters (count may be negative)"""
+        changes = {'message_count': models.F('message_count') + count}
+        if last_message_at is not None:
+            changes['last_message_at'] = last_message_at
+        cls.objects.filter(id=conversation_id).update(**changes)
 
 
 class Message(models.Model):
@@ -36,15 +58,158 @@ class Message(models.Model):
     conversation = models.ForeignKey(
         Conversation, 
         on_delete=models.CASCADE, 
-        related_name='messages'
+        related_name='messages',
+        # Covered by the composite indexes below
+        db_index=False
     )
     content = models.TextField()
     sender = models.CharField(max_length=10, choices=SENDER_CHOICES)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # False while an AI reply is still streaming into this row
+    is_complete = models.BooleanField(default=True)
     
     class Meta:
         db_table = 'messages'
         ordering = ['timestamp']
+        indexes = [
+            # Conversation history in time order, tails and first message
+            models.Index(fields=['conversation', 'timestamp'], name='messages_conv_ts_idx'),
+            # after_id pagination and id-ordered streaming
+            models.Index(fields=['conversation', 'id'], name='messages_conv_id_idx'),
+            # Small partial index for recover_orphaned_messages()
+            models.Index(
+                fields=['timestamp'],
+                condition=models.Q(is_complete=False),
+                name='messages_incomplete_idx'
+            ),
+        ]
     
     def __str__(self):
-        return f"{self.sender} - {self.content[:50]}"
\ No newline at end of file
+        return f"{self.sender} - {self.content[:50]}"
+
+
+class ConversationDigest(models.Model):
+    """
+    Running aggregates over a conversation's complete messages, folded in by
+    message id as they are saved (see chat.digest), so summarizing, titling
+    and querying read one row instead of the whole message set.
+    """
+    conversation = models.OneToOneField(
+        Conversation,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='digest'
+    )
+    # Id of the last message folded in; everything up to it is complete
+    through = models.BigIntegerField(default=0)
+    message_count = models.PositiveIntegerField(default=0)
+    char_count = models.PositiveBigIntegerField(default=0)
+    first_user_message = models.TextField(blank=True, default='')
+    # Most frequent terms (see search.search_terms) -> count, capped in size
+    terms = models.JSONField(default=dict, blank=True)
+    # 'SENDER: content' lines: full zlib blocks, then the uncompressed tail
+    transcript = models.BinaryField(default=b'')
+    tail = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'conversation_digests'
+
+    def __str__(self):
+        return f"Digest of {self.conversation_id} through {self.through}"
+
+
+class ConversationArchive(models.Model):
+    """
+    The messages of an ended conversation packed into one compressed blob
+    (see chat.archive); their rows are removed from the messages table.
+    """
+    conversation = models.OneToOneField(
+        Conversation,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='archive'
+    )
+    message_count = models.PositiveIntegerField()
+    # Size of the uncompressed NDJSON, for reporting
+    raw_bytes = models.PositiveBigIntegerField()
+    data = models.BinaryField()
+    # [highest message id, end offset in data] per compressed block; empty
+    # for archives written as a single stream
+    blocks = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'conversation_archives'
+
+    def __str__(self):
+        return f"Archive of {self.conversation_id} ({self.message_count} messages)"
+
+
+class ChunkSummary(models.Model):
+    """
+    Summary of a sealed, contiguous run of messages (first..last id) used by
+    the map-reduce summarizer. Chunks never change once written, so a longer
+    version of the conversation only summarizes the messages after them.
+    """
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='chunk_summaries'
+    )
+    first_message_id = models.BigIntegerField()
+    last_message_id = models.BigIntegerField()
+    message_count = models.PositiveIntegerField()
+    summary = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'chunk_summaries'
+        ordering = ['conversation', 'first_message_id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['conversation', 'first_message_id'],
+                name='chunk_summaries_conv_first_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Chunk {self.first_message_id}-{self.last_message_id} of {self.conversation_id}"
+
+
+class Job(models.Model):
+    """A unit of background work (e.g. summarizing an ended conversation)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    conversation = models.ForeignKey(
+        Conversation,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        null=True,
+        blank=True
+    )
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'jobs'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='jobs_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} - {self.kind} ({self.status})"
\ No newline at end of file
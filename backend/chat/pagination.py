@@ -0,0 +1,73 @@
+import base64
+from datetime import datetime
+from django.db.models import Q
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, pk):
+    """Encode a (timestamp, id) keyset position as an opaque cursor"""
+    raw = f"{timestamp.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor back into (timestamp, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        timestamp, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Clamp a ?limit= query parameter into [1, maximum]"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor('Invalid limit')
+    return max(1, min(limit, maximum))
+
+
+def keyset_queryset(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE,
+                    field='start_timestamp'):
+    """The unevaluated `limit + 1` rows keyset_page() fetches"""
+    queryset = queryset.order_by(f'-{field}', '-id')
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{field}__lt': timestamp}) |
+            Q(**{field: timestamp, 'id__lt': pk})
+        )
+    return queryset[:limit + 1]
+
+
+def keyset_page(queryset, cursor=None, limit=DEFAULT_PAGE_SIZE,
+                field='start_timestamp'):
+    """
+    Return one page of `queryset` ordered newest-first on (field, id),
+    plus the cursor for the next page (None on the last page).
+
+    Only `limit + 1` rows are fetched, so cost does not grow with offset.
+    """
+    rows = list(keyset_queryset(queryset, cursor, limit, field))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        # Rows are model instances, or dicts for .values() querysets
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last[field], last['id'])
+        else:
+            next_cursor = encode_cursor(getattr(last, field), last.id)
+    return rows, next_cursor
@@ -0,0 +1,314 @@
+import asyncio
+import hashlib
+import threading
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.test.signals import setting_changed
+from .llm_cache import LLMCache
+from .metrics import LLM_ERRORS, LLM_SECONDS, REGISTRY, StreamTimer
+from .resilience import Resilience
+
+
+class LLMProvider:
+    """
+    Interface for text-generation backends used by AIService.
+
+    Providers are long-lived: get_provider() returns one shared instance
+    per provider name, so clients and connections are built once per process.
+
+    Subclasses implement _generate/_stream/_astream; the public methods
+    run them through the provider's Resilience guard (rate limit, circuit
+    breaker, retries and single-flight) when LLM_RESILIENCE_ENABLED.
+    """
+
+    name = None
+
+    def __init__(self):
+        self.model_name = settings.LLM_MODEL
+        self.temperature = settings.LLM_TEMPERATURE
+        self.max_output_tokens = settings.LLM_MAX_OUTPUT_TOKENS
+        self.resilience = Resilience() if settings.LLM_RESILIENCE_ENABLED else None
+
+    def generation_config(self, **overrides):
+        config = {
+            'temperature': self.temperature,
+            'max_output_tokens': self.max_output_tokens,
+        }
+        config.update(overrides)
+        return config
+
+    def is_retryable(self, error):
+        """Whether `error` is a transient upstream failure worth retrying"""
+        return isinstance(error, (ConnectionError, TimeoutError))
+
+    def generate(self, prompt, **config):
+        """Return the full completion for `prompt` as a string"""
+        started = time.perf_counter()
+        try:
+            if self.resilience is None:
+                return self._generate(prompt, **config)
+            key = LLMCache.make_key(prompt, self.name, self.model_name, self.generation_config(**config))
+            return self.resilience.call(lambda: self._generate(prompt, **config), self.is_retryable, key=key)
+        except Exception as e:
+            LLM_ERRORS.inc(provider=self.name, operation='generate', error=type(e).__name__)
+            raise
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - started, provider=self.name, operation='generate')
+
+    def stream(self, prompt, **config):
+        """Yield the completion for `prompt` as text chunks"""
+        guard = self.resilience
+        if guard is not None:
+            wait = guard.admit()
+            if wait:
+                time.sleep(wait)
+
+        timer = StreamTimer(self.name)
+        iterator = self._stream(prompt, **config)
+        error, completed = None, False
+        try:
+            for chunk in iterator:
+                timer.chunk(chunk)
+                yield chunk
+            completed = True
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            iterator.close()
+            timer.finish(error)
+            if guard is not None:
+                guard.finish_stream(error, completed, self.is_retryable)
+
+    async def astream(self, prompt, **config):
+        """Async version of stream()"""
+        guard = self.resilience
+        if guard is not None:
+            wait = guard.admit()
+            if wait:
+                await asyncio.sleep(wait)
+
+        timer = StreamTimer(self.name)
+        iterator = self._astream(prompt, **config)
+        error, completed = None, False
+        try:
+            async for chunk in iterator:
+                timer.chunk(chunk)
+                yield chunk
+            completed = True
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            await iterator.aclose()
+            timer.finish(error)
+            if guard is not None:
+                guard.finish_stream(error, completed, self.is_retryable)
+
+    def _generate(self, prompt, **config):
+        raise NotImplementedError
+
+    def _stream(self, prompt, **config):
+        raise NotImplementedError
+
+    async def _astream(self, prompt, **config):
+        """
+        The default pulls each chunk from the sync _stream() in a worker
+        thread; providers with a native async client should override it.
+        """
+        iterator = self._stream(prompt, **config)
+        sentinel = object()
+        next_chunk = sync_to_async(next, thread_sensitive=False)
+        try:
+            while True:
+                chunk = await next_chunk(iterator, sentinel)
+                if chunk is sentinel:
+                    break
+                yield chunk
+        finally:
+            iterator.close()
+
+    def stats(self):
+        return self.resilience.stats() if self.resilience is not None else {}
+
+
+class GeminiProvider(LLMProvider):
+    name = 'gemini'
+
+    def __init__(self):
+        super().__init__()
+        import google.generativeai as genai
+
+        self._genai = genai
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def model(self, model_name=None):
+        """Return a cached GenerativeModel so clients are reused across calls"""
+        model_name = model_name or self.model_name
+        model = self._models.get(model_name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(model_name)
+                if model is None:
+                    model = self._genai.GenerativeModel(model_name)
+                    self._models[model_name] = model
+        return model
+
+    def _config(self, config):
+        return self._genai.types.GenerationConfig(**self.generation_config(**config))
+
+    def is_retryable(self, error):
+        # google.api_core exceptions carry the HTTP status as `code`
+        return getattr(error, 'code', None) in (429, 500, 502, 503, 504) or super().is_retryable(error)
+
+    def _generate(self, prompt, **config):
+        response = self.model().generate_content(prompt, generation_config=self._config(config))
+        return response.text
+
+    def _stream(self, prompt, **config):
+        response = self.model().generate_content(
+            prompt,
+            stream=True,
+            generation_config=self._config(config)
+        )
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    async def _astream(self, prompt, **config):
+        response = await self.model().generate_content_async(
+            prompt,
+            stream=True,
+            generation_config=self._config(config)
+        )
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class StubProvider(LLMProvider):
+    """
+    Deterministic offline backend for tests and load testing.
+
+    The reply depends only on the prompt, arrives after LLM_STUB_LATENCY_MS
+    and then streams at LLM_STUB_TOKENS_PER_SECOND (0 disables the delay).
+    """
+
+    name = 'stub'
+
+    WORDS = (
+        'the', 'conversation', 'assistant', 'answer', 'summary', 'user',
+        'topic', 'point', 'detail', 'question', 'result', 'idea',
+    )
+
+    def __init__(self):
+        super().__init__()
+        self.latency = settings.LLM_STUB_LATENCY_MS / 1000
+        self.tokens_per_second = settings.LLM_STUB_TOKENS_PER_SECOND
+        self.response_tokens = settings.LLM_STUB_RESPONSE_TOKENS
+
+    def tokens(self, prompt, **config):
+        digest = hashlib.sha256(prompt.encode()).digest()
+        count = min(self.response_tokens, self.generation_config(**config)['max_output_tokens'])
+        tokens = [f"Stub-{digest[:4].hex()}"]
+        for i in range(1, count):
+            tokens.append(' ' + self.WORDS[digest[i % len(digest)] % len(self.WORDS)])
+        return tokens
+
+    def _token_delay(self):
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0
+
+    def _generate(self, prompt, **config):
+        tokens = self.tokens(prompt, **config)
+        time.sleep(self.latency + self._token_delay() * len(tokens))
+        return ''.join(tokens)
+
+    def _stream(self, prompt, **config):
+        time.sleep(self.latency)
+        delay = self._token_delay()
+        for token in self.tokens(prompt, **config):
+            if delay:
+                time.sleep(delay)
+            yield token
+
+    async def _astream(self, prompt, **config):
+        await asyncio.sleep(self.latency)
+        delay = self._token_delay()
+        for token in self.tokens(prompt, **config):
+            if delay:
+                await asyncio.sleep(delay)
+            yield token
+
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    StubProvider.name: StubProvider,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_provider(name=None):
+    """Return the process-wide provider instance for `name` (default LLM_PROVIDER)"""
+    name = name or settings.LLM_PROVIDER
+    provider = _instances.get(name)
+    if provider is None:
+        with _instances_lock:
+            provider = _instances.get(name)
+            if provider is None:
+                try:
+                    provider_class = PROVIDERS[name]
+                except KeyError:
+                    raise ValueError(f"Unknown LLM provider: {name}")
+                provider = provider_class()
+                _instances[name] = provider
+    return provider
+
+
+@REGISTRY.collector
+def collect_resilience():
+    breaker_states = {'closed': 0, 'half_open': 1, 'open': 2}
+    samples = {
+        'retries': [], 'failures': [], 'rate_limited': [], 'throttled': [],
+        'short_circuited': [], 'coalesced': [], 'breaker_state': [],
+    }
+    for provider in list(_instances.values()):
+        if provider.resilience is None:
+            continue
+        stats = provider.stats()
+        labels = {'provider': provider.name, 'model': provider.model_name}
+        samples['retries'].append((labels, stats['retries']))
+        samples['failures'].append((labels, stats['failures']))
+        samples['rate_limited'].append((labels, stats['rate_limit']['rejected']))
+        samples['throttled'].append((labels, stats['rate_limit']['throttled']))
+        samples['short_circuited'].append((labels, stats['circuit_breaker']['short_circuited']))
+        samples['coalesced'].append((labels, (stats['single_flight'] or {}).get('coalesced', 0)))
+        samples['breaker_state'].append((labels, breaker_states[stats['circuit_breaker']['state']]))
+    return [
+        ('chat_llm_retries_total', 'counter', "Provider calls retried", samples['retries']),
+        ('chat_llm_failures_total', 'counter', "Provider calls that failed after retries", samples['failures']),
+        ('chat_llm_rate_limited_total', 'counter', "Calls rejected by the token bucket", samples['rate_limited']),
+        ('chat_llm_throttled_total', 'counter', "Calls delayed by the token bucket", samples['throttled']),
+        ('chat_llm_short_circuited_total', 'counter', "Calls rejected by the open circuit", samples['short_circuited']),
+        ('chat_llm_coalesced_total', 'counter', "Calls served by an identical in-flight call", samples['coalesced']),
+        ('chat_llm_breaker_state', 'gauge', "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+         samples['breaker_state']),
+    ]
+
+
+def reset_providers():
+    """Drop cached provider instances (used when settings change)"""
+    with _instances_lock:
+        _instances.clear()
+
+
+def _on_setting_changed(setting, **kwargs):
+    if setting.startswith('LLM_') or setting == 'GEMINI_API_KEY':
+        reset_providers()
+
+
+setting_changed.connect(_on_setting_changed)
@@ -0,0 +1,262 @@
+import random
+import threading
+import time
+from django.conf import settings
+
+
+class RateLimitedError(Exception):
+    """The token bucket could not grant a call within its timeout"""
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open; the call was not attempted"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, up to `burst` saved
+    up. A rate of 0 disables it. Callers that would wait longer than
+    `timeout` seconds are rejected instead of queueing.
+    """
+
+    def __init__(self, rate, burst=None, timeout=None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1)
+        self.timeout = timeout
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.counters = {'acquired': 0, 'throttled': 0, 'rejected': 0}
+
+    def reserve(self):
+        """Take a token; returns how long to wait before using it"""
+        if not self.rate:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0
+            if self.timeout is not None and wait > self.timeout:
+                self.counters['rejected'] += 1
+                raise RateLimitedError(f"Rate limit reached ({self.rate}/s)")
+            self._tokens -= 1
+            self.counters['acquired'] += 1
+            if wait:
+                self.counters['throttled'] += 1
+            return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, 'rate': self.rate, 'burst': self.capacity}
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_seconds`; then lets a single probe through (half-open) and
+    closes again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0
+        self._probing = False
+        self._lock = threading.Lock()
+        self.counters = {'opened': 0, 'short_circuited': 0}
+
+    def before_call(self):
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = 'half_open'
+            if self.state == 'open' or (self.state == 'half_open' and self._probing):
+                self.counters['short_circuited'] += 1
+                raise CircuitOpenError("LLM provider unavailable (circuit open)")
+            if self.state == 'half_open':
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == 'half_open' or self._failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.counters['opened'] += 1
+                self.state = 'open'
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """End a call that neither succeeded nor failed (e.g. a cancelled stream)"""
+        with self._lock:
+            self._probing = False
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, 'state': self.state, 'consecutive_failures': self._failures}
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its outcome"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {'leaders': 0, 'coalesced': 0}
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.counters['leaders'] += 1
+            else:
+                self.counters['coalesced'] += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self):
+        with self._lock:
+            return {**self.counters, 'in_flight': len(self._calls)}
+
+
+class Resilience:
+    """
+    Guards calls to one provider model: token-bucket rate limit, circuit
+    breaker, retries with jittered exponential backoff for retryable
+    errors, and single-flight coalescing of identical requests.
+    """
+
+    def __init__(self, rate=None, burst=None, wait_timeout=None, failure_threshold=None,
+                 reset_seconds=None, max_attempts=None, backoff=None, max_backoff=None,
+                 single_flight=None):
+        self.limiter = TokenBucket(
+            settings.LLM_RATE_LIMIT if rate is None else rate,
+            burst or settings.LLM_RATE_BURST,
+            settings.LLM_RATE_WAIT_SECONDS if wait_timeout is None else wait_timeout
+        )
+        self.breaker = CircuitBreaker(
+            failure_threshold or settings.LLM_BREAKER_FAILURES,
+            settings.LLM_BREAKER_RESET_SECONDS if reset_seconds is None else reset_seconds
+        )
+        self.max_attempts = max_attempts or settings.LLM_RETRY_ATTEMPTS
+        self.backoff = settings.LLM_RETRY_BACKOFF_SECONDS if backoff is None else backoff
+        self.max_backoff = max_backoff or settings.LLM_RETRY_MAX_BACKOFF_SECONDS
+        single_flight = settings.LLM_SINGLE_FLIGHT if single_flight is None else single_flight
+        self.flight = SingleFlight() if single_flight else None
+        self._lock = threading.Lock()
+        self.counters = {'calls': 0, 'retries': 0, 'failures': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def retry_delay(self, attempt):
+        """Full jitter: uniform in [0, min(max_backoff, backoff * 2^(attempt-1))]"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * (2 ** (attempt - 1))))
+
+    def failed(self, error, is_retryable):
+        """Record an upstream error; returns whether it is worth retrying"""
+        if is_retryable(error):
+            self.breaker.record_failure()
+            return True
+        # Not the provider's fault (e.g. a bad request), but not a success
+        # either: free a half-open probe and leave the failure count alone
+        self.breaker.release()
+        return False
+
+    def call(self, func, is_retryable, key=None):
+        if self.flight is not None and key is not None:
+            return self.flight.do(key, lambda: self._call(func, is_retryable))
+        return self._call(func, is_retryable)
+
+    def admit(self):
+        """Check the breaker and take a rate-limit token; returns the wait in seconds"""
+        self.breaker.before_call()
+        try:
+            return self.limiter.reserve()
+        except RateLimitedError:
+            self.breaker.release()
+            raise
+
+    def _call(self, func, is_retryable):
+        self._count('calls')
+        attempt = 1
+        while True:
+            wait = self.admit()
+            if wait:
+                time.sleep(wait)
+            try:
+                result = func()
+            except Exception as e:
+                retry = self.failed(e, is_retryable)
+                # Stop early once this failure opened the breaker
+                if not retry or attempt >= self.max_attempts or self.breaker.state == 'open':
+                    self._count('failures')
+                    raise
+                self._count('retries')
+                time.sleep(self.retry_delay(attempt))
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    def finish_stream(self, error=None, completed=False, is_retryable=None):
+        """
+        Record how a stream admitted with admit() ended. Streams are not
+        retried, since part of the reply may already have been sent.
+        """
+        self._count('calls')
+        if error is not None:
+            self._count('failures')
+            self.failed(error, is_retryable)
+        elif completed:
+            self.breaker.record_success()
+        else:
+            self.breaker.release()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            **counters,
+            'rate_limit': self.limiter.stats(),
+            'circuit_breaker': self.breaker.stats(),
+            'single_flight': self.flight.stats() if self.flight is not None else None,
+        }
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.test.signals import setting_changed
+from rest_framework.utils.encoders import JSONEncoder
+from .metrics import REGISTRY
+
+
+def make_etag(data):
+    """Strong ETag for response data or an encoded body; equal data always gets the same tag"""
+    if not isinstance(data, bytes):
+        data = json.dumps(data, cls=JSONEncoder, sort_keys=True, ensure_ascii=False).encode()
+    return '"{}"'.format(hashlib.sha256(data).hexdigest()[:32])
+
+
+class ResponseCache:
+    """
+    Read-through cache of serialized conversation list and detail data,
+    stored with its ETag in the Django cache named by RESPONSE_CACHE_ALIAS.
+
+    Keys embed a version per conversation (and one for the list); writes
+    replace the version instead of deleting keys, which drops every cached
+    page of that conversation at once. Versions are read before the
+    database, so a read racing a write is stored under the old version and
+    never served again.
+    """
+
+    def __init__(self, alias=None, ttl=None):
+        self.alias = alias or settings.RESPONSE_CACHE_ALIAS
+        self.ttl = ttl if ttl is not None else settings.RESPONSE_CACHE_TTL_SECONDS
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def _version(self, scope):
+        key = f"chat:response:{scope}:version"
+        version = self.cache.get(key)
+        if version is None:
+            # Time-based so a version lost to eviction is never reused
+            self.cache.add(key, time.time_ns(), timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def lookup(self, scope, variant):
+        """Return (key, (etag, data) or None) for one variant of `scope`"""
+        # Variants come from query strings: hash them into a memcached-safe key
+        digest = hashlib.sha256(variant.encode()).hexdigest()[:32]
+        key = f"chat:response:{scope}:{self._version(scope)}:{digest}"
+        entry = self.cache.get(key)
+        self._count('hits' if entry is not None else 'misses')
+        return key, entry
+
+    def changed_within(self, scope, seconds):
+        """Whether `scope` was invalidated (or first looked up) in the last `seconds`"""
+        return time.time_ns() - self._version(scope) < seconds * 1e9
+
+    def store(self, key, data, forever=False):
+        """Cache data under a key from lookup(); returns its ETag"""
+        etag = make_etag(data)
+        self.cache.set(key, (etag, data), timeout=None if forever else self.ttl)
+        return etag
+
+    def invalidate(self, conversation_ids, listing=True):
+        scopes = [f"conversation:{conversation_id}" for conversation_id in conversation_ids]
+        if listing:
+            scopes.append('list')
+        version = time.time_ns()
+        self.cache.set_many({f"chat:response:{scope}:version": version for scope in scopes}, timeout=None)
+        self._count('invalidations', len(scopes))
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters['hits'] + counters['misses']
+        return {**counters, 'hit_rate': round(counters['hits'] / lookups, 4) if lookups else 0.0}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """The shared ResponseCache, or None when RESPONSE_CACHE_ENABLED is off"""
+    global _cache
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def invalidate_responses(conversation_ids, listing=True):
+    """
+    Drop cached responses for the conversations (and the list pages).
+
+    Inside a transaction this runs again on commit: a read between the two
+    can only have cached the pre-commit state under the first version.
+    """
+    cache = get_response_cache()
+    if cache is None or not conversation_ids:
+        return
+    conversation_ids = list(conversation_ids)
+    cache.invalidate(conversation_ids, listing)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.invalidate(conversation_ids, listing))
+
+
+@REGISTRY.collector
+def collect_response_cache():
+    cache = _cache
+    if cache is None:
+        return []
+    stats = cache.stats()
+    return [
+        ('chat_response_cache_hits_total', 'counter', "Conversation responses served from cache",
+         [({}, stats['hits'])]),
+        ('chat_response_cache_misses_total', 'counter', "Conversation responses built from the database",
+         [({}, stats['misses'])]),
+        ('chat_response_cache_invalidations_total', 'counter', "Response cache version bumps",
+         [({}, stats['invalidations'])]),
+    ]
+
+
+def _on_setting_changed(setting, **kwargs):
+    global _cache
+    if setting.startswith('RESPONSE_CACHE_'):
+        with _cache_lock:
+            _cache = None
+
+
+setting_changed.connect(_on_setting_changed)
@@ -0,0 +1,61 @@
+import random
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from .response_cache import get_response_cache
+
+
+_use_replica = ContextVar('chat_use_replica', default=False)
+
+
+class ReplicaRouter:
+    """
+    Sends reads made inside a @replica_reads view to a random
+    DATABASE_REPLICAS alias. Everything else (writes, jobs, streamed
+    replies and reads outside those views) uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and _use_replica.get():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Explicit, or Django would write an instance back to the replica it was read from
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def replica_reads(view):
+    """Let the view's reads go to a replica (see read_from_primary)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _use_replica.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+def read_from_primary(scope=None):
+    """
+    Send the rest of this view's reads to the primary: always without a
+    `scope`, else only if the scope's cached responses were invalidated
+    within DATABASE_REPLICA_LAG_SECONDS (replicas may not have the write yet).
+    Without a response cache recent writes can't be told apart, so
+    replica reads are kept.
+    """
+    if not settings.DATABASE_REPLICAS or not _use_replica.get():
+        return
+    if scope is not None:
+        cache = get_response_cache()
+        if cache is None or not cache.changed_within(scope, settings.DATABASE_REPLICA_LAG_SECONDS):
+            return
+    _use_replica.set(False)
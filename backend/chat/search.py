@@ -0,0 +1,177 @@
+import re
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from .models import Conversation
+
+
+# Words that carry no signal for ranking natural-language queries
+STOPWORDS = frozenset("""
+a about above after again all am an and any are as at be because been before
+being below between both but by can could did do does doing down during each
+few for from further had has have having he her here hers him his how i if in
+into is it its itself just me more most my no nor not now of off on once only
+or other our out over own same she should so some such than that the their
+them then there these they this those through to too under until up very was
+we were what when where which while who whom why will with would you your
+""".split())
+
+# Matches on a conversation's title/summary count more than a single message
+CONVERSATION_WEIGHT = 2.0
+MESSAGE_WEIGHT = 1.0
+
+
+def words(text):
+    """Lowercase words of `text` that carry signal (no stopwords or single characters)"""
+    return [
+        word for word in re.findall(r'[a-z0-9]+', text.lower())
+        if len(word) > 1 and word not in STOPWORDS
+    ]
+
+
+def search_terms(query, keywords=None):
+    """Split a free-text query plus keywords into lowercase, de-duplicated terms"""
+    text = ' '.join([query or ''] + list(keywords or []))
+    terms = []
+    for word in words(text):
+        if word not in terms:
+            terms.append(word)
+    return terms
+
+
+def _filter_sql(status=None, date_range_start=None, date_range_end=None):
+    clauses, params = [], []
+    if status:
+        clauses.append('c.status = %s')
+        params.append(status)
+    if date_range_start:
+        clauses.append('c.start_timestamp >= %s')
+        params.append(date_range_start)
+    if date_range_end:
+        clauses.append('c.start_timestamp <= %s')
+        params.append(date_range_end)
+    return ''.join(f' AND {clause}' for clause in clauses), params
+
+
+class PostgresBackend:
+    """tsvector/GIN search; the expressions match the indexes from migration 0004"""
+
+    MESSAGE_SQL = """
+        SELECT m.conversation_id, SUM(ts_rank(to_tsvector('english', m.content), q.query))
+        FROM messages m
+        JOIN conversations c ON c.id = m.conversation_id,
+             to_tsquery('english', %s) AS q(query)
+        WHERE to_tsvector('english', m.content) @@ q.query{filters}
+        GROUP BY m.conversation_id
+        ORDER BY 2 DESC
+        LIMIT %s
+    """
+
+    CONVERSATION_SQL = """
+        SELECT c.id, ts_rank(
+            to_tsvector('english', coalesce(c.title, '') || ' ' || coalesce(c.summary, '')), q.query
+        )
+        FROM conversations c, to_tsquery('english', %s) AS q(query)
+        WHERE to_tsvector('english', coalesce(c.title, '') || ' ' || coalesce(c.summary, '')) @@ q.query{filters}
+        ORDER BY 2 DESC
+        LIMIT %s
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def match_expression(self, terms):
+        return ' | '.join(terms)
+
+    def hits(self, terms, filters, limit):
+        filter_sql, params = _filter_sql(**filters)
+        expression = self.match_expression(terms)
+        with self.connection.cursor() as cursor:
+            cursor.execute(self.MESSAGE_SQL.format(filters=filter_sql), [expression] + params + [limit])
+            message_hits = cursor.fetchall()
+            cursor.execute(self.CONVERSATION_SQL.format(filters=filter_sql), [expression] + params + [limit])
+            conversation_hits = cursor.fetchall()
+        return message_hits, conversation_hits
+
+
+class SQLiteBackend(PostgresBackend):
+    """FTS5 external-content tables kept in sync by triggers (local/testing, migration 0004)"""
+
+    # FTS5 rank (bm25) is lower-is-better, so negate it to get a score
+    MESSAGE_SQL = """
+        SELECT m.conversation_id, SUM(f.score)
+        FROM (
+            SELECT rowid, -rank AS score
+            FROM messages_fts WHERE messages_fts MATCH %s
+        ) f
+        JOIN messages m ON m.id = f.rowid
+        JOIN conversations c ON c.id = m.conversation_id
+        WHERE 1 = 1{filters}
+        GROUP BY m.conversation_id
+        ORDER BY 2 DESC
+        LIMIT %s
+    """
+
+    CONVERSATION_SQL = """
+        SELECT c.id, f.score
+        FROM (
+            SELECT rowid, -rank AS score
+            FROM conversations_fts WHERE conversations_fts MATCH %s
+        ) f
+        JOIN conversations c ON c.id = f.rowid
+        WHERE 1 = 1{filters}
+        ORDER BY 2 DESC
+        LIMIT %s
+    """
+
+    def match_expression(self, terms):
+        return ' OR '.join(f'"{term}"' for term in terms)
+
+
+def get_backend():
+    """The backend for the database Conversation reads are routed to (a replica in replica_reads views)"""
+    connection = connections[router.db_for_read(Conversation) or DEFAULT_DB_ALIAS]
+    if connection.vendor == 'postgresql':
+        return PostgresBackend(connection)
+    if connection.vendor == 'sqlite':
+        return SQLiteBackend(connection)
+    raise NotImplementedError(f"Full-text search is not supported on {connection.vendor}")
+
+
+def search_conversations(query, keywords=None, status=None, date_range_start=None,
+                         date_range_end=None, limit=10):
+    """
+    Rank conversations by relevance of their messages, title and summary to
+    `query` and `keywords`. Returns a list of (conversation_id, score), best first.
+    """
+    terms = search_terms(query, keywords)
+    if not terms:
+        return []
+
+    filters = {
+        'status': status,
+        'date_range_start': date_range_start,
+        'date_range_end': date_range_end,
+    }
+    # Over-fetch each side so the merged ranking isn't cut short
+    message_hits, conversation_hits = get_backend().hits(terms, filters, limit * 5)
+
+    scores = {}
+    for conversation_id, rank in message_hits:
+        scores[conversation_id] = scores.get(conversation_id, 0) + MESSAGE_WEIGHT * float(rank)
+    for conversation_id, rank in conversation_hits:
+        scores[conversation_id] = scores.get(conversation_id, 0) + CONVERSATION_WEIGHT * float(rank)
+
+    ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+    return ranked[:limit]
+
+
+def ranked_conversations(query, keywords=None, limit=10, **filters):
+    """search_conversations() resolved to Conversation objects, in rank order"""
+    ranked = search_conversations(query, keywords, limit=limit, **filters)
+    by_id = Conversation.objects.in_bulk([conversation_id for conversation_id, _ in ranked])
+    results = []
+    for conversation_id, score in ranked:
+        conversation = by_id.get(conversation_id)
+        if conversation is not None:
+            conversation.search_rank = round(score, 4)
+            results.append(conversation)
+    return results
@@ -1,5 +1,6 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Conversation, Message
+from .models import Conversation, Job, Message
 
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,25 +10,20 @@ class MessageSerializer(serializers.ModelSerializer):
 
 
 class ConversationListSerializer(serializers.ModelSerializer):
-    message_count = serializers.SerializerMethodField()
-    
     class Meta:
         model = Conversation
         fields = ['id', 'title', 'status', 'start_timestamp', 
                   'end_timestamp', 'message_count']
-    
-    def get_message_count(self, obj):
-        return obj.messages.count()
 
 
-class ConversationDetailSerializer(serializers.ModelSerializer):
-    messages = MessageSerializer(many=True, read_only=True)
+class ConversationHeaderSerializer(serializers.ModelSerializer):
+    """Conversation fields without the message history"""
     duration_minutes = serializers.SerializerMethodField()
     
     class Meta:
         model = Conversation
         fields = ['id', 'title', 'status', 'start_timestamp', 
-                  'end_timestamp', 'summary', 'messages', 'duration_minutes']
+                  'end_timestamp', 'summary', 'duration_minutes']
     
     def get_duration_minutes(self, obj):
         if obj.end_timestamp:
@@ -36,6 +32,31 @@ class ConversationDetailSerializer(serializers.ModelSerializer):
         return None
 
 
+class ConversationDetailSerializer(ConversationHeaderSerializer):
+    messages = MessageSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = Conversation
+        fields = ['id', 'title', 'status', 'start_timestamp', 
+                  'end_timestamp', 'summary', 'messages', 'duration_minutes']
+
+
+class ConversationSearchResultSerializer(serializers.ModelSerializer):
+    rank = serializers.FloatField(source='search_rank', read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ['id', 'title', 'status', 'start_timestamp',
+                  'end_timestamp', 'summary', 'rank']
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'status', 'conversation_id', 'attempts',
+                  'result', 'error', 'created_at', 'updated_at']
+
+
 class SendMessageSerializer(serializers.Serializer):
     conversation_id = serializers.IntegerField(required=False)
     message = serializers.CharField()
@@ -46,6 +67,23 @@ class EndConversationSerializer(serializers.Serializer):
     conversation_id = serializers.IntegerField()
 
 
+class BulkEndConversationsSerializer(serializers.Serializer):
+    conversation_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False
+    )
+    idle_minutes = serializers.IntegerField(required=False, min_value=1)
+    limit = serializers.IntegerField(required=False, min_value=1)
+
+    def validate_limit(self, value):
+        return min(value, settings.BULK_MAX_CONVERSATIONS)
+
+    def validate(self, data):
+        if 'conversation_ids' not in data and 'idle_minutes' not in data:
+            raise serializers.ValidationError("Provide conversation_ids or idle_minutes")
+        data.setdefault('limit', settings.BULK_MAX_CONVERSATIONS)
+        return data
+
+
 class QueryConversationsSerializer(serializers.Serializer):
     query = serializers.CharField()
     date_range_start = serializers.DateTimeField(required=False)
@@ -57,4 +95,22 @@ class QueryConversationsSerializer(serializers.Serializer):
     analysis_depth = serializers.ChoiceField(
         choices=['basic', 'detailed', 'comprehensive'],
         default='basic'
-    )
\ No newline at end of file
+    )
+
+
+class SearchConversationsSerializer(serializers.Serializer):
+    q = serializers.CharField()
+    keywords = serializers.CharField(required=False, allow_blank=True)
+    status = serializers.ChoiceField(choices=Conversation.STATUS_CHOICES, required=False)
+    date_range_start = serializers.DateTimeField(required=False)
+    date_range_end = serializers.DateTimeField(required=False)
+    limit = serializers.IntegerField(required=False, default=10, min_value=1, max_value=100)
+
+    def validate_keywords(self, value):
+        return [keyword.strip() for keyword in value.split(',') if keyword.strip()]
+
+
+class ConversationMessagesQuerySerializer(serializers.Serializer):
+    after_id = serializers.IntegerField(required=False, min_value=0)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=1000)
+    stream = serializers.ChoiceField(choices=['ndjson'], required=False)
\ No newline at end of file
@@ -0,0 +1,73 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .context_cache import invalidate_context
+from .digest import drop_digest, refresh_digest
+from .embeddings import remove_conversation
+from .metrics import install_query_counter
+from .response_cache import invalidate_responses
+from .models import Conversation, Message
+
+
+@receiver(post_delete, sender=Conversation)
+def drop_conversation_embeddings(sender, instance, **kwargs):
+    remove_conversation(instance.id)
+
+
+@receiver(post_delete, sender=Conversation)
+@receiver(post_delete, sender=Message)
+def drop_cached_context(sender, instance, **kwargs):
+    conversation_id = instance.id if sender is Conversation else instance.conversation_id
+    invalidate_context(conversation_id)
+    invalidate_responses([conversation_id])
+
+
+@receiver(post_delete, sender=Message)
+def drop_deleted_from_digest(sender, instance, **kwargs):
+    drop_digest(instance.conversation_id, instance.id)
+
+
+@receiver(post_save, sender=Conversation)
+def conversation_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_responses([instance.id])
+
+
+@receiver(post_save, sender=Message)
+def message_saved(sender, instance, created, raw=False, **kwargs):
+    # Edits (e.g. stream checkpoints) don't change anything on the list pages
+    if not raw:
+        invalidate_responses([instance.conversation_id], listing=created)
+
+
+@receiver(post_save, sender=Message)
+def count_new_message(sender, instance, created, raw=False, **kwargs):
+    # bulk_create() skips signals; start_turn() updates the counters itself
+    if created and not raw:
+        Conversation.add_messages(instance.conversation_id, 1, instance.timestamp)
+
+
+@receiver(post_save, sender=Message)
+def invalidate_edited_context(sender, instance, created, update_fields=None, **kwargs):
+    # Checkpoints and finalize() write messages the context cache never holds
+    if created or not instance.is_complete:
+        return
+    if update_fields is not None and 'is_complete' in update_fields:
+        return
+    invalidate_context(instance.conversation_id)
+
+
+@receiver(post_save, sender=Message)
+def update_digest(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    # bulk_create() skips signals: rows it wrote (e.g. by start_turn()) are
+    # folded in with the next message saved, or by the next reader
+    if raw or not instance.is_complete:
+        return
+    if created or (update_fields is not None and 'is_complete' in update_fields):
+        refresh_digest(instance.conversation_id)
+    else:
+        drop_digest(instance.conversation_id, instance.id)
+
+
+# Per-request DB query counts for the metrics middleware
+connection_created.connect(install_query_counter)
@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+import json
+import time
+from django.conf import settings
+
+
+# SSE comment line: ignored by clients, keeps idle proxies from timing out
+HEARTBEAT = ': ping\n\n'
+
+
+def sse_event(data, event_id=None):
+    """Frame one event; `event_id` becomes the client's Last-Event-ID"""
+    if event_id is None:
+        return f"data: {json.dumps(data)}\n\n"
+    return f"id: {event_id}\ndata: {json.dumps(data)}\n\n"
+
+
+def digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class SSEWriter:
+    """
+    Frames a streamed reply as Server-Sent Events.
+
+    Upstream chunks are buffered and sent as one 'chunk' event once
+    `min_bytes` are pending or the oldest has waited `max_delay` seconds
+    (min_bytes=0 sends every chunk as it arrives). Each chunk event's id is
+    the reply's length in characters after it, so a client reconnecting
+    with Last-Event-ID can resume from the persisted message.
+    """
+
+    def __init__(self, offset=0, min_bytes=None, max_delay=None, heartbeat=None):
+        self.offset = offset
+        self.min_bytes = settings.SSE_COALESCE_BYTES if min_bytes is None else min_bytes
+        self.max_delay = settings.SSE_COALESCE_SECONDS if max_delay is None else max_delay
+        self.heartbeat = settings.SSE_HEARTBEAT_SECONDS if heartbeat is None else heartbeat
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_since = None
+        self._last_write = time.monotonic()
+
+    def event(self, data, event_id=None):
+        self._last_write = time.monotonic()
+        return sse_event(data, event_id)
+
+    def add(self, text):
+        """Buffer upstream text; returns a chunk event when one is due, else None"""
+        if not text:
+            return None
+        if self._pending_since is None:
+            self._pending_since = time.monotonic()
+        self._pending.append(text)
+        self._pending_bytes += len(text.encode())
+        return self.flush() if self.due() else None
+
+    def due(self):
+        if not self._pending:
+            return False
+        return (
+            self._pending_bytes >= self.min_bytes or
+            time.monotonic() - self._pending_since >= self.max_delay
+        )
+
+    def flush(self):
+        """Chunk event for everything pending, or None"""
+        if not self._pending:
+            return None
+        text = ''.join(self._pending)
+        self._pending.clear()
+        self._pending_bytes = 0
+        self._pending_since = None
+        self.offset += len(text)
+        return self.event({'type': 'chunk', 'content': text}, self.offset)
+
+    def timeout(self):
+        """Seconds until something must be written (pending text or a heartbeat)"""
+        now = time.monotonic()
+        wait = self._last_write + self.heartbeat - now
+        if self._pending:
+            wait = min(wait, self._pending_since + self.max_delay - now)
+        return max(wait, 0)
+
+    def tick(self):
+        """Called when upstream was quiet for timeout(): returns what to write, if anything"""
+        if self.due():
+            return self.flush()
+        if time.monotonic() - self._last_write >= self.heartbeat:
+            self._last_write = time.monotonic()
+            return HEARTBEAT
+        return None
+
+    async def frames(self, chunks):
+        """
+        Chunk events and heartbeats for an async iterator of text. Pending
+        text is flushed when `chunks` ends; the caller sends the final event.
+        """
+        pending = None
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(chunks.__anext__())
+                done, _ = await asyncio.wait({pending}, timeout=self.timeout())
+                if not done:
+                    frame = self.tick()
+                    if frame:
+                        yield frame
+                    continue
+                task, pending = pending, None
+                try:
+                    text = task.result()
+                except StopAsyncIteration:
+                    break
+                frame = self.add(text)
+                if frame:
+                    yield frame
+        finally:
+            if pending is not None:
+                pending.cancel()
+                # Let upstream finish closing before the caller saves what it got
+                await asyncio.wait({pending})
+        frame = self.flush()
+        if frame:
+            yield frame
@@ -0,0 +1,152 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .archive import transcript_rows
+from .context import TRANSCRIPT_LABELS, estimate_tokens
+from .digest import refresh_digest, token_count, transcript_text
+from .llm_cache import cached_generate
+from .metrics import observe_prompt
+from .models import ChunkSummary
+from .providers import get_provider
+
+
+SUMMARY_PROMPT = """Summarize the following conversation concisely. Highlight key topics, decisions, and important points discussed.
+
+Conversation:
+{text}
+
+Summary:"""
+
+CHUNK_PROMPT = """Summarize this part of a longer conversation. Keep the key topics, decisions, facts and open questions; it will be combined with summaries of the other parts.
+
+Conversation part:
+{text}
+
+Summary:"""
+
+COMBINE_PROMPT = """The following are summaries of consecutive parts of one conversation. Merge them into one summary that keeps the key topics, decisions, facts and open questions, in order.
+
+{text}
+
+Combined summary:"""
+
+FINAL_PROMPT = """The following are summaries of consecutive parts of one conversation. Summarize the whole conversation concisely. Highlight key topics, decisions, and important points discussed.
+
+{text}
+
+Summary:"""
+
+
+class MapReduceSummarizer:
+    """
+    Summarizes conversations of any length.
+
+    A transcript that fits `context_tokens` is summarized in one call.
+    Longer ones are split greedily into chunks of `chunk_tokens`, the chunks
+    are summarized in parallel (map) and the partial summaries merged, in
+    groups that fit the budget, until one remains (reduce).
+
+    Every chunk except the last was closed by a message that did not fit, so
+    its boundaries can never change: it is stored as a ChunkSummary and a
+    later, longer version of the conversation only summarizes what follows.
+    """
+
+    def __init__(self, provider=None, context_tokens=None, chunk_tokens=None, workers=None):
+        self.provider = provider or get_provider()
+        self.context_tokens = context_tokens or settings.SUMMARY_CONTEXT_TOKEN_BUDGET
+        self.chunk_tokens = chunk_tokens or settings.SUMMARY_CHUNK_TOKENS
+        self.workers = workers or settings.SUMMARY_MAP_WORKERS
+
+    def _line(self, sender, content):
+        line = f"{TRANSCRIPT_LABELS.get(sender, sender)}: {content}"
+        # A single huge message still has to fit in one chunk
+        max_chars = self.chunk_tokens * 4
+        if len(line) > max_chars:
+            line = line[:max_chars - 3] + '...'
+        return line
+
+    def split(self, rows):
+        """Split (id, sender, content) rows into chunks of [(id, line)] within chunk_tokens"""
+        chunks, current, used = [], [], 0
+        for message_id, sender, content in rows:
+            line = self._line(sender, content)
+            cost = estimate_tokens(line)
+            if current and used + cost > self.chunk_tokens:
+                chunks.append(current)
+                current, used = [], 0
+            current.append((message_id, line))
+            used += cost
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def generate(self, template, text):
+        prompt = template.format(text=text)
+        observe_prompt('summary', prompt)
+        return cached_generate(self.provider, prompt).strip()
+
+    def map(self, template, texts):
+        """Run `template` over `texts` on a bounded thread pool, preserving order"""
+        if len(texts) <= 1 or self.workers <= 1:
+            return [self.generate(template, text) for text in texts]
+        with ThreadPoolExecutor(
+            max_workers=min(self.workers, len(texts)),
+            thread_name_prefix='chat-summary'
+        ) as pool:
+            return list(pool.map(lambda text: self.generate(template, text), texts))
+
+    def group(self, blocks):
+        """Pack blocks into groups that fit context_tokens (at least two per group)"""
+        groups, current, used = [], [], 0
+        for block in blocks:
+            cost = estimate_tokens(block)
+            if len(current) >= 2 and used + cost > self.context_tokens:
+                groups.append(current)
+                current, used = [], 0
+            current.append(block)
+            used += cost
+        if current:
+            groups.append(current)
+        return groups
+
+    def reduce(self, partials):
+        while True:
+            blocks = [f"Part {number}:\n{partial}" for number, partial in enumerate(partials, 1)]
+            groups = self.group(blocks)
+            if len(groups) == 1:
+                return self.generate(FINAL_PROMPT, '\n\n'.join(blocks))
+            partials = self.map(COMBINE_PROMPT, ['\n\n'.join(group) for group in groups])
+
+    def summarize(self, conversation_id):
+        """Return the summary text, or '' for a conversation without messages"""
+        sealed = list(
+            ChunkSummary.objects.filter(conversation_id=conversation_id)
+            .order_by('first_message_id')
+            .values_list('last_message_id', 'summary')
+        )
+        if not sealed:
+            # A transcript that fits in one call is read from the digest row
+            digest = refresh_digest(conversation_id)
+            if digest is not None and digest.message_count and token_count(digest) <= self.context_tokens:
+                return self.generate(SUMMARY_PROMPT, transcript_text(digest))
+
+        through = sealed[-1][0] if sealed else 0
+        rows = transcript_rows(conversation_id, through)
+        if not sealed and not rows:
+            return ''
+
+        chunks = self.split(rows)
+        partials = self.map(CHUNK_PROMPT, ['\n'.join(line for _, line in chunk) for chunk in chunks])
+        ChunkSummary.objects.bulk_create(
+            [
+                ChunkSummary(
+                    conversation_id=conversation_id,
+                    first_message_id=chunk[0][0],
+                    last_message_id=chunk[-1][0],
+                    message_count=len(chunk),
+                    summary=summary,
+                )
+                for chunk, summary in zip(chunks[:-1], partials[:-1])
+            ],
+            ignore_conflicts=True
+        )
+        return self.reduce([summary for _, summary in sealed] + partials)
@@ -1,3 +1,1045 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.renderers import JSONRenderer
+
+from . import fastjson
+from .ai_service import AIService
+from .archive import archivable_conversations, archive_conversations, pack, transcript_rows, unpack
+from .fanout import EXTRACT_PROMPT, QueryFanOut
+from .embeddings import EmbeddingIndex, HashingEmbedder, index_conversation, index_conversations, semantic_search
+from .context import ContextBuilder
+from .context_cache import ContextCache, get_context_cache
+from .digest import refresh_digest, transcript_excerpt, transcript_text
+from .llm_cache import get_llm_cache
+from .loadtest import percentiles, seed_conversations
+from .metrics import DB_QUERIES, HTTP_REQUESTS, PROMPT_CHARS, REGISTRY, STAGE_SECONDS, Histogram
+from .models import ChunkSummary, Conversation, ConversationDigest, Job, Message
+from .providers import StubProvider, get_provider
+from .response_cache import get_response_cache, invalidate_responses
+from .routers import ReplicaRouter, read_from_primary, replica_reads
+from .resilience import CircuitOpenError, RateLimitedError, Resilience, SingleFlight, TokenBucket
+from .search import get_backend, search_conversations
+from .sse import HEARTBEAT, SSEWriter
+from .summarizer import CHUNK_PROMPT, MapReduceSummarizer
+from .writes import StreamCheckpointer, recover_orphaned_messages, start_turn
+
+
+class ListConversationsTests(TestCase):
+
+    def setUp(self):
+        for i in range(5):
+            conversation = Conversation.objects.create(
+                title=f"Conversation {i}",
+                status='ended' if i % 2 else 'active'
+            )
+            for j in range(i):
+                Message.objects.create(conversation=conversation, content=f"m{j}", sender='user')
+
+    def test_pages_follow_cursor_without_overlap(self):
+        url = reverse('list_conversations')
+        first = self.client.get(url, {'limit': 2}).json()
+        self.assertEqual(first['count'], 2)
+        self.assertIsNotNone(first['next_cursor'])
+
+        seen = [c['id'] for c in first['conversations']]
+        cursor = first['next_cursor']
+        while cursor:
+            page = self.client.get(url, {'limit': 2, 'cursor': cursor}).json()
+            seen += [c['id'] for c in page['conversations']]
+            cursor = page['next_cursor']
+
+        expected = list(Conversation.objects.order_by('-start_timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_message_count_uses_single_query(self):
+        with self.assertNumQueries(1):
+            data = self.client.get(reverse('list_conversations')).json()
+        counts = {c['title']: c['message_count'] for c in data['conversations']}
+        self.assertEqual(counts['Conversation 4'], 4)
+
+    def test_message_counters_follow_writes(self):
+        conversation = Conversation.objects.get(title="Conversation 2")
+        self.assertEqual(conversation.message_count, 2)
+
+        user_msg, ai_msg = start_turn(conversation, "Hello")
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.message_count, 4)
+        self.assertEqual(conversation.last_message_at, ai_msg.timestamp)
+
+        Message.objects.filter(id=ai_msg.id).update(timestamp=timezone.now() - timedelta(hours=1))
+        recover_orphaned_messages(older_than=60)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.message_count, 3)
+
+    def test_status_filter(self):
+        data = self.client.get(reverse('list_conversations'), {'status': 'ended'}).json()
+        self.assertEqual({c['status'] for c in data['conversations']}, {'ended'})
+        self.assertEqual(data['count'], 2)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('list_conversations'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ContextBuilderTests(TestCase):
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(title="Long chat")
+        for i in range(30):
+            Message.objects.create(
+                conversation=self.conversation,
+                content=f"message {i}",
+                sender='user' if i % 2 == 0 else 'ai'
+            )
+
+    def test_window_limits_history_and_folds_older_turns(self):
+        prompt = ContextBuilder(window=10).build(self.conversation.id, "SYSTEM", pending_message="next")
+        self.assertIn("Assistant: message 29", prompt)
+        self.assertIn("message 20", prompt)
+        self.assertIn("Summary of earlier conversation", prompt)
+        self.assertIn("USER: message 0", prompt)
+        self.assertTrue(prompt.endswith("User: next\nAssistant:"))
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(
+            self.conversation.context_summary_through,
+            self.conversation.messages.get(content="message 19").id
+        )
+
+    def test_pending_message_not_repeated(self):
+        Message.objects.create(conversation=self.conversation, content="hello again", sender='user')
+        prompt = ContextBuilder().build(self.conversation.id, "SYSTEM", pending_message="hello again")
+        self.assertEqual(prompt.count("hello again"), 1)
+
+    def test_token_budget_drops_oldest_turns(self):
+        prompt = ContextBuilder(token_budget=30, window=50).build(self.conversation.id, "SYSTEM")
+        self.assertIn("message 29", prompt)
+        self.assertNotIn("message 0\n", prompt)
+
+
+@override_settings(CONVERSATION_DIGEST_BLOCK_CHARS=32)
+class ConversationDigestTests(TestCase):
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(title="Digest")
+        self.first = Message.objects.create(conversation=self.conversation, content="Flights to Lisbon?", sender='user')
+        Message.objects.create(conversation=self.conversation, content="Lisbon flights leave at nine", sender='ai')
+
+    def test_messages_are_folded_as_they_are_saved(self):
+        user_msg, ai_msg = start_turn(self.conversation, "And hotels?")
+        digest = ConversationDigest.objects.get(conversation=self.conversation)
+        # The new turn waits for its reply to complete
+        self.assertEqual(digest.through, self.first.id + 1)
+
+        StreamCheckpointer(ai_msg).finalize("Two near the river")
+        digest.refresh_from_db()
+        text = "USER: Flights to Lisbon?\nAI: Lisbon flights leave at nine\nUSER: And hotels?\nAI: Two near the river"
+        self.assertEqual(transcript_text(digest), text)
+        self.assertEqual(digest.through, ai_msg.id)
+        self.assertEqual(digest.char_count, len(text))
+        self.assertEqual(digest.terms['lisbon'], 2)
+        self.assertEqual(digest.first_user_message, "Flights to Lisbon?")
+        self.assertEqual(transcript_excerpt(self.conversation.id, 30), text[:30])
+        self.assertTrue(bytes(digest.transcript))
+
+    def test_edits_rebuild_the_digest(self):
+        self.first.content = "Trains to Porto?"
+        self.first.save()
+        self.assertFalse(ConversationDigest.objects.filter(conversation=self.conversation).exists())
+        self.assertEqual(AIService.first_message(self.conversation.id), "Trains to Porto?")
+        self.assertTrue(transcript_text(refresh_digest(self.conversation.id)).startswith("USER: Trains to Porto?\nAI:"))
+
+
+class ContextCacheTests(TestCase):
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(title="Hot chat")
+        for i in range(30):
+            Message.objects.create(
+                conversation=self.conversation,
+                content=f"message {i}",
+                sender='user' if i % 2 == 0 else 'ai'
+            )
+        self.cache = ContextCache(max_bytes=10 ** 6)
+
+    def builder(self):
+        return ContextBuilder(window=10, cache=self.cache)
+
+    def turn(self, text):
+        user_msg, ai_msg = start_turn(self.conversation, text)
+        prompt = self.builder().build(self.conversation.id, "SYSTEM", pending_message=text)
+        StreamCheckpointer(ai_msg).finalize(f"reply to {text}")
+        return prompt
+
+    def test_warm_turns_match_uncached_prompt_with_one_read(self):
+        self.turn("first")
+        start_turn(self.conversation, "second")
+        with self.assertNumQueries(2):
+            # New messages, then the conditional summary update as turns slide out
+            prompt = self.builder().build(self.conversation.id, "SYSTEM", pending_message="second")
+        self.assertEqual(
+            prompt,
+            ContextBuilder(window=10).build(self.conversation.id, "SYSTEM", pending_message="second")
+        )
+        self.assertIn("Assistant: reply to first", prompt)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_streaming_placeholder_is_reread_until_complete(self):
+        user_msg, ai_msg = start_turn(self.conversation, "question")
+        self.builder().build(self.conversation.id, "SYSTEM", pending_message="question")
+        checkpointer = StreamCheckpointer(ai_msg)
+        checkpointer.add("partial")
+        checkpointer.checkpoint()
+        self.assertLess(self.cache.get(self.conversation.id).last_id, ai_msg.id)
+
+        checkpointer.add(" answer")
+        checkpointer.finalize()
+        prompt = self.builder().build(self.conversation.id, "SYSTEM")
+        self.assertIn("Assistant: partial answer", prompt)
+        self.assertEqual(self.cache.get(self.conversation.id).last_id, ai_msg.id)
+
+    @override_settings(CHAT_CONTEXT_CACHE_ENABLED=True)
+    def test_edit_invalidates_cached_context(self):
+        cache = get_context_cache()
+        ContextBuilder(window=10, cache=cache).build(self.conversation.id, "SYSTEM")
+        self.assertIsNotNone(cache.get(self.conversation.id))
+
+        message = self.conversation.messages.get(content="message 29")
+        message.content = "edited"
+        message.save()
+        self.assertIsNone(cache.get(self.conversation.id))
+        prompt = ContextBuilder(window=10, cache=cache).build(self.conversation.id, "SYSTEM")
+        self.assertIn("Assistant: edited", prompt)
+
+    def test_memory_cap_evicts_least_recently_used(self):
+        cache = ContextCache(max_bytes=3000)
+        for conversation_id in range(1, 6):
+            cache.put(conversation_id, '', 0, [(conversation_id, 'user', 'x' * 500)], conversation_id, cache.generation)
+        self.assertLessEqual(cache.size, 3000)
+        self.assertIsNone(cache.get(1))
+        self.assertIsNotNone(cache.get(5))
+        self.assertGreater(cache.stats()['evictions'], 0)
+
+
+@override_settings(LLM_PROVIDER='stub', LLM_STUB_RESPONSE_TOKENS=8)
+class StubProviderTests(TestCase):
+
+    def test_provider_is_shared_and_deterministic(self):
+        provider = get_provider()
+        self.assertIsInstance(provider, StubProvider)
+        self.assertIs(provider, get_provider())
+        self.assertEqual(provider.generate("hello"), provider.generate("hello"))
+        self.assertEqual(''.join(provider.stream("hello")), provider.generate("hello"))
+        self.assertNotEqual(provider.generate("hello"), provider.generate("goodbye"))
+
+    def test_send_message_offline(self):
+        response = self.client.post(
+            reverse('send_message'), {'message': 'Hi there'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.json()['ai_response']['content'].startswith('Stub-'))
+        self.assertEqual(response.json()['title'], 'Hi there')
+
+    def test_draft_title(self):
+        self.assertEqual(AIService.draft_title("\n  Plan a   trip\nto Lisbon"), "Plan a trip")
+        self.assertEqual(AIService.draft_title("word " * 20, max_chars=12), "word word…")
+        self.assertEqual(AIService.draft_title("   "), "Untitled Conversation")
+
+
+class SSEWriterTests(TestCase):
+
+    def test_coalesces_chunks_and_numbers_events_by_offset(self):
+        writer = SSEWriter(min_bytes=8, max_delay=60, heartbeat=60)
+        self.assertIsNone(writer.add("abc"))
+        frame = writer.add("defgh")
+        self.assertEqual(frame, 'id: 8\ndata: {"type": "chunk", "content": "abcdefgh"}\n\n')
+        writer.add("ij")
+        self.assertIn('"content": "ij"', writer.flush())
+        self.assertEqual(writer.offset, 10)
+
+    def test_ticks_flush_late_text_and_send_heartbeats(self):
+        writer = SSEWriter(min_bytes=1000, max_delay=0.01, heartbeat=0)
+        self.assertIsNone(writer.add("x"))
+        time.sleep(0.02)
+        self.assertIn('"content": "x"', writer.tick())
+        self.assertEqual(writer.tick(), HEARTBEAT)
+
+
+def sse_events(body):
+    """Data payloads of an SSE body, skipping ids and heartbeats"""
+    return [
+        json.loads(line[len('data: '):])
+        for frame in body.decode().split('\n\n')
+        for line in frame.split('\n') if line.startswith('data: ')
+    ]
+
+
+@override_settings(LLM_PROVIDER='stub', LLM_STUB_RESPONSE_TOKENS=8)
+class SendMessageStreamTests(TransactionTestCase):
+
+    async def test_streams_events_and_saves_reply(self):
+        response = await self.async_client.post(
+            reverse('send_message_stream'), {'message': 'Hi', 'title': 'Greeting'},
+            content_type='application/json'
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = sse_events(b''.join([part async for part in response.streaming_content]))
+
+        self.assertEqual(events[0]['type'], 'start')
+        self.assertEqual(events[-1]['type'], 'done')
+        content = ''.join(e['content'] for e in events if e['type'] == 'chunk')
+        ai_msg = await Message.objects.aget(id=events[0]['ai_message_id'])
+        self.assertEqual(ai_msg.content, content)
+        self.assertNotIn('full_content', events[-1])
+        self.assertEqual(events[-1]['sha256'], hashlib.sha256(content.encode()).hexdigest())
+        self.assertEqual(events[-1]['length'], len(content))
+        # The stub's 8 tokens fit in one coalesced chunk event
+        self.assertEqual(len(events), 3)
+
+    async def test_new_conversation_title_arrives_late(self):
+        response = await self.async_client.post(
+            reverse('send_message_stream'), {'message': 'Plan a trip to Lisbon'}, content_type='application/json'
+        )
+        events = sse_events(b''.join([part async for part in response.streaming_content]))
+        self.assertEqual([e['type'] for e in events], ['start', 'chunk', 'title', 'done'])
+        self.assertEqual(events[0]['title'], 'Plan a trip to Lisbon')
+        conversation = await Conversation.objects.aget(id=events[0]['conversation_id'])
+        self.assertEqual(conversation.title, events[2]['title'])
+        self.assertNotEqual(conversation.title, 'Plan a trip to Lisbon')
+
+    async def test_resume_sends_text_after_last_event_id(self):
+        conversation = await Conversation.objects.acreate(title="Resume")
+        ai_msg = await Message.objects.acreate(
+            conversation=conversation, content="Hello there", sender='ai', is_complete=True
+        )
+        response = await self.async_client.get(
+            reverse('resume_message_stream', args=[ai_msg.id]), headers={'Last-Event-ID': '6'}
+        )
+        events = sse_events(b''.join([part async for part in response.streaming_content]))
+        self.assertEqual([e['type'] for e in events], ['chunk', 'done'])
+        self.assertEqual(events[0]['content'], "there")
+        self.assertEqual(events[1]['sha256'], hashlib.sha256(b"Hello there").hexdigest())
+
+    @override_settings(LLM_STUB_TOKENS_PER_SECOND=200, SSE_COALESCE_BYTES=0)
+    async def test_disconnect_persists_partial_reply(self):
+        response = await self.async_client.post(
+            reverse('send_message_stream'), {'message': 'Hi', 'title': 'Greeting'},
+            content_type='application/json'
+        )
+        received = []
+        two_chunks = asyncio.Event()
+
+        async def consume():
+            async for part in response.streaming_content:
+                received.append(part)
+                if len(received) == 3:
+                    two_chunks.set()
+
+        task = asyncio.create_task(consume())
+        await two_chunks.wait()
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        start = sse_events(received[0])[0]
+        ai_msg = await Message.objects.aget(id=start['ai_message_id'])
+        self.assertTrue(ai_msg.content.startswith('Stub-'))
+        self.assertLess(len(ai_msg.content.split()), 8)
+
+    async def test_invalid_payload(self):
+        response = await self.async_client.post(
+            reverse('send_message_stream'), {}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+def fake_extract(provider, prompt, **config):
+    """Stub replies, except extract prompts score conversations about Lisbon"""
+    if prompt.startswith(EXTRACT_PROMPT[:40]):
+        return "Relevance: 8\nFlew to Lisbon in May" if 'Lisbon' in prompt else "Relevance: 0\nNone"
+    return provider._generate(prompt, **config)
+
+
+@override_settings(LLM_PROVIDER='stub', LLM_CACHE_ENABLED=False, EMBEDDING_INDEX_DIR='', QUERY_FANOUT_WORKERS=2)
+class QueryFanOutTests(TransactionTestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.trip = Conversation.objects.create(title="Trip", status='ended', summary="Flights to Lisbon")
+        Message.objects.create(conversation=self.trip, content="Book flights to Lisbon", sender='user')
+        self.cooking = Conversation.objects.create(title="Dinner", status='ended', summary="Pasta")
+        Message.objects.create(conversation=self.cooking, content="A pasta recipe", sender='user')
+
+    def answer(self):
+        with mock.patch.object(StubProvider, 'generate', autospec=True, side_effect=fake_extract) as generate:
+            result = QueryFanOut().answer([self.trip, self.cooking], "Where did I fly?")
+        return result, generate.call_count
+
+    def test_only_relevant_conversations_reach_the_answer(self):
+        result, calls = self.answer()
+        self.assertEqual(calls, 3)
+        self.assertEqual(result['conversations_analyzed'], 2)
+        self.assertEqual(result['relevant_conversations'], [
+            {'id': self.trip.id, 'title': "Trip", 'date': result['relevant_conversations'][0]['date'], 'relevance': 8}
+        ])
+        self.assertTrue(result['answer'].startswith('Stub-'))
+
+    def test_extracts_are_cached_until_the_conversation_grows(self):
+        self.answer()
+        _, calls = self.answer()
+        self.assertEqual(calls, 1)
+
+        Message.objects.create(conversation=self.trip, content="And back", sender='ai')
+        self.trip.refresh_from_db()
+        _, calls = self.answer()
+        self.assertEqual(calls, 2)
+
+    async def test_stream_sends_findings_then_result(self):
+        with mock.patch.object(StubProvider, 'generate', autospec=True, side_effect=fake_extract):
+            response = await self.async_client.post(
+                reverse('query_conversations_stream'),
+                {'query': "Lisbon flights", 'analysis_depth': 'comprehensive'},
+                content_type='application/json'
+            )
+            events = sse_events(b''.join([part async for part in response.streaming_content]))
+
+        # Full-text retrieval only finds the trip
+        self.assertEqual([e['type'] for e in events], ['finding', 'progress', 'done'])
+        self.assertEqual(events[0]['extract'], "Flew to Lisbon in May")
+        self.assertEqual(events[1], {'type': 'progress', 'done': 1, 'total': 1, 'failed': 0})
+        result = events[-1]['result']
+        self.assertEqual([c['id'] for c in result['relevant_conversations']], [self.trip.id])
+
+
+@override_settings(LLM_PROVIDER='stub', JOB_BACKEND='sync', JOB_RETRY_BACKOFF_SECONDS=0, EMBEDDING_INDEX_DIR='')
+class EndConversationJobsTests(TestCase):
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(title="Draft")
+        Message.objects.create(conversation=self.conversation, content="Plan a trip", sender='user')
+
+    def end(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('end_conversation'), {'conversation_id': self.conversation.id},
+                content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 202)
+        return response.json()
+
+    def test_end_returns_job_ids_and_jobs_fill_in_results(self):
+        data = self.end()
+        summary_job = self.client.get(reverse('get_job', args=[data['jobs']['summary']])).json()['job']
+        self.assertEqual(summary_job['status'], 'succeeded')
+
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.status, 'ended')
+        self.assertEqual(self.conversation.summary, summary_job['result']['summary'])
+        self.assertTrue(self.conversation.title.startswith('Stub-'))
+
+    def test_failed_attempt_is_retried(self):
+        with mock.patch.object(
+            AIService, 'generate_conversation_summary', side_effect=[RuntimeError('throttled'), 'Recovered']
+        ):
+            data = self.end()
+        job = Job.objects.get(id=data['jobs']['summary'])
+        self.assertEqual((job.status, job.attempts), ('succeeded', 2))
+        self.conversation.refresh_from_db()
+        self.assertEqual(self.conversation.summary, 'Recovered')
+
+
+@override_settings(LLM_PROVIDER='stub', JOB_BACKEND='sync', EMBEDDING_INDEX_DIR='', BULK_WORKERS=1, BULK_RATE_LIMIT=0)
+class BulkEndConversationsTests(TestCase):
+
+    def setUp(self):
+        self.idle = Conversation.objects.create(title="Idle")
+        Message.objects.create(conversation=self.idle, content="Old question", sender='user')
+        Conversation.objects.filter(id=self.idle.id).update(last_message_at=timezone.now() - timedelta(hours=3))
+        self.busy = Conversation.objects.create(title="Busy")
+        Message.objects.create(conversation=self.busy, content="Fresh question", sender='user')
+
+    def test_ends_idle_conversations_and_summarizes_them_in_one_job(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('bulk_end_conversations'), {'idle_minutes': 60}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['conversation_ids'], [self.idle.id])
+
+        job = Job.objects.get(id=response.json()['job'])
+        self.assertEqual(job.status, 'succeeded')
+        self.assertEqual((job.result['summarized'], job.result['failed']), (1, []))
+
+        self.idle.refresh_from_db()
+        self.busy.refresh_from_db()
+        self.assertEqual(self.idle.status, 'ended')
+        self.assertTrue(self.idle.summary and self.idle.title.startswith('Stub-'))
+        self.assertEqual(self.busy.status, 'active')
+
+    def test_requires_ids_or_idle_time(self):
+        response = self.client.post(reverse('bulk_end_conversations'), {}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.trip = Conversation.objects.create(title="Trip planning", status='ended', summary="Flights to Lisbon")
+        Message.objects.create(conversation=self.trip, content="Find cheap flights to Lisbon", sender='user')
+        self.cooking = Conversation.objects.create(title="Dinner", status='ended')
+        Message.objects.create(conversation=self.cooking, content="A pasta recipe with garlic", sender='user')
+        Message.objects.create(conversation=self.cooking, content="Garlic bread goes well with pasta", sender='ai')
+        self.active = Conversation.objects.create(title="Pasta again", status='active')
+
+    def test_ranks_matching_conversations(self):
+        ranked = search_conversations("What did we say about pasta?")
+        self.assertEqual({cid for cid, _ in ranked}, {self.cooking.id, self.active.id})
+        self.assertEqual([score for _, score in ranked], sorted((score for _, score in ranked), reverse=True))
+
+    def test_filters_are_pushed_down(self):
+        ranked = search_conversations("pasta", status='ended')
+        self.assertEqual([cid for cid, _ in ranked], [self.cooking.id])
+
+    def test_index_follows_updates(self):
+        Conversation.objects.filter(id=self.trip.id).update(summary="Ended up cooking pasta")
+        self.assertIn(self.trip.id, [cid for cid, _ in search_conversations("pasta")])
+
+    def test_search_endpoint(self):
+        data = self.client.get(reverse('search_conversations'), {'q': 'lisbon', 'keywords': 'flights'}).json()
+        self.assertEqual([c['id'] for c in data['conversations']], [self.trip.id])
+        self.assertGreater(data['conversations'][0]['rank'], 0)
+
+
+@override_settings(EMBEDDING_INDEX_DIR='', EMBEDDING_DIM=64)
+class EmbeddingIndexTests(TestCase):
+
+    def test_add_delete_and_top_k(self):
+        embedder = HashingEmbedder()
+        index = EmbeddingIndex(embedder.dim)
+        index.add(1, embedder.embed(["flights to lisbon", "hotel booking"]))
+        index.add(2, embedder.embed(["pasta recipe with garlic"]))
+        index.add(3, embedder.embed(["garlic bread"]))
+
+        hits = index.search(embedder.embed(["pasta recipe"])[0], k=2)
+        self.assertEqual(hits[0][0], 2)
+        self.assertEqual(len(hits), 2)
+
+        index.delete(2)
+        hits = index.search(embedder.embed(["pasta recipe"])[0], k=3)
+        self.assertNotIn(2, [cid for cid, _ in hits])
+        self.assertEqual(len(index), 3)
+
+    def test_persisted_index_is_reloaded(self):
+        embedder = HashingEmbedder()
+        with tempfile.TemporaryDirectory() as path:
+            writer = EmbeddingIndex(embedder.dim, path=path)
+            writer.add(7, embedder.embed(["quarterly budget review"]))
+            writer.save()
+
+            reader = EmbeddingIndex(embedder.dim, path=path, mmap=True)
+            self.assertEqual(reader.search(embedder.embed(["budget"])[0], k=1)[0][0], 7)
+
+    def test_concurrent_writers_append_segments(self):
+        embedder = HashingEmbedder()
+        with tempfile.TemporaryDirectory() as path:
+            # Two processes' indexes on one directory
+            first = EmbeddingIndex(embedder.dim, path=path, max_segments=4)
+            second = EmbeddingIndex(embedder.dim, path=path, max_segments=4)
+            first.update({1: embedder.embed(["flights to lisbon"])})
+            second.update({2: embedder.embed(["pasta recipe"])})
+            first.update({1: embedder.embed(["train to porto"]), 3: embedder.embed(["garlic bread"])})
+            self.assertEqual(len(os.listdir(path)), 4)  # lock + three segments
+            second.update({3: None})
+            second.update({99: None})  # never indexed: nothing to write
+            self.assertEqual(len(os.listdir(path)), 5)
+
+            # The four segments are merged into a base snapshot
+            self.assertTrue(second.merge())
+            self.assertEqual(sorted(os.listdir(path)), ['base-000000000004.ids.npy', 'base-000000000004.vectors.npy', 'lock'])
+            reader = EmbeddingIndex(embedder.dim, path=path)
+            for index in (first, reader):
+                index.reload()
+                self.assertEqual(sorted(set(index.conversation_ids[:index.size][index.alive[:index.size]])), [1, 2])
+                self.assertEqual(index.search(embedder.embed(["porto"])[0], k=1)[0][0], 1)
+
+    def test_deleted_conversations_share_one_segment(self):
+        with tempfile.TemporaryDirectory() as path, override_settings(EMBEDDING_INDEX_DIR=path):
+            conversations = [Conversation.objects.create(title=f"Trip {i}", summary="Lisbon flights") for i in range(3)]
+            index_conversations([conversation.id for conversation in conversations])
+            with self.captureOnCommitCallbacks(execute=True):
+                Conversation.objects.filter(id__in=[conversation.id for conversation in conversations[:2]]).delete()
+            with self.captureOnCommitCallbacks(execute=True):
+                Conversation.objects.create(title="Unindexed").delete()
+
+            self.assertEqual(len([name for name in os.listdir(path) if name.startswith('segment-')]), 2)
+            self.assertEqual([cid for cid, _ in semantic_search("lisbon flights")], [conversations[2].id])
+
+    def test_query_uses_semantic_candidates(self):
+        conversation = Conversation.objects.create(title="Budget", status='ended', summary="Quarterly budget review")
+        Conversation.objects.create(title="Other", status='ended', summary="Unrelated")
+        index_conversation(conversation.id)
+        candidates = AIService.candidate_conversations("quarterly budget", {}, limit=1)
+        self.assertEqual(candidates, [conversation])
+
+
+@override_settings(LLM_PROVIDER='stub', LLM_CACHE_MAX_ENTRIES=2, LLM_CACHE_ALIAS='default')
+class LLMCacheTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_lru_eviction_and_stats(self):
+        cache = get_llm_cache()
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key.upper())
+        cache.clear()  # drop the memory tier; the shared tier still has everything
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertIsNone(cache.get('missing'))
+
+        stats = cache.stats()
+        self.assertEqual((stats['memory_hits'], stats['shared_hits'], stats['misses']), (1, 1, 1))
+        self.assertEqual(stats['evictions'], 1)
+
+    def test_summary_is_reused_until_messages_change(self):
+        conversation = Conversation.objects.create(title="Cached")
+        Message.objects.create(conversation=conversation, content="First point", sender='user')
+
+        with mock.patch.object(StubProvider, 'generate', autospec=True, side_effect=StubProvider.generate) as generate:
+            first = AIService.generate_conversation_summary(conversation.id)
+            self.assertEqual(AIService.generate_conversation_summary(conversation.id), first)
+            self.assertEqual(generate.call_count, 1)
+
+            Message.objects.create(conversation=conversation, content="Second point", sender='ai')
+            AIService.generate_conversation_summary(conversation.id)
+            self.assertEqual(generate.call_count, 2)
+
+
+@override_settings(LLM_PROVIDER='stub', LLM_CACHE_ENABLED=False)
+class MapReduceSummarizerTests(TestCase):
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(title="Long")
+        self.add_messages(0, 12)
+
+    def add_messages(self, start, stop):
+        for i in range(start, stop):
+            Message.objects.create(
+                conversation=self.conversation,
+                content=f"message {i} " + "word " * 30,
+                sender='user' if i % 2 == 0 else 'ai'
+            )
+
+    def summarize(self):
+        summarizer = MapReduceSummarizer(context_tokens=200, chunk_tokens=100, workers=2)
+        with mock.patch.object(StubProvider, 'generate', autospec=True, side_effect=StubProvider.generate) as generate:
+            summary = summarizer.summarize(self.conversation.id)
+        chunk_calls = [call for call in generate.call_args_list if call.args[1].startswith(CHUNK_PROMPT[:40])]
+        return summary, len(chunk_calls)
+
+    def test_short_conversation_uses_single_call(self):
+        conversation = Conversation.objects.create(title="Short")
+        Message.objects.create(conversation=conversation, content="Hi", sender='user')
+        with mock.patch.object(StubProvider, 'generate', autospec=True, side_effect=StubProvider.generate) as generate:
+            self.assertTrue(MapReduceSummarizer(context_tokens=200).summarize(conversation.id))
+        self.assertEqual(generate.call_count, 1)
+        self.assertFalse(ChunkSummary.objects.filter(conversation=conversation).exists())
+
+    def test_sealed_chunks_are_reused_as_conversation_grows(self):
+        summary, chunk_calls = self.summarize()
+        self.assertTrue(summary)
+        sealed = ChunkSummary.objects.filter(conversation=self.conversation).count()
+        self.assertGreater(sealed, 0)
+        self.assertEqual(chunk_calls, sealed + 1)
+
+        self.add_messages(12, 14)
+        _, chunk_calls = self.summarize()
+        grown = ChunkSummary.objects.filter(conversation=self.conversation).count()
+        # Only the unsealed tail (plus the new messages) is summarized again
+        self.assertEqual(chunk_calls, grown - sealed + 1)
+        self.assertLess(chunk_calls, grown + 1)
+
+
+@override_settings(LLM_PROVIDER='stub', LLM_RETRY_BACKOFF_SECONDS=0, LLM_BREAKER_FAILURES=2)
+class ResilienceTests(TestCase):
+
+    def test_retries_transient_errors_then_opens_circuit(self):
+        provider = get_provider()
+        calls = []
+
+        def flaky(prompt, **config):
+            calls.append(prompt)
+            raise ConnectionError('upstream 503')
+
+        with mock.patch.object(provider, '_generate', side_effect=flaky):
+            with self.assertRaises(ConnectionError):
+                provider.generate("hello")
+            # Two consecutive failures opened the breaker: the next call fails fast
+            with self.assertRaises(CircuitOpenError):
+                provider.generate("hello")
+        self.assertEqual(len(calls), 2)
+        stats = provider.stats()
+        self.assertEqual((stats['retries'], stats['circuit_breaker']['state']), (1, 'open'))
+
+    def test_half_open_probe_closes_circuit(self):
+        guard = Resilience(failure_threshold=1, reset_seconds=0, backoff=0, max_attempts=1)
+        with self.assertRaises(ConnectionError):
+            guard.call(mock.Mock(side_effect=ConnectionError), lambda e: True)
+        self.assertEqual(guard.breaker.state, 'open')
+        self.assertEqual(guard.call(lambda: 'ok', lambda e: True), 'ok')
+        self.assertEqual(guard.breaker.state, 'closed')
+
+    def test_bad_requests_are_not_retried(self):
+        guard = Resilience(backoff=0)
+        func = mock.Mock(side_effect=ValueError('bad prompt'))
+        with self.assertRaises(ValueError):
+            guard.call(func, lambda e: isinstance(e, ConnectionError))
+        self.assertEqual((func.call_count, guard.breaker.state), (1, 'closed'))
+
+    def test_bad_requests_do_not_reset_the_breaker(self):
+        guard = Resilience(failure_threshold=2, reset_seconds=0, backoff=0, max_attempts=1)
+        outage, bad_request = mock.Mock(side_effect=ConnectionError), mock.Mock(side_effect=ValueError)
+        retryable = lambda e: isinstance(e, ConnectionError)
+        for func in (outage, bad_request, outage):
+            with self.assertRaises((ConnectionError, ValueError)):
+                guard.call(func, retryable)
+        self.assertEqual(guard.breaker.state, 'open')
+        # A bad-request probe frees the half-open slot without closing it
+        with self.assertRaises(ValueError):
+            guard.call(bad_request, retryable)
+        self.assertEqual(guard.breaker.state, 'half_open')
+        self.assertEqual(guard.call(lambda: 'ok', retryable), 'ok')
+        self.assertEqual(guard.breaker.state, 'closed')
+
+    def test_token_bucket_rejects_beyond_wait_timeout(self):
+        bucket = TokenBucket(rate=1, burst=2, timeout=0.5)
+        self.assertEqual((bucket.reserve(), bucket.reserve()), (0, 0))
+        with self.assertRaises(RateLimitedError):
+            bucket.reserve()
+
+    def test_single_flight_coalesces_identical_calls(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        func = mock.Mock(side_effect=lambda: (started.set(), release.wait(), 'shared')[-1])
+        results = []
+
+        leader = threading.Thread(target=lambda: results.append(flight.do('key', func)))
+        leader.start()
+        started.wait()
+        follower = threading.Thread(target=lambda: results.append(flight.do('key', func)))
+        follower.start()
+        while flight.stats()['coalesced'] == 0:
+            time.sleep(0.001)
+        release.set()
+        leader.join()
+        follower.join()
+        self.assertEqual((results, func.call_count), (['shared', 'shared'], 1))
+
+
+@override_settings(LLM_PROVIDER='stub')
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        REGISTRY.clear()
+
+    @override_settings(JOB_BACKEND='sync')
+    def test_request_stage_and_llm_metrics_are_exposed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('send_message'), {'message': 'Hi there'}, content_type='application/json'
+            )
+        # The background job replaced the drafted title
+        conversation = Conversation.objects.get(id=response.json()['conversation_id'])
+        self.assertNotEqual(conversation.title, 'Hi there')
+
+        self.assertEqual(HTTP_REQUESTS.value(view='send_message', method='POST', status=201), 1)
+        self.assertEqual(STAGE_SECONDS.count(stage='send_message.generate'), 1)
+        self.assertEqual(PROMPT_CHARS.count(kind='chat'), 1)
+        self.assertGreater(DB_QUERIES._values[('send_message',)][1], 0)
+
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('chat_llm_seconds_count{provider="stub",operation="generate"} 2', body)
+        self.assertIn('chat_stage_seconds_bucket{stage="send_message.start_turn",le="+Inf"} 1', body)
+        self.assertIn('chat_llm_cache_hit_ratio', body)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram('test_seconds', "Test", buckets=(1, 2))
+        for value in (0.5, 1.5, 5):
+            histogram.observe(value)
+        self.assertEqual(histogram.render()[2:], [
+            'test_seconds_bucket{le="1.0"} 1',
+            'test_seconds_bucket{le="2.0"} 2',
+            'test_seconds_bucket{le="+Inf"} 3',
+            'test_seconds_sum 7.0',
+            'test_seconds_count 3',
+        ])
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False)
+class FastJSONTests(TestCase):
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(title='Ünïcode "quotes" \u2028 tab\t', summary="Sum \U0001f600")
+        contents = ["plain", "line\nbreak \u2029 and \\ backslash", "emoji \U0001f680 </script>", "\x01 control"]
+        for i, content in enumerate(contents):
+            Message.objects.create(conversation=self.conversation, content=content, sender='user' if i % 2 else 'ai')
+        ended = Conversation.objects.create(title="Ended", status='ended')
+        Conversation.objects.filter(id=ended.id).update(end_timestamp=ended.start_timestamp + timedelta(minutes=7, seconds=13))
+
+    def assertSameBytes(self, url, params=None):
+        with override_settings(FAST_JSON_RESPONSES=False):
+            slow = self.client.get(url, params or {})
+        with override_settings(FAST_JSON_RESPONSES=True):
+            fast = self.client.get(url, params or {})
+        self.assertEqual(fast.status_code, slow.status_code)
+        self.assertEqual(fast['Content-Type'], slow['Content-Type'])
+        self.assertEqual(fast.content, slow.content)
+        return fast
+
+    def test_fast_path_matches_drf_bytes(self):
+        detail = reverse('get_conversation', args=[self.conversation.id])
+        response = self.assertSameBytes(detail)
+        self.assertIn(b'\\u2028', response.content)
+        self.assertSameBytes(detail, {'after_id': 0, 'limit': 3})
+        self.assertSameBytes(reverse('list_conversations'))
+        self.assertSameBytes(reverse('list_conversations'), {'limit': 1, 'status': 'ended'})
+
+        ended = Conversation.objects.get(title="Ended")
+        response = self.assertSameBytes(reverse('get_conversation', args=[ended.id]))
+        self.assertEqual(response.json()['conversation']['duration_minutes'], 7.22)
+
+    def test_stdlib_encoder_matches_renderer(self):
+        data = {'a': ["ü \u2028", 1.5, None, True], 'b': {'c': "\x1f\"/"}}
+        with mock.patch.object(fastjson, 'orjson', None):
+            self.assertEqual(fastjson.dumps(data), JSONRenderer().render(data))
+
+
+class LoadTestHelperTests(TestCase):
+
+    def test_seeded_conversations_have_messages_and_counters(self):
+        conversation_ids = seed_conversations(3, 4, status='active')
+        self.assertEqual(Message.objects.filter(conversation_id__in=conversation_ids).count(), 12)
+        self.assertEqual(
+            set(Conversation.objects.filter(id__in=conversation_ids).values_list('message_count', flat=True)), {4}
+        )
+        starts = list(Conversation.objects.filter(id__in=conversation_ids).order_by('id').values_list('start_timestamp', flat=True))
+        self.assertEqual([starts[0] - start for start in starts], [timedelta(minutes=i) for i in range(3)])
+
+    def test_percentiles_use_nearest_rank(self):
+        stats = percentiles(list(range(1, 101)))
+        self.assertEqual((stats['p50'], stats['p95'], stats['p99'], stats['max']), (50, 95, 99, 100))
+        self.assertIsNone(percentiles([]))
+
+    def test_bench_queries_prints_plans_and_rolls_back(self):
+        out = StringIO()
+        call_command('bench_queries', conversations=3, messages=2, repeat=1, explain=True, stdout=out)
+        self.assertIn('-- list page (status)\n', out.getvalue())
+        self.assertIn('Rolled back seeded rows', out.getvalue())
+        self.assertFalse(Conversation.objects.exists())
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=False, ARCHIVE_AFTER_DAYS=30)
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(title="Old", summary="Done")
+        for i in range(5):
+            Message.objects.create(conversation=self.conversation, content=f"message {i} \u2014 ok", sender='user' if i % 2 == 0 else 'ai')
+        self.conversation.end_conversation()
+        Conversation.objects.filter(id=self.conversation.id).update(end_timestamp=timezone.now() - timedelta(days=31))
+        self.url = reverse('get_conversation', args=[self.conversation.id])
+        self.first_id = self.conversation.messages.first().id
+
+    def responses(self):
+        return [
+            self.client.get(self.url).json()['conversation'],
+            self.client.get(self.url, {'after_id': self.first_id, 'limit': 2}).json(),
+            b''.join(self.client.get(self.url, {'stream': 'ndjson'}).streaming_content),
+        ]
+
+    def test_archived_conversation_reads_the_same(self):
+        before = self.responses()
+        title_source = AIService.first_message(self.conversation.id)
+        self.assertEqual(archivable_conversations(), [self.conversation.id])
+
+        report = archive_conversations(archivable_conversations())
+        self.assertEqual((report['archived'], report['messages']), (1, 5))
+        self.assertFalse(Message.objects.filter(conversation=self.conversation).exists())
+        self.conversation.refresh_from_db()
+        self.assertIsNotNone(self.conversation.archived_at)
+        self.assertEqual(archivable_conversations(), [])
+
+        self.assertEqual(self.responses(), before)
+        with self.settings(FAST_JSON_RESPONSES=False):
+            messages = self.client.get(self.url).json()['conversation']['messages']
+        self.assertEqual(messages, before[0]['messages'])
+        self.assertEqual(AIService.first_message(self.conversation.id), title_source)
+        # The map-reduce summarizer reads the archive past its sealed chunks
+        self.assertEqual([row[2] for row in transcript_rows(self.conversation.id)], [m['content'] for m in messages])
+
+    def test_reads_after_an_id_skip_earlier_blocks(self):
+        now = timezone.now()
+        rows = [(i, 'ai', "word " * i, now, True) for i in range(1, 50)]
+        data, blocks, count, _ = pack(rows, block_bytes=200)
+        self.assertEqual(count, 49)
+        self.assertEqual(list(unpack(data, blocks)), rows)
+        with mock.patch('chat.archive.zlib.decompress', wraps=zlib.decompress) as decompress:
+            self.assertEqual(list(unpack(data, blocks, after_id=45)), rows[45:])
+        self.assertEqual(decompress.call_count, sum(top > 45 for top, _ in blocks))
+        self.assertLess(decompress.call_count, len(blocks))
+
+        # A page only reads the blob from its first block on
+        with self.settings(ARCHIVE_BLOCK_BYTES=40):
+            archive_conversations([self.conversation.id])
+        self.assertGreater(len(self.conversation.archive.blocks), 2)
+        page = self.client.get(self.url, {'after_id': self.first_id + 2, 'limit': 1}).json()
+        self.assertEqual([m['content'] for m in page['conversation']['messages']], ["message 3 \u2014 ok"])
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], DATABASE_REPLICA_LAG_SECONDS=60)
+class ReplicaRouterTests(TestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+        @replica_reads
+        def view(scope):
+            read_from_primary(scope)
+            return self.router.db_for_read(Conversation)
+        self.view = view
+
+    def test_only_replica_views_read_from_replicas(self):
+        scope = 'conversation:1'
+        get_response_cache().cache.set(f"chat:response:{scope}:version", time.time_ns() - 10 ** 12, timeout=None)
+        self.assertEqual(self.view(scope), 'replica1')
+        self.assertIsNone(self.router.db_for_read(Conversation))
+        self.assertEqual(self.router.db_for_write(Conversation), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'chat'))
+
+    def test_recent_write_reads_from_primary(self):
+        invalidate_responses([2])
+        self.assertIsNone(self.view('conversation:2'))
+        self.assertIsNone(self.view('list'))
+
+    def test_search_sql_runs_on_the_routed_alias(self):
+        replica = mock.Mock(vendor='sqlite')
+
+        @replica_reads
+        def view():
+            return get_backend()
+
+        with mock.patch('chat.search.connections', {'default': connection, 'replica1': replica}):
+            self.assertIs(view().connection, replica)
+            self.assertIs(get_backend().connection, connection)
+
+
+class WritePathTests(TestCase):
+
+    def test_start_turn_inserts_messages_in_one_statement(self):
+        conversation = Conversation.objects.create(title="Existing")
+        with self.assertNumQueries(4):  # SAVEPOINT, bulk INSERT, counter UPDATE, RELEASE
+            user_msg, ai_msg = start_turn(conversation, "Hello")
+        self.assertEqual((user_msg.sender, ai_msg.sender), ('user', 'ai'))
+        self.assertFalse(Message.objects.get(id=ai_msg.id).is_complete)
+
+    def test_checkpoints_on_byte_threshold(self):
+        _, ai_msg = start_turn(Conversation(title="New"), "Hello")
+        checkpointer = StreamCheckpointer(ai_msg, min_bytes=10, min_interval=60)
+        self.assertFalse(checkpointer.add("short"))
+        self.assertTrue(checkpointer.add(" and longer"))
+        checkpointer.checkpoint()
+        self.assertEqual(Message.objects.get(id=ai_msg.id).content, "short and longer")
+
+        checkpointer.add("!")
+        checkpointer.finalize()
+        ai_msg.refresh_from_db()
+        self.assertEqual((ai_msg.content, ai_msg.is_complete), ("short and longer!", True))
+
+    def test_zero_threshold_checkpoints_every_chunk(self):
+        _, ai_msg = start_turn(Conversation(title="New"), "Hello")
+        checkpointer = StreamCheckpointer(ai_msg, min_bytes=0, min_interval=60)
+        self.assertTrue(checkpointer.add("a"))
+
+    def test_recover_orphaned_messages(self):
+        conversation = Conversation.objects.create(title="Crashed")
+        _, partial = start_turn(conversation, "one")
+        _, empty = start_turn(conversation, "two")
+        Message.objects.filter(id=partial.id).update(content="half a repl")
+
+        self.assertEqual(recover_orphaned_messages(older_than=0), (1, 1))
+        self.assertTrue(Message.objects.get(id=partial.id).is_complete)
+        self.assertFalse(Message.objects.filter(id=empty.id).exists())
+
+
+class ConversationDetailTests(TestCase):
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(title="History")
+        for i in range(7):
+            Message.objects.create(conversation=self.conversation, content=f"m{i}", sender='user')
+        self.url = reverse('get_conversation', args=[self.conversation.id])
+
+    def test_cursor_pagination(self):
+        seen, after_id = [], 0
+        while after_id is not None:
+            data = self.client.get(self.url, {'after_id': after_id, 'limit': 3}).json()
+            seen += [m['content'] for m in data['conversation']['messages']]
+            after_id = data['next_after_id']
+        self.assertEqual(seen, [f"m{i}" for i in range(7)])
+
+    def test_ndjson_stream_matches_full_response(self):
+        full = self.client.get(self.url).json()['conversation']
+        response = self.client.get(self.url, {'stream': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+        header = lines[0]
+        self.assertEqual(header.pop('type'), 'conversation')
+        messages = [{k: v for k, v in line.items() if k != 'type'} for line in lines[1:]]
+        self.assertEqual(messages, full.pop('messages'))
+        self.assertEqual(header, full)
+
+    def test_unchanged_poll_is_served_from_cache_as_304(self):
+        first = self.client.get(self.url)
+        etag = first['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        start_turn(self.conversation, "new question")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['conversation']['messages'][-2]['content'], "new question")
+
+    @override_settings(JOB_BACKEND='db')
+    def test_list_cache_follows_end_conversation(self):
+        url = reverse('list_conversations')
+        self.assertEqual(self.client.get(url, {'status': 'ended'}).json()['count'], 0)
+        with self.assertNumQueries(0):
+            self.client.get(url, {'status': 'ended'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('end_conversation'), {'conversation_id': self.conversation.id}, content_type='application/json'
+            )
+        self.assertEqual(self.client.get(url, {'status': 'ended'}).json()['count'], 1)
+        self.assertEqual(self.client.get(self.url).json()['conversation']['status'], 'ended')
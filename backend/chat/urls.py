@@ -5,10 +5,17 @@ urlpatterns = [
     # GET APIs
     path('conversations/', views.list_conversations, name='list_conversations'),
     path('conversations/<int:conversation_id>/', views.get_conversation, name='get_conversation'),
+    path('search/', views.search_conversations, name='search_conversations'),
+    path('jobs/<int:job_id>/', views.get_job, name='get_job'),
+    path('llm-cache/stats/', views.llm_cache_stats, name='llm_cache_stats'),
+    path('llm-provider/stats/', views.llm_provider_stats, name='llm_provider_stats'),
     
     # POST APIs
     path('send-message/', views.send_message, name='send_message'),
     path('send-message-stream/', views.send_message_stream, name='send_message_stream'),  # NEW
+    path('send-message-stream/<int:message_id>/', views.resume_message_stream, name='resume_message_stream'),
     path('end-conversation/', views.end_conversation, name='end_conversation'),
+    path('bulk-end-conversations/', views.bulk_end_conversations, name='bulk_end_conversations'),
     path('query-conversations/', views.query_conversations, name='query_conversations'),
+    path('query-conversations-stream/', views.query_conversations_stream, name='query_conversations_stream'),
 ]
\ No newline at end of file
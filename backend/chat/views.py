@@ -1,48 +1,242 @@
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.http import parse_etags
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+import asyncio
 import json
-from .models import Conversation, Message
+import time
+from itertools import islice
+from .models import Conversation, Job, Message
 from .serializers import (
+    BulkEndConversationsSerializer,
     ConversationListSerializer,
     ConversationDetailSerializer,
+    ConversationHeaderSerializer,
+    ConversationMessagesQuerySerializer,
+    ConversationSearchResultSerializer,
+    JobSerializer,
+    MessageSerializer,
+    SearchConversationsSerializer,
     SendMessageSerializer,
     EndConversationSerializer,
     QueryConversationsSerializer
 )
 from .ai_service import AIService
+from .archive import archived_messages
+from . import fastjson, jobs
+from .bulk import end_conversations, idle_conversations
+from .fanout import QueryFanOut
+from .pagination import DEFAULT_PAGE_SIZE, InvalidCursor, keyset_page, parse_limit
+from .llm_cache import get_llm_cache
+from .metrics import REGISTRY, stage
+from .providers import get_provider
+from .response_cache import get_response_cache, make_etag
+from .routers import read_from_primary, replica_reads
+from .search import ranked_conversations
+from .sse import SSEWriter, digest
+from .writes import StreamCheckpointer, start_turn
 
 
 @api_view(['GET'])
+@replica_reads
 def list_conversations(request):
-    """GET: Retrieve all conversations with basic info"""
+    """GET: Retrieve conversations with basic info, newest first, cursor-paginated
+
+    Query params: cursor, limit, status
+    """
+    conversation_status = request.query_params.get('status')
+    cursor = request.query_params.get('cursor')
+    limit = request.query_params.get('limit')
+
+    fast = use_fast_json(request)
+
+    cache = get_response_cache()
+    if cache is not None:
+        key, entry = cache.lookup('list', json.dumps([conversation_status, cursor, limit, fast]))
+        if entry is not None:
+            return conditional_response(request, *entry)
+    read_from_primary('list')
+
     conversations = Conversation.objects.all()
-    serializer = ConversationListSerializer(conversations, many=True)
-    return Response({
+    if conversation_status:
+        conversations = conversations.filter(status=conversation_status)
+    if fast:
+        conversations = conversations.values(*fastjson.LIST_FIELDS)
+
+    try:
+        page, next_cursor = keyset_page(conversations, cursor=cursor, limit=parse_limit(limit))
+    except InvalidCursor as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    data = {
         'success': True,
-        'count': conversations.count(),
-        'conversations': serializer.data
-    })
+        'count': len(page),
+        'next_cursor': next_cursor,
+        'conversations': (
+            fastjson.conversation_rows(page) if fast
+            else ConversationListSerializer(page, many=True).data
+        )
+    }
+    if fast:
+        data = fastjson.dumps(data)
+    etag = cache.store(key, data) if cache is not None else make_etag(data)
+    return conditional_response(request, etag, data)
+
+
+def use_fast_json(request):
+    """Whether to bypass the serializers (see fastjson.py) for this request"""
+    return settings.FAST_JSON_RESPONSES and 'indent' not in (request.accepted_media_type or '')
+
+
+def conditional_response(request, etag, data):
+    """
+    Response with an ETag; 304 without a body when If-None-Match already
+    has it. `data` is either serializer data or JSON bytes from fastjson.
+    """
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    elif isinstance(data, bytes):
+        response = HttpResponse(data, content_type='application/json')
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    # Clients may keep the body but must revalidate it on every poll
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 
 @api_view(['GET'])
+@replica_reads
 def get_conversation(request, conversation_id):
-    """GET: Get specific conversation with full message history"""
+    """GET: Get specific conversation with its message history
+
+    Query params:
+      after_id, limit  page through messages (returns next_after_id)
+      stream=ndjson    stream the whole history as newline-delimited JSON
+    Without them the full history is returned in one response.
+    """
+    params = ConversationMessagesQuerySerializer(data=request.query_params)
+    if not params.is_valid():
+        return Response({
+            'success': False,
+            'errors': params.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    options = params.validated_data
+
+    fast = use_fast_json(request)
+
+    cache = get_response_cache()
+    if cache is not None and options.get('stream') != 'ndjson':
+        variant = json.dumps([options.get('after_id'), options.get('limit'), fast])
+        key, entry = cache.lookup(f"conversation:{conversation_id}", variant)
+        if entry is not None:
+            return conditional_response(request, *entry)
+    else:
+        cache = None
+    read_from_primary(f"conversation:{conversation_id}")
+
     try:
         conversation = Conversation.objects.get(id=conversation_id)
-        serializer = ConversationDetailSerializer(conversation)
-        return Response({
-            'success': True,
-            'conversation': serializer.data
-        })
     except Conversation.DoesNotExist:
         return Response({
             'success': False,
             'error': 'Conversation not found'
         }, status=status.HTTP_404_NOT_FOUND)
 
+    if options.get('stream') == 'ndjson':
+        response = StreamingHttpResponse(
+            stream_conversation_ndjson(conversation),
+            content_type='application/x-ndjson'
+        )
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    archived = conversation.archived_at is not None
+    if 'after_id' not in options and 'limit' not in options:
+        messages = archived_messages(conversation) if archived else conversation.messages.all()
+        if fast:
+            conversation_data = fastjson.conversation_header(conversation, fastjson.message_rows(messages))
+        elif archived:
+            conversation_data = ConversationHeaderSerializer(conversation).data
+            conversation_data['messages'] = MessageSerializer(list(messages), many=True).data
+        else:
+            conversation_data = ConversationDetailSerializer(conversation).data
+        data = {
+            'success': True,
+            'conversation': conversation_data
+        }
+    else:
+        limit = options.get('limit', DEFAULT_PAGE_SIZE)
+        after_id = options.get('after_id', 0)
+        if archived:
+            # Decompression stops once the page is full
+            page = list(islice(archived_messages(conversation, after_id), limit + 1))
+        else:
+            page = conversation.messages.filter(id__gt=after_id).order_by('id')[:limit + 1]
+        if fast:
+            messages = fastjson.message_rows(page)
+            next_after_id = messages[limit - 1]['id'] if len(messages) > limit else None
+            conversation_data = fastjson.conversation_header(conversation)
+            conversation_data['messages'] = messages[:limit]
+        else:
+            messages = list(page)
+            next_after_id = messages[limit - 1].id if len(messages) > limit else None
+            conversation_data = ConversationHeaderSerializer(conversation).data
+            conversation_data['messages'] = MessageSerializer(messages[:limit], many=True).data
+        data = {
+            'success': True,
+            'conversation': conversation_data,
+            'next_after_id': next_after_id
+        }
+
+    if fast:
+        data = fastjson.dumps(data)
+    if cache is None:
+        return conditional_response(request, make_etag(data), data)
+    # Ended conversations only change through invalidated writes (summary, title)
+    etag = cache.store(key, data, forever=conversation.status == 'ended')
+    return conditional_response(request, etag, data)
+
+
+def stream_conversation_ndjson(conversation):
+    """Yield the conversation header, then one JSON line per message.
+
+    Rows are read with a chunked iterator (or decompressed from the archive
+    chunk by chunk) and written out in batches, so memory use does not
+    depend on the length of the history.
+    """
+    header = ConversationHeaderSerializer(conversation).data
+    yield encode_json_line({'type': 'conversation', **header})
+
+    serializer = MessageSerializer()
+    batch = []
+    if conversation.archived_at is not None:
+        rows = archived_messages(conversation)
+    else:
+        rows = conversation.messages.order_by('id').iterator(chunk_size=settings.NDJSON_CHUNK_SIZE)
+    for message in rows:
+        batch.append(encode_json_line({'type': 'message', **serializer.to_representation(message)}))
+        if len(batch) >= settings.NDJSON_CHUNK_SIZE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def encode_json_line(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')) + '\n'
+
 
 @api_view(['POST'])
 def send_message(request):
@@ -59,6 +253,7 @@ def send_message(request):
     user_message = data['message']
     conversation_id = data.get('conversation_id')
     title = data.get('title', '')
+    draft = ''
     
     try:
         if conversation_id:
@@ -69,31 +264,33 @@ def send_message(request):
                     'error': 'Cannot send messages to ended conversation'
                 }, status=status.HTTP_400_BAD_REQUEST)
         else:
-            conversation = Conversation.objects.create(
-                title=title or AIService.generate_conversation_title(user_message),
-                status='active'
-            )
+            if not title:
+                draft = AIService.draft_title(user_message)
+            conversation = Conversation(title=title or draft, status='active')
         
-        user_msg = Message.objects.create(
-            conversation=conversation,
-            content=user_message,
-            sender='user'
-        )
+        with stage('send_message.start_turn'):
+            user_msg, _ = start_turn(conversation, user_message, placeholder=False)
+        if draft:
+            # The generated title replaces the draft in the background
+            jobs.enqueue('title_conversation', conversation=conversation, payload={'draft': draft})
         
-        ai_response_text = AIService.generate_chat_response(
-            conversation.id, 
-            user_message
-        )
+        with stage('send_message.generate'):
+            ai_response_text = AIService.generate_chat_response(
+                conversation.id, 
+                user_message
+            )
         
-        ai_msg = Message.objects.create(
-            conversation=conversation,
-            content=ai_response_text,
-            sender='ai'
-        )
+        with stage('send_message.save'):
+            ai_msg = Message.objects.create(
+                conversation=conversation,
+                content=ai_response_text,
+                sender='ai'
+            )
         
         return Response({
             'success': True,
             'conversation_id': conversation.id,
+            'title': conversation.title,
             'user_message': {
                 'id': user_msg.id,
                 'content': user_msg.content,
@@ -118,13 +315,29 @@ def send_message(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@api_view(['POST'])
-def send_message_stream(request):
-    """POST: Send message with streaming response"""
-    serializer = SendMessageSerializer(data=request.data)
+@csrf_exempt
+@require_POST
+async def send_message_stream(request):
+    """POST: Send message with streaming response
+
+    Async view: under ASGI each open stream is a coroutine rather than a
+    worker thread. If the client disconnects, upstream generation is
+    stopped and the partial reply is saved. A new conversation starts
+    with a title drafted from the message; the generated one follows in a
+    'title' event before 'done'.
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid JSON'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = SendMessageSerializer(data=payload)
     
     if not serializer.is_valid():
-        return Response({
+        return JsonResponse({
             'success': False,
             'errors': serializer.errors
         }, status=status.HTTP_400_BAD_REQUEST)
@@ -133,62 +346,88 @@ def send_message_stream(request):
     user_message = data['message']
     conversation_id = data.get('conversation_id')
     title = data.get('title', '')
+    draft = ''
     
     try:
         # Get or create conversation
         if conversation_id:
-            conversation = Conversation.objects.get(id=conversation_id)
+            conversation = await Conversation.objects.aget(id=conversation_id)
             if conversation.status != 'active':
-                return Response({
+                return JsonResponse({
                     'success': False,
                     'error': 'Cannot send messages to ended conversation'
                 }, status=status.HTTP_400_BAD_REQUEST)
         else:
-            conversation = Conversation.objects.create(
-                title=title or AIService.generate_conversation_title(user_message),
-                status='active'
-            )
+            if not title:
+                draft = AIService.draft_title(user_message)
+            conversation = Conversation(title=title or draft, status='active')
         
-        # Save user message
-        user_msg = Message.objects.create(
-            conversation=conversation,
-            content=user_message,
-            sender='user'
-        )
-        
-        # Create AI message placeholder
-        ai_msg = Message.objects.create(
-            conversation=conversation,
-            content="",  # Will be updated as we stream
-            sender='ai'
-        )
+        # Conversation, user message and AI placeholder in one transaction
+        with stage('send_message_stream.start_turn'):
+            user_msg, ai_msg = await sync_to_async(start_turn)(conversation, user_message)
         
-        def event_stream():
-            """Generator function for Server-Sent Events"""
-            full_response = ""
+        async def replies():
+            # Stream AI response, checkpointing long replies as we go
+            async for chunk in AIService.agenerate_chat_response_stream(conversation.id, user_message):
+                if checkpointer.add(chunk):
+                    with stage('send_message_stream.checkpoint'):
+                        await checkpointer.acheckpoint()
+                yield chunk
+
+        async def event_stream():
+            """Async generator for Server-Sent Events (see SSEWriter)"""
+            writer = SSEWriter()
+            # A new conversation's title is generated alongside the reply
+            title_task = None
+            if draft:
+                title_task = asyncio.ensure_future(sync_to_async(refine_title_in_thread, thread_sensitive=False)(
+                    conversation.id, draft, user_message
+                ))
             
             # Send initial metadata
-            yield f"data: {json.dumps({'type': 'start', 'conversation_id': conversation.id, 'user_message_id': user_msg.id, 'ai_message_id': ai_msg.id})}\n\n"
+            yield writer.event({
+                'type': 'start',
+                'conversation_id': conversation.id,
+                'title': conversation.title,
+                'user_message_id': user_msg.id,
+                'ai_message_id': ai_msg.id
+            }, 0)
             
             try:
-                # Stream AI response
-                for chunk in AIService.generate_chat_response_stream(conversation.id, user_message):
-                    full_response += chunk
-                    yield f"data: {json.dumps({'type': 'chunk', 'content': chunk})}\n\n"
+                async for frame in writer.frames(replies()):
+                    yield frame
                 
                 # Update the message in database with full response
-                ai_msg.content = full_response
-                ai_msg.save()
+                with stage('send_message_stream.finalize'):
+                    await checkpointer.afinalize()
+                
+                if title_task is not None:
+                    with stage('send_message_stream.title'):
+                        while not title_task.done():
+                            await asyncio.wait({title_task}, timeout=writer.timeout())
+                            frame = writer.tick()
+                            if frame:
+                                yield frame
+                    if title_task.result():
+                        yield writer.event({
+                            'type': 'title',
+                            'conversation_id': conversation.id,
+                            'title': title_task.result()
+                        })
                 
-                # Send completion event
-                yield f"data: {json.dumps({'type': 'done', 'full_content': full_response, 'timestamp': ai_msg.timestamp.isoformat()})}\n\n"
+                # The client already has the text: send ids and a digest to check it against
+                yield writer.event(done_event(ai_msg), writer.offset)
                 
+            except (asyncio.CancelledError, GeneratorExit):
+                # Client went away: keep whatever was generated so far
+                await asyncio.shield(checkpointer.afinalize())
+                raise
             except Exception as e:
                 error_msg = f"Error: {str(e)}"
-                ai_msg.content = error_msg
-                ai_msg.save()
-                yield f"data: {json.dumps({'type': 'error', 'error': error_msg})}\n\n"
+                await checkpointer.afinalize(error_msg)
+                yield writer.event({'type': 'error', 'error': error_msg})
         
+        checkpointer = StreamCheckpointer(ai_msg)
         response = StreamingHttpResponse(
             event_stream(),
             content_type='text/event-stream'
@@ -198,20 +437,90 @@ def send_message_stream(request):
         return response
         
     except Conversation.DoesNotExist:
-        return Response({
+        return JsonResponse({
             'success': False,
             'error': 'Conversation not found'
         }, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        return Response({
+        return JsonResponse({
             'success': False,
             'error': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def refine_title_in_thread(conversation_id, draft, first_message):
+    """jobs.refine_title off the event loop; on failure the draft stays until end_conversation retitles"""
+    try:
+        return jobs.refine_title(conversation_id, draft, first_message)
+    except Exception:
+        return None
+    finally:
+        close_old_connections()
+
+
+def done_event(message):
+    return {
+        'type': 'done',
+        'ai_message_id': message.id,
+        'length': len(message.content),
+        'sha256': digest(message.content),
+        'timestamp': message.timestamp.isoformat()
+    }
+
+
+@require_GET
+async def resume_message_stream(request, message_id):
+    """GET: Resume a streamed reply after a dropped connection
+
+    Sends the persisted text after the Last-Event-ID offset, then follows
+    the message's checkpoints until it is complete. Text generated since
+    the last checkpoint arrives with the next one.
+    """
+    try:
+        offset = max(int(request.headers.get('Last-Event-ID') or 0), 0)
+    except ValueError:
+        offset = 0
+
+    message = await Message.objects.filter(id=message_id, sender='ai').afirst()
+    if message is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Message not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    async def event_stream():
+        nonlocal message
+        writer = SSEWriter(offset=min(offset, len(message.content)), min_bytes=0)
+        changed = time.monotonic()
+        while True:
+            frame = writer.add(message.content[writer.offset:])
+            if frame:
+                changed = time.monotonic()
+                yield frame
+            if message.is_complete:
+                yield writer.event(done_event(message), writer.offset)
+                return
+            if time.monotonic() - changed > settings.ORPHAN_MESSAGE_SECONDS:
+                yield writer.event({'type': 'error', 'error': 'Stream interrupted'})
+                return
+            await asyncio.sleep(settings.SSE_RESUME_POLL_SECONDS)
+            frame = writer.tick()
+            if frame:
+                yield frame
+            message = await Message.objects.aget(id=message_id)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @api_view(['POST'])
 def end_conversation(request):
-    """POST: End conversation and trigger AI summary generation"""
+    """POST: End conversation and queue AI summary and title generation
+
+    Returns immediately with job ids; poll jobs/<id>/ for the results.
+    """
     serializer = EndConversationSerializer(data=request.data)
     
     if not serializer.is_valid():
@@ -231,22 +540,22 @@ def end_conversation(request):
                 'error': 'Conversation already ended'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        conversation.end_conversation()
-        
-        summary = AIService.generate_conversation_summary(conversation_id)
-        title = AIService.generate_conversation_title(conversation.messages.first().content if conversation.messages.exists() else "Conversation")
-
-        conversation.summary = summary
-        conversation.title = title
-        conversation.save()
+        with transaction.atomic():
+            conversation.end_conversation()
+            summary_job = jobs.enqueue('summarize_conversation', conversation=conversation)
+            title_job = jobs.enqueue('title_conversation', conversation=conversation)
         
         return Response({
             'success': True,
             'conversation_id': conversation.id,
-            'summary': summary,
-            'title': title,
-            'end_timestamp': conversation.end_timestamp
-        })
+            'summary': conversation.summary,
+            'title': conversation.title,
+            'end_timestamp': conversation.end_timestamp,
+            'jobs': {
+                'summary': summary_job.id,
+                'title': title_job.id
+            }
+        }, status=status.HTTP_202_ACCEPTED)
         
     except Conversation.DoesNotExist:
         return Response({
@@ -260,6 +569,47 @@ def end_conversation(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+def bulk_end_conversations(request):
+    """POST: End many active conversations (by ids or idle time)
+
+    Queues one bulk_summarize job that generates all summaries and titles
+    with bounded concurrency; poll jobs/<id>/ for its progress report.
+    """
+    serializer = BulkEndConversationsSerializer(data=request.data)
+
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        data = serializer.validated_data
+        with transaction.atomic():
+            conversation_ids = end_conversations(idle_conversations(
+                conversation_ids=data.get('conversation_ids'),
+                idle_minutes=data.get('idle_minutes'),
+                limit=data['limit']
+            ))
+            job = None
+            if conversation_ids:
+                job = jobs.enqueue('bulk_summarize', payload={'conversation_ids': conversation_ids})
+
+        return Response({
+            'success': True,
+            'ended': len(conversation_ids),
+            'conversation_ids': conversation_ids,
+            'job': job.id if job else None
+        }, status=status.HTTP_202_ACCEPTED)
+
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @api_view(['POST'])
 def query_conversations(request):
     """POST: Query AI about past conversations with intelligent analysis"""
@@ -273,13 +623,7 @@ def query_conversations(request):
     
     data = serializer.validated_data
     query = data['query']
-    
-    filters = {
-        'date_range_start': data.get('date_range_start'),
-        'date_range_end': data.get('date_range_end'),
-        'keywords': data.get('keywords', []),
-        'analysis_depth': data.get('analysis_depth', 'basic')
-    }
+    filters = query_filters(data)
     
     try:
         result = AIService.query_past_conversations(query, filters)
@@ -293,4 +637,153 @@ def query_conversations(request):
         return Response({
             'success': False,
             'error': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def query_filters(data):
+    return {
+        'date_range_start': data.get('date_range_start'),
+        'date_range_end': data.get('date_range_end'),
+        'keywords': data.get('keywords', []),
+        'analysis_depth': data.get('analysis_depth', 'basic')
+    }
+
+
+@csrf_exempt
+@require_POST
+async def query_conversations_stream(request):
+    """POST: Query past conversations, streaming progress as Server-Sent Events
+
+    In 'comprehensive' depth each analysed conversation sends a 'finding'
+    and a 'progress' event while the rest are still running; the 'done'
+    event carries the same result as query-conversations. Disconnecting
+    stops the LLM calls that have not started yet.
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid JSON'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = QueryConversationsSerializer(data=payload)
+    
+    if not serializer.is_valid():
+        return JsonResponse({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    query = data['query']
+    filters = query_filters(data)
+
+    async def event_stream():
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        # Called from the fan-out's thread: hand events to this loop
+        fanout = QueryFanOut(progress=lambda event: loop.call_soon_threadsafe(events.put_nowait, event))
+        writer = SSEWriter()
+        task = asyncio.ensure_future(sync_to_async(AIService.query_past_conversations)(query, filters, fanout=fanout))
+        getter = None
+        try:
+            while not task.done() or not events.empty():
+                getter = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait({getter, task}, timeout=writer.timeout(), return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield writer.event(getter.result())
+                    continue
+                getter.cancel()
+                if not done:
+                    frame = writer.tick()
+                    if frame:
+                        yield frame
+            yield writer.event({'type': 'done', 'result': task.result()})
+        except (asyncio.CancelledError, GeneratorExit):
+            fanout.cancelled.set()
+            raise
+        finally:
+            if getter is not None:
+                getter.cancel()
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['GET'])
+@replica_reads
+def search_conversations(request):
+    """GET: Full-text search over messages, titles and summaries
+
+    Query params: q, keywords (comma separated), status, date_range_start,
+    date_range_end, limit
+    """
+    serializer = SearchConversationsSerializer(data=request.query_params)
+
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    data = serializer.validated_data
+    read_from_primary('list')
+    results = ranked_conversations(
+        data['q'],
+        keywords=data.get('keywords'),
+        limit=data['limit'],
+        status=data.get('status'),
+        date_range_start=data.get('date_range_start'),
+        date_range_end=data.get('date_range_end'),
+    )
+    return Response({
+        'success': True,
+        'count': len(results),
+        'conversations': ConversationSearchResultSerializer(results, many=True).data
+    })
+
+
+@api_view(['GET'])
+def get_job(request, job_id):
+    """GET: Poll the status and result of a background job"""
+    try:
+        job = Job.objects.get(id=job_id)
+        return Response({
+            'success': True,
+            'job': JobSerializer(job).data
+        })
+    except Job.DoesNotExist:
+        return Response({
+            'success': False,
+            'error': 'Job not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+
+@api_view(['GET'])
+def llm_cache_stats(request):
+    """GET: Hit/miss counters for the LLM response cache"""
+    return Response({
+        'success': True,
+        'stats': get_llm_cache().stats()
+    })
+
+@api_view(['GET'])
+def llm_provider_stats(request):
+    """GET: Rate limiter, circuit breaker, retry and coalescing counters for the LLM provider"""
+    provider = get_provider()
+    return Response({
+        'success': True,
+        'provider': provider.name,
+        'model': provider.model_name,
+        'stats': provider.stats()
+    })
+
+
+def metrics(request):
+    """GET: Prometheus text exposition of the chat metrics"""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,103 @@
+import time
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from .models import Conversation, Message
+from .response_cache import invalidate_responses
+
+
+def start_turn(conversation, user_message, placeholder=True):
+    """
+    Persist the start of a chat turn in one transaction: the conversation
+    (if it is new), the user message and, for streamed replies, an
+    incomplete AI placeholder. Both messages go in a single bulk INSERT.
+
+    Returns (user_msg, ai_msg); ai_msg is None without a placeholder.
+    """
+    with transaction.atomic():
+        if conversation.pk is None:
+            conversation.save()
+
+        rows = [Message(conversation=conversation, content=user_message, sender='user')]
+        if placeholder:
+            rows.append(Message(conversation=conversation, content='', sender='ai', is_complete=False))
+        rows = Message.objects.bulk_create(rows)
+        Conversation.add_messages(conversation.pk, len(rows), rows[-1].timestamp)
+        invalidate_responses([conversation.pk])
+
+    user_msg = rows[0]
+    ai_msg = rows[1] if placeholder else None
+    return user_msg, ai_msg
+
+
+class StreamCheckpointer:
+    """
+    Accumulates a streamed AI reply and writes it to its placeholder row
+    every STREAM_CHECKPOINT_BYTES or STREAM_CHECKPOINT_SECONDS, whichever
+    comes first, so a crash loses at most one interval of text.
+    """
+
+    def __init__(self, message, min_bytes=None, min_interval=None):
+        self.message = message
+        self.min_bytes = settings.STREAM_CHECKPOINT_BYTES if min_bytes is None else min_bytes
+        self.min_interval = settings.STREAM_CHECKPOINT_SECONDS if min_interval is None else min_interval
+        self.chunks = []
+        self._pending_bytes = 0
+        self._last_checkpoint = time.monotonic()
+
+    @property
+    def content(self):
+        return ''.join(self.chunks)
+
+    def add(self, chunk):
+        """Buffer a chunk; returns True when a checkpoint is due"""
+        self.chunks.append(chunk)
+        self._pending_bytes += len(chunk.encode())
+        return (
+            self._pending_bytes >= self.min_bytes or
+            time.monotonic() - self._last_checkpoint >= self.min_interval
+        )
+
+    def checkpoint(self):
+        self.message.content = self.content
+        self.message.save(update_fields=['content'])
+        self._pending_bytes = 0
+        self._last_checkpoint = time.monotonic()
+
+    def finalize(self, content=None):
+        """Write the final text and mark the message complete"""
+        self.message.content = self.content if content is None else content
+        self.message.is_complete = True
+        self.message.save(update_fields=['content', 'is_complete'])
+
+    async def acheckpoint(self):
+        await sync_to_async(self.checkpoint)()
+
+    async def afinalize(self, content=None):
+        await sync_to_async(self.finalize)(content)
+
+
+def recover_orphaned_messages(older_than=None):
+    """
+    Clean up placeholders left by streams that died mid-reply: keep and
+    complete the ones with partial text, delete the empty ones.
+
+    Returns (finalized, pruned).
+    """
+    if older_than is None:
+        older_than = settings.ORPHAN_MESSAGE_SECONDS
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    orphans = Message.objects.filter(is_complete=False, timestamp__lt=cutoff)
+
+    with transaction.atomic():
+        invalidate_responses(set(orphans.values_list('conversation_id', flat=True)))
+        empty = orphans.filter(content='')
+        per_conversation = empty.values('conversation_id').annotate(count=Count('id'))
+        for row in per_conversation:
+            Conversation.add_messages(row['conversation_id'], -row['count'])
+        pruned, _ = empty.delete()
+        finalized = orphans.update(is_complete=True)
+    return finalized, pruned
@@ -1,5 +1,5 @@
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -21,6 +21,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'chat.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -52,16 +53,52 @@ TEMPLATES = [
 WSGI_APPLICATION = 'chatbot_backend.wsgi.application'
 
 # PostgreSQL Database Configuration
-DATABASES = {
-    'default': {
+# Connections persist for DATABASE_CONN_MAX_AGE seconds (0 = one per request)
+# and are health-checked before reuse. DATABASE_POOL uses a per-process
+# psycopg 3 pool instead (needs `pip install "psycopg[binary,pool]"`), which
+# suits ASGI, where requests don't keep a thread (and so a connection) of
+# their own. DATABASE_REPLICA_HOSTS (comma-separated) adds read replicas for
+# the list, detail and search endpoints (see chat.routers); conversations
+# written in the last DATABASE_REPLICA_LAG_SECONDS are still read from the
+# primary.
+DATABASE_CONN_MAX_AGE = config('DATABASE_CONN_MAX_AGE', default=60, cast=int)
+DATABASE_POOL = config('DATABASE_POOL', default=False, cast=bool)
+DATABASE_POOL_MIN_SIZE = config('DATABASE_POOL_MIN_SIZE', default=2, cast=int)
+DATABASE_POOL_MAX_SIZE = config('DATABASE_POOL_MAX_SIZE', default=10, cast=int)
+DATABASE_POOL_TIMEOUT = config('DATABASE_POOL_TIMEOUT', default=10.0, cast=float)
+DATABASE_REPLICA_HOSTS = config('DATABASE_REPLICA_HOSTS', default='', cast=Csv())
+DATABASE_REPLICA_LAG_SECONDS = config('DATABASE_REPLICA_LAG_SECONDS', default=2.0, cast=float)
+
+
+def _database(host):
+    database = {
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': config('DATABASE_NAME'),
         'USER': config('DATABASE_USER'),
         'PASSWORD': config('DATABASE_PASSWORD'),
-        'HOST': config('DATABASE_HOST'),
+        'HOST': host,
         'PORT': config('DATABASE_PORT'),
+        # Django's pool replaces persistent connections
+        'CONN_MAX_AGE': 0 if DATABASE_POOL else DATABASE_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': True,
     }
-}
+    if DATABASE_POOL:
+        database['OPTIONS'] = {
+            'pool': {
+                'min_size': DATABASE_POOL_MIN_SIZE,
+                'max_size': DATABASE_POOL_MAX_SIZE,
+                'timeout': DATABASE_POOL_TIMEOUT,
+            },
+        }
+    return database
+
+
+DATABASES = {'default': _database(config('DATABASE_HOST'))}
+DATABASE_REPLICAS = []
+for _number, _host in enumerate(DATABASE_REPLICA_HOSTS, 1):
+    DATABASES[f'replica{_number}'] = _database(_host)
+    DATABASE_REPLICAS.append(f'replica{_number}')
+DATABASE_ROUTERS = ['chat.routers.ReplicaRouter']
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -92,4 +129,140 @@ REST_FRAMEWORK = {
 }
 
 # OpenAI Configuration
-OPENAI_API_KEY = config('OPENAI_API_KEY')
\ No newline at end of file
+OPENAI_API_KEY = config('OPENAI_API_KEY')
+
+# LLM provider ('gemini' or the offline 'stub' backend)
+LLM_PROVIDER = config('LLM_PROVIDER', default='gemini')
+LLM_MODEL = config('LLM_MODEL', default='gemini-2.0-flash-exp')
+LLM_TEMPERATURE = config('LLM_TEMPERATURE', default=0.7, cast=float)
+LLM_MAX_OUTPUT_TOKENS = config('LLM_MAX_OUTPUT_TOKENS', default=1000, cast=int)
+GEMINI_API_KEY = config('GEMINI_API_KEY', default='')
+
+# Prometheus-style metrics at /metrics (request/stage/LLM timings, DB
+# queries per request, cache and resilience counters)
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+
+# Resilience layer around every provider call (per provider/model):
+# token bucket (calls/s, burst, max seconds to queue before failing fast),
+# circuit breaker, jittered retries and coalescing of identical prompts
+LLM_RESILIENCE_ENABLED = config('LLM_RESILIENCE_ENABLED', default=True, cast=bool)
+LLM_RATE_LIMIT = config('LLM_RATE_LIMIT', default=10.0, cast=float)
+LLM_RATE_BURST = config('LLM_RATE_BURST', default=20, cast=int)
+LLM_RATE_WAIT_SECONDS = config('LLM_RATE_WAIT_SECONDS', default=5.0, cast=float)
+LLM_BREAKER_FAILURES = config('LLM_BREAKER_FAILURES', default=5, cast=int)
+LLM_BREAKER_RESET_SECONDS = config('LLM_BREAKER_RESET_SECONDS', default=30.0, cast=float)
+LLM_RETRY_ATTEMPTS = config('LLM_RETRY_ATTEMPTS', default=3, cast=int)
+LLM_RETRY_BACKOFF_SECONDS = config('LLM_RETRY_BACKOFF_SECONDS', default=0.5, cast=float)
+LLM_RETRY_MAX_BACKOFF_SECONDS = config('LLM_RETRY_MAX_BACKOFF_SECONDS', default=8.0, cast=float)
+LLM_SINGLE_FLIGHT = config('LLM_SINGLE_FLIGHT', default=True, cast=bool)
+
+# Stub provider tuning, for offline load tests
+LLM_STUB_LATENCY_MS = config('LLM_STUB_LATENCY_MS', default=0, cast=int)
+LLM_STUB_TOKENS_PER_SECOND = config('LLM_STUB_TOKENS_PER_SECOND', default=0, cast=float)
+LLM_STUB_RESPONSE_TOKENS = config('LLM_STUB_RESPONSE_TOKENS', default=40, cast=int)
+
+# Cache for deterministic LLM calls (titles, summaries, queries). The shared
+# tier is the Django cache named by LLM_CACHE_ALIAS (empty to disable it).
+LLM_CACHE_ENABLED = config('LLM_CACHE_ENABLED', default=True, cast=bool)
+LLM_CACHE_ALIAS = config('LLM_CACHE_ALIAS', default='default')
+LLM_CACHE_TTL_SECONDS = config('LLM_CACHE_TTL_SECONDS', default=86400, cast=int)
+LLM_CACHE_MAX_ENTRIES = config('LLM_CACHE_MAX_ENTRIES', default=1024, cast=int)
+
+# Chat prompt context
+CHAT_CONTEXT_TOKEN_BUDGET = config('CHAT_CONTEXT_TOKEN_BUDGET', default=4000, cast=int)
+CHAT_CONTEXT_WINDOW = config('CHAT_CONTEXT_WINDOW', default=20, cast=int)
+CHAT_CONTEXT_SUMMARY_CHARS = config('CHAT_CONTEXT_SUMMARY_CHARS', default=2000, cast=int)
+
+# Per-process cache of each hot conversation's summary and tail, so a turn
+# only reads the messages added since the previous one
+CHAT_CONTEXT_CACHE_ENABLED = config('CHAT_CONTEXT_CACHE_ENABLED', default=True, cast=bool)
+CHAT_CONTEXT_CACHE_MAX_BYTES = config('CHAT_CONTEXT_CACHE_MAX_BYTES', default=64 * 1024 * 1024, cast=int)
+CHAT_CONTEXT_CACHE_TTL_SECONDS = config('CHAT_CONTEXT_CACHE_TTL_SECONDS', default=600, cast=int)
+
+# Build list/detail JSON straight from .values() rows instead of the DRF
+# serializers (same bytes; uses orjson when it is installed)
+FAST_JSON_RESPONSES = config('FAST_JSON_RESPONSES', default=True, cast=bool)
+
+# Cached conversation list/detail responses (with ETags) in the Django cache
+# named by RESPONSE_CACHE_ALIAS. Writes invalidate them; the TTL only bounds
+# active conversations against writes made outside the app. Ended
+# conversations are kept until invalidated.
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+RESPONSE_CACHE_ALIAS = config('RESPONSE_CACHE_ALIAS', default='default')
+RESPONSE_CACHE_TTL_SECONDS = config('RESPONSE_CACHE_TTL_SECONDS', default=300, cast=int)
+
+# Conversation summaries: transcripts that fit SUMMARY_CONTEXT_TOKEN_BUDGET
+# are summarized in one call; longer ones are split into chunks of
+# SUMMARY_CHUNK_TOKENS, summarized on SUMMARY_MAP_WORKERS threads and reduced
+SUMMARY_CONTEXT_TOKEN_BUDGET = config('SUMMARY_CONTEXT_TOKEN_BUDGET', default=30000, cast=int)
+SUMMARY_CHUNK_TOKENS = config('SUMMARY_CHUNK_TOKENS', default=6000, cast=int)
+SUMMARY_MAP_WORKERS = config('SUMMARY_MAP_WORKERS', default=4, cast=int)
+
+# Conversation digests (chat.digest): transcripts are compressed in blocks of
+# CONVERSATION_DIGEST_BLOCK_CHARS; the term sketch keeps the most frequent
+# CONVERSATION_DIGEST_MAX_TERMS terms
+CONVERSATION_DIGEST_BLOCK_CHARS = config('CONVERSATION_DIGEST_BLOCK_CHARS', default=4096, cast=int)
+CONVERSATION_DIGEST_MAX_TERMS = config('CONVERSATION_DIGEST_MAX_TERMS', default=200, cast=int)
+
+# 'comprehensive' queries: up to QUERY_FANOUT_MAX_CONVERSATIONS candidates are
+# analysed on QUERY_FANOUT_WORKERS threads, each from its first
+# QUERY_FANOUT_TRANSCRIPT_CHARS of transcript. Per-conversation results are
+# cached in QUERY_FANOUT_CACHE_ALIAS (empty to disable).
+QUERY_FANOUT_MAX_CONVERSATIONS = config('QUERY_FANOUT_MAX_CONVERSATIONS', default=200, cast=int)
+QUERY_FANOUT_WORKERS = config('QUERY_FANOUT_WORKERS', default=8, cast=int)
+QUERY_FANOUT_TRANSCRIPT_CHARS = config('QUERY_FANOUT_TRANSCRIPT_CHARS', default=12000, cast=int)
+QUERY_FANOUT_CACHE_ALIAS = config('QUERY_FANOUT_CACHE_ALIAS', default='default')
+QUERY_FANOUT_CACHE_TTL_SECONDS = config('QUERY_FANOUT_CACHE_TTL_SECONDS', default=86400, cast=int)
+
+# Background jobs: 'thread' (in-process pool), 'db' (run `manage.py run_jobs`) or 'sync'
+JOB_BACKEND = config('JOB_BACKEND', default='thread')
+JOB_WORKERS = config('JOB_WORKERS', default=4, cast=int)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=3, cast=int)
+JOB_RETRY_BACKOFF_SECONDS = config('JOB_RETRY_BACKOFF_SECONDS', default=2.0, cast=float)
+JOB_STALE_SECONDS = config('JOB_STALE_SECONDS', default=600, cast=int)
+
+# Bulk end/summarize (bulk-end-conversations/, `manage.py end_conversations`):
+# worker threads, provider calls per second (0 = unlimited), rows per bulk_update
+BULK_WORKERS = config('BULK_WORKERS', default=8, cast=int)
+BULK_RATE_LIMIT = config('BULK_RATE_LIMIT', default=5.0, cast=float)
+BULK_BATCH_SIZE = config('BULK_BATCH_SIZE', default=100, cast=int)
+BULK_MAX_CONVERSATIONS = config('BULK_MAX_CONVERSATIONS', default=5000, cast=int)
+
+# Semantic retrieval over past conversations
+EMBEDDING_EMBEDDER = config('EMBEDDING_EMBEDDER', default='chat.embeddings.HashingEmbedder')
+EMBEDDING_DIM = config('EMBEDDING_DIM', default=256, cast=int)
+EMBEDDING_CHUNK_CHARS = config('EMBEDDING_CHUNK_CHARS', default=1000, cast=int)
+EMBEDDING_INDEX_DIR = config('EMBEDDING_INDEX_DIR', default=str(BASE_DIR / 'var' / 'embeddings'))
+EMBEDDING_INDEX_MMAP = config('EMBEDDING_INDEX_MMAP', default=False, cast=bool)
+EMBEDDING_INDEX_MAX_SEGMENTS = config('EMBEDDING_INDEX_MAX_SEGMENTS', default=32, cast=int)
+
+# Archival (chat.archive): ended conversations idle for ARCHIVE_AFTER_DAYS
+# have their messages packed into one blob of zlib blocks and removed from the messages
+# table, by `manage.py archive_conversations` or a job `run_jobs` queues every
+# ARCHIVE_INTERVAL_SECONDS (0 disables it), ARCHIVE_BATCH_SIZE at a time.
+# Messages are packed in compressed blocks of about ARCHIVE_BLOCK_BYTES, so a
+# page of an archived conversation only decompresses the blocks it needs.
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=30, cast=int)
+ARCHIVE_INTERVAL_SECONDS = config('ARCHIVE_INTERVAL_SECONDS', default=3600, cast=int)
+ARCHIVE_BATCH_SIZE = config('ARCHIVE_BATCH_SIZE', default=100, cast=int)
+ARCHIVE_COMPRESSION_LEVEL = config('ARCHIVE_COMPRESSION_LEVEL', default=6, cast=int)
+ARCHIVE_BLOCK_BYTES = config('ARCHIVE_BLOCK_BYTES', default=65536, cast=int)
+
+# Streamed replies are checkpointed to the DB every N bytes or seconds;
+# placeholders older than ORPHAN_MESSAGE_SECONDS are cleaned up by
+# `manage.py recover_messages`
+STREAM_CHECKPOINT_BYTES = config('STREAM_CHECKPOINT_BYTES', default=2048, cast=int)
+STREAM_CHECKPOINT_SECONDS = config('STREAM_CHECKPOINT_SECONDS', default=2.0, cast=float)
+ORPHAN_MESSAGE_SECONDS = config('ORPHAN_MESSAGE_SECONDS', default=900, cast=int)
+
+# SSE framing: chunks are coalesced until SSE_COALESCE_BYTES are pending or
+# SSE_COALESCE_SECONDS have passed (0 bytes sends each chunk), and a comment
+# heartbeat is sent after SSE_HEARTBEAT_SECONDS of silence. Resumed streams
+# poll the message's checkpoints every SSE_RESUME_POLL_SECONDS.
+SSE_COALESCE_BYTES = config('SSE_COALESCE_BYTES', default=256, cast=int)
+SSE_COALESCE_SECONDS = config('SSE_COALESCE_SECONDS', default=0.05, cast=float)
+SSE_HEARTBEAT_SECONDS = config('SSE_HEARTBEAT_SECONDS', default=15.0, cast=float)
+SSE_RESUME_POLL_SECONDS = config('SSE_RESUME_POLL_SECONDS', default=0.5, cast=float)
+
+# Rows per batch when streaming conversation history as NDJSON
+NDJSON_CHUNK_SIZE = config('NDJSON_CHUNK_SIZE', default=500, cast=int)
\ No newline at end of file
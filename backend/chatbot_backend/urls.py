@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
+from chat.views import metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/chat/', include('chat.urls')),
+    path('metrics', metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -11,6 +11,8 @@ const API_BASE_URL = 'http://127.0.0.1:8000/api/chat';
 const AIChatbot = () => {
   const [darkMode, setDarkMode] = useState(true);
   const [conversations, setConversations] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [currentConversation, setCurrentConversation] = useState(null);
   const [messages, setMessages] = useState([]);
   const [inputMessage, setInputMessage] = useState('');
@@ -51,12 +53,29 @@ const AIChatbot = () => {
       const response = await fetch(`${API_BASE_URL}/conversations/`);
       const data = await response.json();
       setConversations(data.conversations || []);
+      setNextCursor(data.next_cursor || null);
     } catch (error) {
       console.error('Error fetching conversations:', error);
       showNotification('Failed to load conversations', 'error');
     }
   };
 
+  const loadMoreConversations = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const response = await fetch(`${API_BASE_URL}/conversations/?cursor=${encodeURIComponent(nextCursor)}`);
+      const data = await response.json();
+      setConversations(prev => [...prev, ...(data.conversations || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (error) {
+      console.error('Error fetching conversations:', error);
+      showNotification('Failed to load conversations', 'error');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchConversationDetails = async (conversationId) => {
     try {
       const response = await fetch(`${API_BASE_URL}/conversations/${conversationId}/`);
@@ -138,8 +157,13 @@ const AIChatbot = () => {
                 aiMessageId = data.ai_message_id;
                 
                 if (!currentConversation) {
-                  setCurrentConversation({ id: conversationId });
+                  setCurrentConversation({ id: conversationId, title: data.title });
                 }
+              } else if (data.type === 'title') {
+                // Generated title replacing the first-message draft
+                setCurrentConversation(prev =>
+                  prev && prev.id === data.conversation_id ? { ...prev, title: data.title } : prev
+                );
               } else if (data.type === 'chunk') {
                 // Append chunk to AI message content
                 aiMessageContent += data.content;
@@ -160,7 +184,9 @@ const AIChatbot = () => {
                   const newMessages = [...prev];
                   const lastMessage = newMessages[newMessages.length - 1];
                   if (lastMessage.sender === 'ai') {
-                    lastMessage.content = data.full_content;
+                    // 'done' carries ids and a digest, not the text again
+                    lastMessage.id = data.ai_message_id;
+                    lastMessage.content = aiMessageContent;
                     lastMessage.timestamp = new Date(data.timestamp);
                     lastMessage.isStreaming = false;
                   }
@@ -678,6 +704,15 @@ const AIChatbot = () => {
                         </div>
                       </div>
                     ))}
+                    {nextCursor && (
+                      <button
+                        onClick={loadMoreConversations}
+                        disabled={loadingMore}
+                        className="mx-auto px-6 py-3 backdrop-blur-xl bg-white/10 hover:bg-white/15 text-white rounded-2xl transition-all duration-300 border border-white/10 shadow-lg hover:scale-105 disabled:opacity-50 disabled:hover:scale-100"
+                      >
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                      </button>
+                    )}
                   </div>
                 )}
               </div>